@@ -7,6 +7,8 @@
 import shutil
 import signal
 import sys
+import binascii
+import multiprocessing
 from sys import platform, version_info
 if version_info.major == 3:
     from urllib.request import urlretrieve
@@ -16,6 +18,8 @@
 
 import uuid
 from src.utility.ConfigParser import ConfigParser
+from src.utility.BatchWorkQueue import BatchWorkQueue
+from src.utility.BatchJournal import BatchJournal
 
 parser = argparse.ArgumentParser(add_help=False)
 parser.add_argument('config', default=None, nargs='?', help='The path to the configuration file which describes what the pipeline should do.')
@@ -23,6 +27,9 @@
 parser.add_argument('--reinstall-packages', dest='reinstall_packages', action='store_true', help='If given, all python packages configured inside the configuration file will be reinstalled.')
 parser.add_argument('--reinstall-blender', dest='reinstall_blender', action='store_true', help='If given, the blender installation is deleted and reinstalled. Is ignored, if a "custom_blender_path" is configured in the configuration file.')
 parser.add_argument('--batch_process', help='Renders a batch of house-cam combinations, by reading a file containing the combinations on each line, where each line is the standard placeholder arguments for rendering a single scene separated by spaces. The value of this option is the path to the index file, no need to add placeholder arguments.')
+parser.add_argument('--batch-workers', dest='batch_workers', type=int, default=None, help="The number of blender processes, which work in parallel on the lines of the --batch_process index file. Each worker stays alive and pulls the next line from a local work queue, after it finished its current one. A failing line does not stop the remaining lines. Each blender process uses several threads, e.g. for loading and simulating the scene, and all of them share the GPU, so more workers do not necessarily render faster. Type: int. Default: the number of cpu cores divided by 8, at least 1.")
+parser.add_argument('--batch-journal', dest='batch_journal', default=None, help="The path to the journal file, to which each successfully completed line of the --batch_process index file is appended. When the batch is restarted, all lines in the journal are skipped. Type: string. Default: the path of the index file with the ending \".journal\".")
+parser.add_argument('--batch-staging', dest='batch_staging', action='store_true', help="If set, each batch line writes into staging dirs next to the output dirs, which are only merged into the output dirs after the line finished successfully. So failed lines leave no half-written outputs behind. Only the output_dir of the modules is staged, caches like the cache_dir of the SceneCacheWriter are written directly. Staging dirs left behind by killed workers are removed, when the next line with the same output dir starts. Can not be combined with modules, which append to the outputs of previous lines, e.g. writers with append_to_existing_output.")
 parser.add_argument('--temp-dir', dest='temp_dir', default=None, help="The path to a directory where all temporary output files should be stored. If it doesn't exist, it is created automatically. Type: string. Default: \"/dev/shm\" or \"/tmp/\" depending on which is available.")
 parser.add_argument('--keep-temp-dir', dest='keep_temp_dir', action='store_true', help="If set, the temporary directory is not removed in the end.")
 parser.add_argument('-h', '--help', dest='help', action='store_true', help='Show this help message and exit.')
@@ -271,11 +278,40 @@ def __call__(self, block_num, block_size, total_size):
 
 
 if not args.batch_process:
-    p = subprocess.Popen(["nice", "-n5", blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--", args.config, temp_dir] + args.args,
-                         env=dict(os.environ, PYTHONPATH=""), cwd=repo_root_directory)
+    processes = [subprocess.Popen(["nice", "-n5", blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--", args.config, temp_dir] + args.args,
+                                  env=dict(os.environ, PYTHONPATH=""), cwd=repo_root_directory)]
 else:  # Pass the index file path containing placeholder args for all input combinations (cam, house, output path)
-    p = subprocess.Popen([blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--",  args.config, temp_dir, "--batch-process", args.batch_process],
-                         env=dict(os.environ, PYTHONPATH=""), cwd=repo_root_directory)
+    # Read all lines of the index file, they are handed out to the blender workers via a local work queue
+    batch_index_file = os.path.expanduser(args.batch_process)
+    if not os.path.isabs(batch_index_file):
+        batch_index_file = os.path.join(repo_root_directory, batch_index_file)
+    with open(batch_index_file, "r") as f:
+        batch_lines = [(line_index, line) for line_index, line in enumerate(f.readlines()) if line.strip()]
+
+    # Skip all lines, which were completed in a previous run
+    batch_journal_path = os.path.abspath(args.batch_journal) if args.batch_journal is not None else BatchJournal.default_path(batch_index_file)
+    journal = BatchJournal(batch_journal_path)
+    amount_of_lines = len(batch_lines)
+    batch_lines = [(line_index, line) for line_index, line in batch_lines if not journal.is_completed(line)]
+    if len(batch_lines) < amount_of_lines:
+        print("Skipping {} lines, which are already marked as completed in {}".format(amount_of_lines - len(batch_lines), batch_journal_path))
+
+    authkey = os.urandom(16)
+    work_queue = BatchWorkQueue(batch_lines, authkey)
+    work_queue.start()
+
+    # One worker per core would oversubscribe the cpu, as each blender process uses several threads
+    batch_workers = args.batch_workers if args.batch_workers is not None else multiprocessing.cpu_count() // 8
+    batch_workers = max(1, min(batch_workers, len(batch_lines)))
+    print("Processing {} lines with {} blender workers".format(len(batch_lines), batch_workers))
+    processes = []
+    for worker_id in range(batch_workers):
+        # Each worker gets its own temp dir, as the pipelines write their intermediate files there
+        worker_temp_dir = os.path.join(temp_dir, "worker_{}".format(worker_id))
+        processes.append(subprocess.Popen([blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--",  args.config, worker_temp_dir,
+                                           "--batch-process", args.batch_process, "--batch-queue", work_queue.address, "--batch-worker", str(worker_id), "--batch-journal", batch_journal_path]
+                                          + (["--batch-staging"] if args.batch_staging else []),
+                                          env=dict(os.environ, PYTHONPATH="", BLENDER_PROC_BATCH_AUTHKEY=binascii.hexlify(authkey).decode()), cwd=repo_root_directory))
 
 
 def clean_temp_dir():
@@ -284,22 +320,37 @@ def clean_temp_dir():
         print("Cleaning temporary directory")
         shutil.rmtree(temp_dir)
 
-# Listen for SIGTERM signal, so we can properly cleanup and and terminate the child process
+# Listen for SIGTERM signal, so we can properly cleanup and and terminate the child processes
 def handle_sigterm(signum, frame):
+    if args.batch_process:
+        # Stop handing out lines and release the socket of the work queue
+        work_queue.close()
     clean_temp_dir()
-    p.terminate()
+    for p in processes:
+        p.terminate()
 signal.signal(signal.SIGTERM, handle_sigterm)
 
 try:
-    p.wait()
+    for p in processes:
+        p.wait()
 except KeyboardInterrupt:
-    try:
-        p.terminate()
-    except OSError:
-        pass
-    p.wait()
+    for p in processes:
+        try:
+            p.terminate()
+        except OSError:
+            pass
+    for p in processes:
+        p.wait()
+
+returncode = max(p.returncode for p in processes)
+if args.batch_process:
+    work_queue.close()
+    work_queue.print_summary()
+    # Lines which failed or were never processed, make the whole batch fail
+    if work_queue.failed_lines() and returncode == 0:
+        returncode = 1
 
 # Clean up
 clean_temp_dir()
 
-exit(p.returncode)
+exit(returncode)
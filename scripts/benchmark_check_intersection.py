@@ -0,0 +1,82 @@
+# Compares the pose sampling collision check of the ObjectPoseSampler with the implementation before the BvhTreeCache.
+#
+# Run inside of blender from the repository root:
+#   blender --background --python scripts/benchmark_check_intersection.py -- --objects 100 --poses 200
+import argparse
+import os
+import random
+import sys
+import time
+
+import bmesh
+import bpy
+import mathutils
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src.utility.BlenderUtility import check_intersection, check_bb_intersection
+from src.utility.BvhTreeCache import BvhTreeCache
+
+parser = argparse.ArgumentParser("Benchmarks the collision checks of a pose sampling")
+parser.add_argument('--objects', type=int, default=100, help='The number of placed objects')
+parser.add_argument('--poses', type=int, default=200, help='The number of sampled poses')
+parser.add_argument('--subdivisions', type=int, default=4, help='The subdivisions of each ico sphere')
+args = parser.parse_args(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
+
+
+def create_bvh_tree_in_world_space(obj):
+    # The tree creation before the BvhTreeCache, which bakes the pose into a fresh tree
+    bm = bmesh.new()
+    bm.from_mesh(obj.data)
+    bm.transform(obj.matrix_world)
+    bvh_tree = mathutils.bvhtree.BVHTree.FromBMesh(bm)
+    bm.free()
+    return bvh_tree
+
+
+def check_intersection_baseline(obj1, obj2, bvh_cache):
+    # The overlap check before the BvhTreeCache, the cache of the sampled object was cleared on each new pose
+    for obj in [obj1, obj2]:
+        if obj.name not in bvh_cache:
+            bvh_cache[obj.name] = create_bvh_tree_in_world_space(obj)
+    return len(bvh_cache[obj1.name].overlap(bvh_cache[obj2.name])) > 0
+
+
+def sample_poses(obj, placed_objects, check, on_new_pose=None):
+    random.seed(1)
+    collisions = 0
+    start = time.time()
+    for _ in range(args.poses):
+        if on_new_pose is not None:
+            on_new_pose()
+        obj.location = [random.uniform(-5, 5), random.uniform(-5, 5), random.uniform(0, 2)]
+        obj.rotation_euler = [random.uniform(0, 6.28) for _ in range(3)]
+        bpy.context.view_layer.update()
+        for placed in placed_objects:
+            if check_bb_intersection(obj, placed) and check(obj, placed):
+                collisions += 1
+                break
+    return time.time() - start, collisions
+
+
+for obj in list(bpy.data.objects):
+    bpy.data.objects.remove(obj)
+random.seed(0)
+placed_objects = []
+for _ in range(args.objects):
+    bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=args.subdivisions, radius=0.5,
+                                          location=[random.uniform(-5, 5), random.uniform(-5, 5), random.uniform(0, 2)])
+    placed_objects.append(bpy.context.object)
+bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=args.subdivisions, radius=0.5)
+sampled_obj = bpy.context.object
+
+# Like in the ObjectPoseSampler before, the trees are kept for the whole sampling, except for the sampled object
+baseline_bvh_cache = {}
+
+BvhTreeCache.clear()
+baseline_time, baseline_collisions = sample_poses(sampled_obj, placed_objects,
+                                                  lambda obj, placed: check_intersection_baseline(obj, placed, baseline_bvh_cache),
+                                                  lambda: baseline_bvh_cache.pop(sampled_obj.name, None))
+cached_time, cached_collisions = sample_poses(sampled_obj, placed_objects,
+                                              lambda obj, placed: check_intersection(obj, placed, skip_inside_check=True))
+print("Baseline (fresh world space trees): {:.3f}s, {} colliding poses".format(baseline_time, baseline_collisions))
+print("BvhTreeCache (cached world space trees): {:.3f}s, {} colliding poses".format(cached_time, cached_collisions))
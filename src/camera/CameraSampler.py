@@ -159,6 +159,8 @@ class CameraSampler(CameraInterface):
     def __init__(self, config):
         CameraInterface.__init__(self, config)
         self.bvh_tree = None
+        # The tree of all mesh objects, it is built on the first ray cast, see _cast_ray_into_scene()
+        self._scene_bvh_tree = None
 
         self.rotations = []
         self.translations = []
@@ -194,7 +196,10 @@ def _sample_cam_poses(self, config):
 
         # Set global parameters
         self._is_bvh_tree_inited = False
+        self._scene_bvh_tree = None
         self.sqrt_number_of_rays = config.get_int("sqrt_number_of_rays", 10)
+        self._ray_order = self._coarse_to_fine_ray_order(self.sqrt_number_of_rays)
+        self._scene_ray_hits = None
         self.max_tries = config.get_int("max_tries", 100000000)
         self.proximity_checks = config.get_raw_dict("proximity_checks", {})
         self.excluded_objects_in_proximity_check = config.get_list("excluded_objs_in_proximity_check", [])
@@ -209,7 +214,8 @@ def _sample_cam_poses(self, config):
         # Set camera intrinsics
         self._set_cam_intrinsics(cam, Config(self.config.get_raw_dict("intrinsics", {})))
 
-        if self.proximity_checks:
+        if self.proximity_checks or self.interest_score_range > 0 or self.min_interest_score > 0 \
+                or self.check_visible_objects or self._above_objects:
             # needs to build an bvh tree
             self._init_bvh_tree()
 
@@ -316,35 +322,167 @@ def _position_is_above_object(self, position, object):
         :return: True, if a ray sent into negative z-direction starting from the position hits the object first.
         """
         # Send a ray straight down and check if the first hit object is the query object
-        hit, _, _, _, hit_object, _ = bpy.context.scene.ray_cast(bpy.context.view_layer.depsgraph,
-                                                                 position,
-                                                                 mathutils.Vector([0, 0, -1]))
-        return hit and hit_object == object
+        object_index = self._cast_ray_into_scene(position, mathutils.Vector([0, 0, -1]))
+        return object_index is not None and self._scene_objects[object_index] == object
 
 
     def _init_bvh_tree(self):
         """ Creates a bvh tree which contains all mesh objects in the scene.
 
-        Such a tree is later used for fast raycasting.
+        Such a tree is later used for fast raycasting. The proximity checks use a tree without the excluded objects,
+        the scene coverage, visibility and above object checks use a tree with all objects. For the latter, the object
+        and its scoring class are looked up from the polygon index of each hit.
+        """
+        self._init_scene_bvh_tree()
+        # Look up table containing the class and weight of each object for the scene coverage score
+        self._scene_object_coverage_classes = [self._get_coverage_class_and_weight(obj) for obj in self._scene_objects]
+
+        if self.excluded_objects_in_proximity_check:
+            self.bvh_tree, _ = self._create_bvh_tree([obj for obj in self._scene_objects
+                                                      if obj not in self.excluded_objects_in_proximity_check])
+        else:
+            self.bvh_tree = self._scene_bvh_tree
+
+        self._is_bvh_tree_inited = True
+
+    def _init_scene_bvh_tree(self):
+        """ Creates the bvh tree of all mesh objects in the scene, which is used by _cast_ray_into_scene(). """
+        self._scene_objects = get_all_mesh_objects()
+        self._scene_bvh_tree, self._scene_polygon_to_object = self._create_bvh_tree(self._scene_objects)
+
+    @staticmethod
+    def _create_bvh_tree(objects):
+        """ Creates a bvh tree which contains the meshes of the given objects in world space.
+
+        :param objects: The list of mesh objects.
+        :return: The bvh tree and an array, which maps each polygon index of the tree to the index of its object.
         """
         # Create bmesh which will contain the meshes of all objects
         bm = bmesh.new()
-        # Go through all mesh objects
-        for obj in get_all_mesh_objects():
-            if obj in self.excluded_objects_in_proximity_check:
-                continue
-            # Add object mesh to bmesh (the newly added vertices will be automatically selected)
+        polygon_counts = []
+        for obj in objects:
+            number_of_verts = len(bm.verts)
+            # Add object mesh to bmesh
             bm.from_mesh(obj.data)
-            # Apply world matrix to all selected vertices
-            bm.transform(obj.matrix_world, filter={"SELECT"})
-            # Deselect all vertices
-            for v in bm.verts:
-                v.select = False
+            # Apply world matrix to the newly added vertices
+            bm.verts.ensure_lookup_table()
+            bmesh.ops.transform(bm, matrix=obj.matrix_world, verts=bm.verts[number_of_verts:])
+            polygon_counts.append(len(obj.data.polygons))
+
+        # Create tree from bmesh, its polygon indices are the indices of the faces in the bmesh
+        bvh_tree = mathutils.bvhtree.BVHTree.FromBMesh(bm)
+        bm.free()
+        return bvh_tree, np.repeat(np.arange(len(objects)), polygon_counts)
+
+    def _get_coverage_class_and_weight(self, obj):
+        """ Determines how a hit of the given object is counted in the scene coverage score.
+
+        :param obj: The mesh object.
+        :return: The class of the object, which is used for the scene variance or None if it is not counted there and
+                 the score of a hit.
+        """
+        weight = 1
+        is_of_special_dataset = "is_suncg" in obj or "is_3d_front" in obj
+        if is_of_special_dataset and "type" in obj and obj["type"] == "Object":
+            # calculate the score based on the type of the object,
+            # wall, floor and ceiling objects have 0 score
+            if "coarse_grained_class" in obj:
+                object_class = obj["coarse_grained_class"]
+                if object_class in self.special_objects:
+                    weight = self.special_objects_weight
+            else:
+                object_class = None
+        elif "category_id" in obj:
+            object_class = obj["category_id"]
+            if object_class in self.special_objects:
+                weight = self.special_objects_weight
+        else:
+            object_class = obj
+        return object_class, weight
 
-        # Create tree from bmesh
-        self.bvh_tree = mathutils.bvhtree.BVHTree.FromBMesh(bm)
+    def _cast_ray_into_scene(self, position, direction):
+        """ Sends one ray into the bvh tree of the scene.
 
-        self._is_bvh_tree_inited = True
+        :param position: The origin of the ray.
+        :param direction: The direction of the ray.
+        :return: The index of the hit object in the list of scene objects or None, if nothing was hit.
+        """
+        # Subclasses also check positions outside of the configured checks, e.g. if a pose is above the floor
+        if self._scene_bvh_tree is None:
+            self._init_scene_bvh_tree()
+        _, _, polygon_index, _ = self._scene_bvh_tree.ray_cast(position, direction)
+        return self._scene_polygon_to_object[polygon_index] if polygon_index is not None else None
+
+    @staticmethod
+    def _coarse_to_fine_ray_order(sqrt_number_of_rays):
+        """ Returns an order of the rays of the grid, in which coarse grids come first and are then refined.
+
+        The first rays are spread over the whole camera frame, so a violated constraint is found after only a few rays.
+
+        :param sqrt_number_of_rays: The number of rays along each side of the grid.
+        :return: The indices of the rays in the flattened grid.
+        """
+        coords = np.arange(sqrt_number_of_rays)
+        # The largest power of two which divides the coordinate, the first coordinate is part of every grid
+        strides = np.where(coords == 0, sqrt_number_of_rays, coords & -coords)
+        levels = np.minimum(strides[:, np.newaxis], strides[np.newaxis, :]).ravel()
+        return np.argsort(-levels, kind="stable")
+
+    def _get_ray_directions(self, cam, cam2world_matrix):
+        """ Computes the directions of the grid of rays, which are sent from the camera through its view frame.
+
+        :param cam: The camera whose view frame is used (only FOV is relevant, pose of cam is ignored).
+        :param cam2world_matrix: Transformation matrix that transforms from the camera space to the world space.
+        :return: The camera position and a list of all ray directions in coarse-to-fine order.
+        """
+        # Get position of the corners of the near plane and bring them to world space
+        frame = np.array([cam2world_matrix @ v for v in cam.view_frame(scene=bpy.context.scene)])
+        position = np.array(cam2world_matrix.to_translation())
+
+        # Compute vectors along both sides of the plane
+        vec_x = frame[1] - frame[0]
+        vec_y = frame[3] - frame[0]
+
+        # Go in discrete grid-like steps over plane
+        steps = np.linspace(0.0, 1.0, self.sqrt_number_of_rays)
+        ends = frame[0] + steps[:, np.newaxis, np.newaxis] * vec_x + steps[np.newaxis, :, np.newaxis] * vec_y
+        directions = ends.reshape(-1, 3)[self._ray_order] - position
+        return position.tolist(), directions.tolist()
+
+    def _cast_rays_into_scene(self, cam, cam2world_matrix, required_objects=None):
+        """ Sends the grid of rays from the camera through its view frame into the scene.
+
+        The hits of the last pose are cached, s.t. the scene coverage score and the visibility check of one pose use
+        the same rays.
+
+        :param cam: The camera whose view frame is used (only FOV is relevant, pose of cam is ignored).
+        :param cam2world_matrix: The world matrix which describes the camera orientation to check.
+        :param required_objects: If given, no more rays are sent as soon as all of these objects were hit.
+        :return: A list containing the index of the hit object in the list of scene objects for each ray or None, if
+                 the ray did not hit anything.
+        """
+        pose_key = tuple(tuple(row) for row in cam2world_matrix)
+        if self._scene_ray_hits is not None and self._scene_ray_hits[0] == pose_key:
+            return self._scene_ray_hits[1]
+
+        missing_objects = set(self._scene_objects.index(obj) for obj in required_objects if obj in self._scene_objects) \
+            if required_objects else None
+        if missing_objects is not None and len(missing_objects) < len(required_objects):
+            # Objects without mesh can not be hit, so all rays have to be sent
+            missing_objects = None
+        position, directions = self._get_ray_directions(cam, cam2world_matrix)
+        hit_object_indices = []
+        for direction in directions:
+            object_index = self._cast_ray_into_scene(position, direction)
+            hit_object_indices.append(object_index)
+            if missing_objects is not None:
+                missing_objects.discard(object_index)
+                if not missing_objects:
+                    # Not all rays were sent, so the result is not cached
+                    return hit_object_indices
+
+        self._scene_ray_hits = (pose_key, hit_object_indices)
+        return hit_object_indices
 
     def _perform_obstacle_in_view_check(self, cam, cam2world_matrix):
         """ Check if there is an obstacle in front of the camera which is less than the configured
@@ -359,18 +497,6 @@ def _perform_obstacle_in_view_check(self, cam, cam2world_matrix):
         if not self._is_bvh_tree_inited:
             raise Exception("The bvh tree should be inited before this function is called!")
 
-        # Get position of the corners of the near plane
-        frame = cam.view_frame(scene=bpy.context.scene)
-        # Bring to world space
-        frame = [cam2world_matrix @ v for v in frame]
-
-        # Compute vectors along both sides of the plane
-        vec_x = frame[1] - frame[0]
-        vec_y = frame[3] - frame[0]
-
-        sum = 0.0
-        sum_sq = 0.0
-
         range_distance = sys.float_info.max
 
         # Input validation
@@ -399,48 +525,35 @@ def _perform_obstacle_in_view_check(self, cam, cam2world_matrix):
             # when no background is on, it can not be combined with a reduced range distance
             no_range_distance = True
 
-        # Go in discrete grid-like steps over plane
-        position = cam2world_matrix.to_translation()
-        for x in range(0, self.sqrt_number_of_rays):
-            for y in range(0, self.sqrt_number_of_rays):
-                # Compute current point on plane
-                end = frame[0] + vec_x * x / float(self.sqrt_number_of_rays - 1) \
-                      + vec_y * y / float(self.sqrt_number_of_rays - 1)
-                # Send ray from the camera position through the current point on the plane
-                if no_range_distance:
-                    _, _, _, dist = self.bvh_tree.ray_cast(position, end - position)
-                else:
-                    _, _, _, dist = self.bvh_tree.ray_cast(position, end - position, range_distance)
-
-                # Check if something was hit and how far it is away
-                if dist is not None:
-                    if "min" in self.proximity_checks and dist <= self.proximity_checks["min"]:
-                        return False
-                    if "max" in self.proximity_checks and dist >= self.proximity_checks["max"]:
-                        return False
-                    if "avg" in self.proximity_checks:
-                        sum += dist
-                    if "var" in self.proximity_checks:
-                        if not "avg" in self.proximity_checks:
-                            sum += dist
-                        sum_sq += dist * dist
-                elif "no_background" in self.proximity_checks and self.proximity_checks["no_background"]:
+        # Send the rays coarse-to-fine, s.t. a violated min/max/no_background check is found with as few rays as possible
+        position, directions = self._get_ray_directions(cam, cam2world_matrix)
+        # Rays which do not hit anything count as zero distance in the avg and var checks
+        distances = np.zeros(len(directions))
+        for i, direction in enumerate(directions):
+            # Send ray from the camera position through the current point on the plane
+            if no_range_distance:
+                _, _, _, dist = self.bvh_tree.ray_cast(position, direction)
+            else:
+                _, _, _, dist = self.bvh_tree.ray_cast(position, direction, range_distance)
+
+            # Check if something was hit and how far it is away
+            if dist is not None:
+                if "min" in self.proximity_checks and dist <= self.proximity_checks["min"]:
+                    return False
+                if "max" in self.proximity_checks and dist >= self.proximity_checks["max"]:
                     return False
+                distances[i] = dist
+            elif "no_background" in self.proximity_checks and self.proximity_checks["no_background"]:
+                return False
 
+        avg = np.mean(distances)
         if "avg" in self.proximity_checks:
-            avg = sum / (self.sqrt_number_of_rays * self.sqrt_number_of_rays)
             # Check that the average distance is not within the accepted interval
             if avg >= self.proximity_checks["avg"]["max"] or avg <= self.proximity_checks["avg"]["min"]:
                 return False
 
         if "var" in self.proximity_checks:
-            if not "avg" in self.proximity_checks:
-                avg = sum / (self.sqrt_number_of_rays * self.sqrt_number_of_rays)
-            sq_avg = avg * avg
-
-            avg_sq = sum_sq / (self.sqrt_number_of_rays * self.sqrt_number_of_rays)
-
-            var = avg_sq - sq_avg
+            var = np.mean(distances * distances) - avg * avg
             # Check that the variance value of the distance is not within the accepted interval
             if var >= self.proximity_checks["var"]["max"] or var <= self.proximity_checks["var"]["min"]:
                 return False
@@ -456,29 +569,10 @@ def _visible_objects(self, cam: bpy.types.Camera, cam2world_matrix: mathutils.Ma
         :param cam2world_matrix: The world matrix which describes the camera orientation to check.
         :return: A set of objects visible hit by the sent rays.
         """
-        visible_objects = set()
-
-        # Get position of the corners of the near plane
-        frame = cam.view_frame(scene=bpy.context.scene)
-        # Bring to world space
-        frame = [cam2world_matrix @ v for v in frame]
-
-        # Compute vectors along both sides of the plane
-        vec_x = frame[1] - frame[0]
-        vec_y = frame[3] - frame[0]
-
-        # Go in discrete grid-like steps over plane
-        position = cam2world_matrix.to_translation()
-        for x in range(0, self.sqrt_number_of_rays):
-            for y in range(0, self.sqrt_number_of_rays):
-                # Compute current point on plane
-                end = frame[0] + vec_x * x / float(self.sqrt_number_of_rays - 1) + vec_y * y / float(self.sqrt_number_of_rays - 1)
-                # Send ray from the camera position through the current point on the plane
-                _, _, _, _, hit_object, _ = bpy.context.scene.ray_cast(bpy.context.view_layer.depsgraph, position, end - position)
-                # Add hit object to set
-                visible_objects.add(hit_object)
-
-        return visible_objects
+        # Stop sending rays as soon as all objects which have to be visible were hit
+        hit_object_indices = self._cast_rays_into_scene(cam, cam2world_matrix, self.check_visible_objects)
+        return set(self._scene_objects[object_index] if object_index is not None else None
+                   for object_index in hit_object_indices)
 
     def _scene_coverage_score(self, cam, cam2world_matrix):
         """ Evaluate the interestingness/coverage of the scene.
@@ -498,48 +592,12 @@ def _scene_coverage_score(self, cam, cam2world_matrix):
         score = 0.0
         objects_hit = defaultdict(int)
 
-        # Get position of the corners of the near plane
-        frame = cam.view_frame(scene=bpy.context.scene)
-        # Bring to world space
-        frame = [cam2world_matrix @ v for v in frame]
-
-        # Compute vectors along both sides of the plane
-        vec_x = frame[1] - frame[0]
-        vec_y = frame[3] - frame[0]
-
-        # Go in discrete grid-like steps over plane
-        position = cam2world_matrix.to_translation()
-        for x in range(0, self.sqrt_number_of_rays):
-            for y in range(0, self.sqrt_number_of_rays):
-                # Compute current point on plane
-                end = frame[0] + vec_x * x / float(self.sqrt_number_of_rays - 1) + vec_y * y / float(self.sqrt_number_of_rays - 1)
-                # Send ray from the camera position through the current point on the plane
-                hit, _, _, _, hit_object, _ = bpy.context.scene.ray_cast(bpy.context.view_layer.depsgraph, position, end - position)
-
-                if hit:
-                    is_of_special_dataset = "is_suncg" in hit_object or "is_3d_front" in hit_object
-                    if is_of_special_dataset and "type" in hit_object and hit_object["type"] == "Object":
-                        # calculate the score based on the type of the object,
-                        # wall, floor and ceiling objects have 0 score
-                        if "coarse_grained_class" in hit_object:
-                            object_class = hit_object["coarse_grained_class"]
-                            objects_hit[object_class] += 1
-                            if object_class in self.special_objects:
-                                score += self.special_objects_weight
-                            else:
-                                score += 1
-                        else:
-                            score += 1
-                    elif "category_id" in hit_object:
-                        object_class = hit_object["category_id"]
-                        if object_class in self.special_objects:
-                            score += self.special_objects_weight
-                        else:
-                            score += 1
-                        objects_hit[object_class] += 1
-                    else:
-                        objects_hit[hit_object] += 1
-                        score += 1
+        for object_index in self._cast_rays_into_scene(cam, cam2world_matrix):
+            if object_index is not None:
+                object_class, weight = self._scene_object_coverage_classes[object_index]
+                score += weight
+                if object_class is not None:
+                    objects_hit[object_class] += 1
         # For a scene with three different objects, the starting variance is 1.0, increases/decreases by '1/3' for
         # each object more/less, excluding floor, ceiling and walls
         scene_variance = len(objects_hit) / 3.0
@@ -115,7 +115,6 @@ def __init__(self, config: Config):
         """
         Module.__init__(self, config)
 
-        self.bvh_cache_for_intersection = {}
         self.placed_objects = []
 
         self.used_floor_area = self.config.get_float("floor_area")
@@ -517,7 +516,6 @@ def sample_new_object_poses_on_face(self, current_obj, face_bb):
         # perform check if object can be placed there
         no_collision = ObjectPoseSampler.check_pose_for_object(current_obj, position=random_placed_value,
                                                                rotation=random_placed_rotation,
-                                                               bvh_cache=self.bvh_cache_for_intersection,
                                                                objects_to_check_against=self.placed_objects,
                                                                list_of_objects_with_no_inside_check=[self.wall_obj])
         return no_collision
@@ -626,9 +624,6 @@ def duplicate_obj(cur_obj):
                 current_i = (current_i + 1) % len(list_of_face_sizes)
                 total_acc_size += face_size
 
-            # remove current obj from the bvh cache
-            if current_obj.name in self.bvh_cache_for_intersection:
-                del self.bvh_cache_for_intersection[current_obj.name]
             # if there was no collision save the object in the placed list
             if is_duplicated:
                 # delete the duplicated object
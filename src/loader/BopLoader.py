@@ -77,6 +77,12 @@ class BopLoader(LoaderInterface):
             pose estimation tasks! This is designed for the use-case where BOP objects are used as filler objects in
             the background. Default: False
           - bool
+        * - preprocessed_models_dir
+          - Models with external textures (ycbv, ruapc) have to be rewritten before they can be imported. If this dir
+            is given, the rewritten models are stored in it per dataset and reused by all further runs, as long as
+            they are newer than their original model. Default: None (the models are rewritten into the temp dir
+            once per run).
+          - string
     """
 
     def __init__(self, config):
@@ -105,6 +111,13 @@ def __init__(self, config):
         self.scale = 0.001 if self.config.get_bool("mm2m", False) else 1
         self.bop_dataset_name = os.path.basename(self.bop_dataset_path)
         self._has_external_texture = self.bop_dataset_name in ["ycbv", "ruapc"]
+        if self.config.has_param("preprocessed_models_dir"):
+            self.preprocessed_models_dir = os.path.join(
+                Utility.resolve_path(self.config.get_string("preprocessed_models_dir")), self.bop_dataset_name)
+        else:
+            self.preprocessed_models_dir = None
+        # Maps each model path to the first object loaded from it, see _get_loaded_obj()
+        self._loaded_objs_by_model_path = None
 
     def run(self):
         """ Load BOP data """
@@ -293,14 +306,57 @@ def _get_ref_cam_extrinsics_intrinsics(self, sc_camera, cam_id, insts, scale):
 
     def _get_loaded_obj(self, model_path):
         """ Returns the object if it has already been loaded.
+
+        On the first call, all objects loaded before by other modules are collected from the scene, afterwards only
+        the objects loaded by this module are added in _load_mesh().
  
         :param model_path: Model path of the new object. Type: string.
         :return: Object if found, else return None. Type: bpy.types.Object/None.
         """
-        for loaded_obj in bpy.context.scene.objects:
-            if 'model_path' in loaded_obj and loaded_obj['model_path'] == model_path:
-                return loaded_obj
-        return
+        if self._loaded_objs_by_model_path is None:
+            self._loaded_objs_by_model_path = {}
+            for loaded_obj in bpy.context.scene.objects:
+                if 'model_path' in loaded_obj:
+                    self._loaded_objs_by_model_path.setdefault(loaded_obj['model_path'], loaded_obj)
+        return self._loaded_objs_by_model_path.get(model_path)
+
+    def _get_texture_file_path(self, model_path):
+        """ Returns the path of the texture file mentioned in the header of the given .ply file.
+
+        :param model_path: Path of the .ply file. Type: string.
+        :return: The path of the texture file. Type: string.
+        """
+        with open(model_path, "r") as file:
+            for line in file:
+                if line.startswith("comment TextureFile "):
+                    return os.path.join(os.path.dirname(model_path), line[len("comment TextureFile "):].rstrip("\n"))
+                if line.startswith("end_header"):
+                    break
+        return ""
+
+    def _get_preprocessed_model_path(self, model_path):
+        """ Returns the path to a copy of the given .ply file, whose texture coordinates can be read by blender.
+
+        The copy is only created, if there is no up to date copy in the preprocessed models dir.
+
+        :param model_path: Path of the .ply file. Type: string.
+        :return: The path of the preprocessed .ply file. Type: string.
+        """
+        models_dir = self.preprocessed_models_dir if self.preprocessed_models_dir is not None else self._temp_dir
+        tmp_ply_file = os.path.join(models_dir, os.path.basename(model_path))
+        if os.path.exists(tmp_ply_file) and os.path.getmtime(tmp_ply_file) >= os.path.getmtime(model_path):
+            return tmp_ply_file
+
+        with open(model_path, "r") as file:
+            new_file_ply_content = file.read()
+        new_file_ply_content = new_file_ply_content.replace("property float texture_u", "property float s")
+        new_file_ply_content = new_file_ply_content.replace("property float texture_v", "property float t")
+        os.makedirs(models_dir, exist_ok=True)
+        # Write to a temporary file first, so other processes never read a partially written model
+        with open(tmp_ply_file + "." + str(os.getpid()), "w") as file:
+            file.write(new_file_ply_content)
+        os.replace(tmp_ply_file + "." + str(os.getpid()), tmp_ply_file)
+        return tmp_ply_file
 
 
     def _load_mesh(self, obj_id, model_p, scale=1):
@@ -321,26 +377,14 @@ def _load_mesh(self, obj_id, model_p, scale=1):
         if cur_obj is None:
             if self._has_external_texture:
                 if os.path.exists(model_path):
-                    new_file_ply_content = ""
-                    with open(model_path, "r") as file:
-                        new_file_ply_content = file.read()
-                        texture_pos = new_file_ply_content.find("comment TextureFile ") + len("comment TextureFile ")
-                        texture_file_name = new_file_ply_content[texture_pos:
-                                                                 new_file_ply_content.find("\n", texture_pos)]
-                        texture_file_path = os.path.join(os.path.dirname(model_path), texture_file_name)
-                        new_file_ply_content = new_file_ply_content.replace("property float texture_u",
-                                                                            "property float s")
-                        new_file_ply_content = new_file_ply_content.replace("property float texture_v",
-                                                                            "property float t")
-                    model_name = os.path.basename(model_path)
-                    tmp_ply_file = os.path.join(self._temp_dir, model_name)
-                    with open(tmp_ply_file, "w") as file:
-                        file.write(new_file_ply_content)
-                    bpy.ops.import_mesh.ply(filepath=tmp_ply_file)
+                    texture_file_path = self._get_texture_file_path(model_path)
+                    bpy.ops.import_mesh.ply(filepath=self._get_preprocessed_model_path(model_path))
                     cur_obj = bpy.context.selected_objects[-1]
             else:
                 bpy.ops.import_mesh.ply(filepath=model_path)
                 cur_obj = bpy.context.selected_objects[-1]
+            if cur_obj is not None:
+                self._loaded_objs_by_model_path[model_path] = cur_obj
         elif self.allow_duplication:
             bpy.ops.object.duplicate({"object": cur_obj, "selected_objects": [cur_obj]})
             cur_obj = bpy.context.selected_objects[-1]
@@ -3,6 +3,7 @@
 from src.utility.MaterialLoaderUtility import MaterialLoaderUtility
 from src.main.Module import Module
 from src.utility.Utility import Utility
+from src.utility.DatasetCatalog import DatasetCatalog
 
 
 class CCMaterialLoader(Module):
@@ -63,7 +64,9 @@ def run(self):
             raise Exception("Preload and fill used empty materials can not be done at the same time, check config!")
 
         if os.path.exists(self._folder_path) and os.path.isdir(self._folder_path):
-            for asset in os.listdir(self._folder_path):
+            # all assets, which have a base color image, are taken from the dataset catalog
+            base_image_paths = set(DatasetCatalog.glob(self._folder_path, "*/*_2K_Color.jpg"))
+            for asset in sorted(set(os.path.basename(os.path.dirname(path)) for path in base_image_paths)):
                 if self._used_assets:
                     skip_this_one = True
                     for used_asset in self._used_assets:
@@ -75,7 +78,7 @@ def run(self):
                 current_path = os.path.join(self._folder_path, asset)
                 if os.path.isdir(current_path):
                     base_image_path = os.path.join(current_path, "{}_2K_Color.jpg".format(asset))
-                    if not os.path.exists(base_image_path):
+                    if base_image_path not in base_image_paths:
                         continue
 
                     # if the material was already created it only has to be searched
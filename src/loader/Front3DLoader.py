@@ -55,6 +55,12 @@ class Front3DLoader(LoaderInterface):
         * - lamp_light_strength
           - Strength of the emission shader used in each lamp. Default: 7.0
           - float
+        * - instance_repeated_furniture
+          - If true, furniture which is used more than once shares the mesh and materials of its first appearance,
+            only the transformation and the custom properties are set per instance. This reduces the memory usage
+            and the time to build the render BVH. Be aware that changes to the mesh or materials of one instance
+            affect all of them. Default: False
+          - bool
    """
 
     def __init__(self, config: Config):
@@ -68,6 +74,7 @@ def __init__(self, config: Config):
         if not os.path.exists(self.mapping_file):
             raise Exception("The mapping file could not be found: {}".format(self.mapping_file))
         _, self.mapping = LabelIdMapping.read_csv_mapping(self.mapping_file)
+        self.instance_repeated_furniture = self.config.get_bool("instance_repeated_furniture", False)
         # a list of all newly created objects
         self.created_objects = []
 
@@ -80,8 +87,7 @@ def run(self):
             raise Exception("The 3D future model path does not exist: {}".format(self.future_model_path))
 
         # load data from json file
-        with open(self.json_path, "r") as json_file:
-            data = json.load(json_file)
+        data = self._read_json(self.json_path)
 
         self._create_mesh_objects_from_file(data)
 
@@ -95,6 +101,23 @@ def run(self):
 
         self._set_properties(self.created_objects)
 
+    @staticmethod
+    def _read_json(json_path: str):
+        """
+        Reads the given json file, orjson is used for parsing if it is installed, as it is much faster for the large
+        house files. It can be installed by adding "orjson" to the "setup"/"pip" in the config file.
+
+        :param json_path: path to the json file
+        :return: the parsed json data
+        """
+        try:
+            import orjson
+        except ImportError:
+            with open(json_path, "r") as json_file:
+                return json.load(json_file)
+        with open(json_path, "rb") as json_file:
+            return orjson.loads(json_file.read())
+
     def _create_mesh_objects_from_file(self, data: dir):
         """
         This creates for a given data json block all defined meshes and assigns the correct materials.
@@ -104,11 +127,12 @@ def _create_mesh_objects_from_file(self, data: dir):
 
         :param data: json data dir. Must contain "material" and "mesh"
         """
-        # extract all used materials -> there are more materials defined than used
-        used_materials = []
+        # extract all used materials by their uid -> there are more materials defined than used
+        used_materials = {}
         for mat in data["material"]:
-            used_materials.append({"uid": mat["uid"], "texture": mat["texture"],
-                                   "normaltexture": mat["normaltexture"], "color": mat["color"]})
+            # if a uid is defined twice, the first definition is used
+            used_materials.setdefault(mat["uid"], {"uid": mat["uid"], "texture": mat["texture"],
+                                                   "normaltexture": mat["normaltexture"], "color": mat["color"]})
 
         col = bpy.data.collections.get("Collection")
         for mesh_data in data["mesh"]:
@@ -134,14 +158,8 @@ def _create_mesh_objects_from_file(self, data: dir):
             #obj["category_id"] = self.mapping[used_obj_name.lower()]
             obj["category_id"] = self.mapping.get(used_obj_name.lower(), 0)
 
-            # get the material uid of the current mesh data
-            current_mat = mesh_data["material"]
-            used_mat = None
-            # search in the used materials after this uid
-            for u_mat in used_materials:
-                if u_mat["uid"] == current_mat:
-                    used_mat = u_mat
-                    break
+            # get the material with the uid of the current mesh data
+            used_mat = used_materials.get(mesh_data["material"])
             # If there should be a material used
             if used_mat:
                 if used_mat["texture"]:
@@ -182,29 +200,21 @@ def _create_mesh_objects_from_file(self, data: dir):
                     # as this material was just created the material is just appened to the empty list
                     obj.data.materials.append(mat)
 
-            # extract the vertices from the mesh_data
-            vert = [float(ele) for ele in mesh_data["xyz"]]
-            # extract the faces from the mesh_data
-            faces = mesh_data["faces"]
-            # extract the normals from the mesh_data
-            normal = [float(ele) for ele in mesh_data["normal"]]
-
-            # map those to the blender coordinate system
-            num_vertices = int(len(vert) / 3)
-            vertices = np.reshape(np.array(vert), [num_vertices, 3])
-            normal = np.reshape(np.array(normal), [num_vertices, 3])
-            # flip the first and second value
-            vertices[:, 1], vertices[:, 2] = vertices[:, 2], vertices[:, 1].copy()
-            normal[:, 1], normal[:, 2] = normal[:, 2], normal[:, 1].copy()
-            # reshape back to a long list
-            vertices = np.reshape(vertices, [num_vertices * 3])
-            normal = np.reshape(normal, [num_vertices * 3])
+            # extract the vertices, faces and normals from the mesh_data, directly as typed arrays
+            vertices = np.asarray(mesh_data["xyz"], dtype=np.float32).reshape(-1, 3)
+            faces = np.asarray(mesh_data["faces"], dtype=np.int32)
+            normal = np.asarray(mesh_data["normal"], dtype=np.float32).reshape(-1, 3)
+
+            # map those to the blender coordinate system by flipping the second and third value
+            num_vertices = len(vertices)
+            vertices = vertices[:, [0, 2, 1]]
+            normal = normal[:, [0, 2, 1]]
 
             # add this new data to the mesh object
             mesh = obj.data
             mesh.vertices.add(num_vertices)
-            mesh.vertices.foreach_set("co", vertices)
-            mesh.vertices.foreach_set("normal", normal)
+            mesh.vertices.foreach_set("co", vertices.ravel())
+            mesh.vertices.foreach_set("normal", normal.ravel())
 
             # link the faces as vertex indices
             num_vertex_indicies = len(faces)
@@ -212,26 +222,25 @@ def _create_mesh_objects_from_file(self, data: dir):
             mesh.loops.foreach_set("vertex_index", faces)
 
             # the loops are set based on how the faces are a ranged
-            num_loops = int(num_vertex_indicies / 3)
+            num_loops = num_vertex_indicies // 3
             mesh.polygons.add(num_loops)
             # always 3 vertices form one triangle
-            loop_start = np.arange(0, num_vertex_indicies, 3)
+            loop_start = np.arange(0, num_vertex_indicies, 3, dtype=np.int32)
             # the total size of each triangle is therefore 3
-            loop_total = [3] * num_loops
+            loop_total = np.full(num_loops, 3, dtype=np.int32)
             mesh.polygons.foreach_set("loop_start", loop_start)
             mesh.polygons.foreach_set("loop_total", loop_total)
 
-            # the uv coordinates are reshaped then the face coords are extracted
-            uv_mesh_data = [float(ele) for ele in mesh_data["uv"] if ele is not None]
+            # the uv coordinates are reshaped then the face coords are extracted, missing values are converted to nan
+            uv_mesh_data = np.asarray(mesh_data["uv"], dtype=np.float32)
+            uv_mesh_data = uv_mesh_data[~np.isnan(uv_mesh_data)]
             # bb1737bf-dae6-4215-bccf-fab6f584046b.json includes one mesh which only has no UV mapping
-            if uv_mesh_data:
-                uv = np.reshape(np.array(uv_mesh_data), [num_vertices, 2])
+            if uv_mesh_data.size > 0:
+                uv = np.reshape(uv_mesh_data, [num_vertices, 2])
                 used_uvs = uv[faces, :]
-                # and again reshaped back to the long list
-                used_uvs = np.reshape(used_uvs, [2 * num_vertex_indicies])
 
                 mesh.uv_layers.new(name="new_uv_layer")
-                mesh.uv_layers[-1].data.foreach_set("uv", used_uvs)
+                mesh.uv_layers[-1].data.foreach_set("uv", used_uvs.ravel())
             else:
                 warnings.warn(f"This mesh {obj.name} does not have a specified uv map!")
 
@@ -250,23 +259,36 @@ def _load_furniture_objs(self, data: dir):
         Load all furniture objects specified in the json file, these objects are stored as "raw_model.obj" in the
         3D_future_model_path. For lamp the lamp_light_strength value can be changed via the config.
 
+        Furniture elements with the same "jid" and category are only loaded once, further elements get duplicates of
+        the already loaded objects.
+
         :param data: json data dir. Should contain "furniture"
-        :return: all objects which have been loaded
+        :return: dict mapping each furniture uid to the list of objects which have been loaded for it
         """
-        # collect all loaded furniture objects
-        all_objs = []
+        # collect all loaded furniture objects by their uid
+        furniture_by_uid = {}
+        # maps each (jid, category) to the objects loaded for it, their materials are already set up
+        loaded_models = {}
         # for each furniture element
         for ele in data["furniture"]:
             # create the paths based on the "jid"
             folder_path = os.path.join(self.future_model_path, ele["jid"])
             obj_file = os.path.join(folder_path, "raw_model.obj")
+            # extract the name, which serves as category id
+            used_obj_name = ele["category"]
+            model_key = (ele["jid"], used_obj_name)
+            if model_key in loaded_models:
+                objs = duplicate_objects(loaded_models[model_key], linked=self.instance_repeated_furniture)
+                for obj in objs:
+                    obj.name = used_obj_name
+                    obj["uid"] = ele["uid"]
+                    obj["is_used"] = False
+                furniture_by_uid.setdefault(ele["uid"], []).extend(objs)
             # if the object exists load it -> a lot of object do not exist
             # we are unsure why this is -> we assume that not all objects have been made public
-            if os.path.exists(obj_file) and not "7e101ef3-7722-4af8-90d5-7c562834fabd" in obj_file:
+            elif os.path.exists(obj_file) and not "7e101ef3-7722-4af8-90d5-7c562834fabd" in obj_file:
                 # load all objects from this .obj file
                 objs = Utility.import_objects(filepath=obj_file)
-                # extract the name, which serves as category id
-                used_obj_name = ele["category"]
                 for obj in objs:
                     obj.name = used_obj_name
                     # add some custom properties
@@ -324,19 +346,20 @@ def _load_furniture_objs(self, data: dir):
 
                             links.new(emission_node.outputs["Emission"], mix_node.inputs[1])
 
-                all_objs.extend(objs)
+                loaded_models[model_key] = objs
+                furniture_by_uid.setdefault(ele["uid"], []).extend(objs)
             elif "7e101ef3-7722-4af8-90d5-7c562834fabd" in obj_file:
                 warnings.warn(f"This file {obj_file} was skipped as it can not be read by blender.")
-        return all_objs
+        return furniture_by_uid
 
-    def _move_and_duplicate_furniture(self, data: dir, all_loaded_furniture: list):
+    def _move_and_duplicate_furniture(self, data: dir, all_loaded_furniture: dict):
         """
         Move and duplicate the furniture depending on the data in the data json dir.
         After loading each object gets a location based on the data in the json file. Some objects are used more than
         once these are duplicated and then placed.
 
         :param data: json data dir. Should contain "scene", which should contain "room"
-        :param all_loaded_furniture: all objects which have been loaded in _load_furniture_objs
+        :param all_loaded_furniture: dict mapping each uid to the objects, which have been loaded in _load_furniture_objs
         """
         # this rotation matrix rotates the given quaternion into the blender coordinate system
         blender_rot_mat = mathutils.Matrix.Rotation(radians(-90), 4, 'X')
@@ -347,29 +370,28 @@ def _move_and_duplicate_furniture(self, data: dir, all_loaded_furniture: list):
             # for each object in that room
             for child in room["children"]:
                 if "furniture" in child["instanceid"]:
-                    # find the object where the uid matches the child ref id
-                    for obj in all_loaded_furniture:
-                        if obj["uid"] == child["ref"]:
-                            # if the object was used before, duplicate the object and move that duplicated obj
-                            if obj["is_used"]:
-                                new_obj = duplicate_objects(obj)[0]
-                            else:
-                                # if it is the first time use the object directly
-                                new_obj = obj
-                            self.created_objects.append(new_obj)
-                            new_obj["is_used"] = True
-                            new_obj["room_id"] = room_id
-                            new_obj["type"] = "Object"  # is an object used for the interesting score
-                            new_obj["coarse_grained_class"] = new_obj["category_id"]
-                            # this flips the y and z coordinate to bring it to the blender coordinate system
-                            new_obj.location = mathutils.Vector(child["pos"]).xzy
-                            new_obj.scale = child["scale"]
-                            # extract the quaternion and convert it to a rotation matrix
-                            rotation_mat = mathutils.Quaternion(child["rot"]).to_euler().to_matrix().to_4x4()
-                            # transform it into the blender coordinate system and then to an euler
-                            new_obj.rotation_euler = (blender_rot_mat @ rotation_mat).to_euler()
-
-                            if "ceiling lamp" in new_obj.name.lower() or "pendant lamp" in new_obj.name.lower():
-                                # We hide ceiling lamps to avoid incorrect shadow lamps
-                                new_obj.hide_render = True
-                                #new_obj.hide_viewport = True       # this cause error when selecting objects
\ No newline at end of file
+                    # all objects where the uid matches the child ref id
+                    for obj in all_loaded_furniture.get(child["ref"], []):
+                        # if the object was used before, duplicate the object and move that duplicated obj
+                        if obj["is_used"]:
+                            new_obj = duplicate_objects(obj, linked=self.instance_repeated_furniture)[0]
+                        else:
+                            # if it is the first time use the object directly
+                            new_obj = obj
+                        self.created_objects.append(new_obj)
+                        new_obj["is_used"] = True
+                        new_obj["room_id"] = room_id
+                        new_obj["type"] = "Object"  # is an object used for the interesting score
+                        new_obj["coarse_grained_class"] = new_obj["category_id"]
+                        # this flips the y and z coordinate to bring it to the blender coordinate system
+                        new_obj.location = mathutils.Vector(child["pos"]).xzy
+                        new_obj.scale = child["scale"]
+                        # extract the quaternion and convert it to a rotation matrix
+                        rotation_mat = mathutils.Quaternion(child["rot"]).to_euler().to_matrix().to_4x4()
+                        # transform it into the blender coordinate system and then to an euler
+                        new_obj.rotation_euler = (blender_rot_mat @ rotation_mat).to_euler()
+
+                        if "ceiling lamp" in new_obj.name.lower() or "pendant lamp" in new_obj.name.lower():
+                            # We hide ceiling lamps to avoid incorrect shadow lamps
+                            new_obj.hide_render = True
+                            #new_obj.hide_viewport = True       # this cause error when selecting objects
\ No newline at end of file
@@ -1,4 +1,3 @@
-import glob
 import os
 
 import bpy
@@ -7,6 +6,7 @@
 from src.main.Module import Module
 from src.utility.MaterialLoaderUtility import MaterialLoaderUtility
 from src.utility.Utility import Utility
+from src.utility.DatasetCatalog import DatasetCatalog
 
 
 class HavenMaterialLoader(Module):
@@ -95,7 +95,11 @@ def run(self):
         if self._preload and self._fill_used_empty_materials:
             raise Exception("Preload and fill used empty materials can not be done at the same time, check config!")
         if os.path.exists(self._folder_path) and os.path.isdir(self._folder_path):
-            for asset in os.listdir(self._folder_path):
+            # all images of all assets are taken from the dataset catalog
+            images_per_asset = {}
+            for path in DatasetCatalog.glob(self._folder_path, "*/*.jpg"):
+                images_per_asset.setdefault(os.path.basename(os.path.dirname(path)), []).append(path)
+            for asset in sorted(images_per_asset.keys()):
                 if self._used_assets:
                     skip_this_one = True
                     for used_asset in self._used_assets:
@@ -107,7 +111,7 @@ def run(self):
                 current_path = os.path.join(self._folder_path, asset)
                 if os.path.isdir(current_path):
                     # find the current base_image_path by search for _diff_, this make it independent of the used res
-                    all_paths = glob.glob(os.path.join(current_path, "*.jpg"))
+                    all_paths = images_per_asset[asset]
                     base_image_path = ""
                     for path in all_paths:
                         if "_diff_" in path:
@@ -2,7 +2,6 @@
 import random
 import warnings
 import numpy as np
-import glob
 from collections import OrderedDict
 
 import bpy
@@ -12,6 +11,7 @@
 from src.loader.LoaderInterface import LoaderInterface
 from src.utility.Utility import Utility
 from src.utility.BlenderUtility import get_bounds
+from src.utility.DatasetCatalog import DatasetCatalog
 
 class IKEALoader(LoaderInterface):
     """
@@ -67,10 +67,11 @@ def _generate_object_dict(self):
         dict: {IKEA_<type>_<style> : [<path_to_obj_file>, ...]}
         """
         counter = 0
-        obj_files = glob.glob(os.path.join(self._data_dir, "IKEA", "*", "*.obj"))
+        obj_files = DatasetCatalog.glob(self._data_dir, "IKEA/*/*.obj")
+        mtl_files = set(DatasetCatalog.glob(self._data_dir, "IKEA/*/*.mtl"))
         for obj_file in obj_files:
             category = [s for s in obj_file.split('/') if 'IKEA_' in s][0]
-            if self._check_material_file(obj_file):
+            if self._check_material_file(obj_file, mtl_files):
                 self._obj_dict.setdefault(category, []).append(obj_file)
                 counter += 1
 
@@ -81,17 +82,18 @@ def _generate_object_dict(self):
         self._obj_dict = OrderedDict(self._obj_dict)
 
     @staticmethod
-    def _check_material_file(path):
+    def _check_material_file(path, mtl_files):
         """
         Checks whether there is a texture file (.mtl) associated to the object available.
 
         :param path: (str) path to object
+        :param mtl_files: (set) paths of all available texture files
         :return: (boolean) texture file exists
         """
         name = os.path.basename(path).split(".")[0]
         obj_dir = os.path.dirname(path)
         mtl_path = os.path.join(obj_dir, name + ".mtl")
-        return os.path.exists(mtl_path)
+        return mtl_path in mtl_files
 
     def _get_object_by_type(self, obj_type):
         """
@@ -3,6 +3,7 @@
 
 from src.main.Module import Module
 from src.utility.BlenderUtility import get_bounds
+from src.utility.BvhTreeCache import BvhTreeCache
 
 
 class LoaderInterface(Module):
@@ -91,6 +92,7 @@ def apply_transformation_to_objects(objects: [bpy.types.Object]):
             obj.select_set(True)
             bpy.context.view_layer.objects.active = obj
             bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
+            BvhTreeCache.invalidate(obj)
             obj.select_set(False)
         bpy.ops.object.select_all(action='DESELECT')
 
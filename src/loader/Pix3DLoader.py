@@ -7,6 +7,7 @@
 from src.loader.LoaderInterface import LoaderInterface
 from src.utility.Utility import Utility
 from src.utility.LabelIdMapping import LabelIdMapping
+from src.utility.DatasetCatalog import DatasetCatalog
 
 
 class Pix3DLoader(LoaderInterface):
@@ -52,8 +53,8 @@ def __init__(self, config):
     @staticmethod
     def get_files_with_category(used_category, data_path):
         """
-        Returns a list of a .obj file for the given category. This function creates a category path file for each used
-        category. This will speed up the usage the next time the category is used.
+        Returns a list of a .obj file for the given category. The files of each used category are stored in the
+        dataset catalog, so the annotation file only has to be read again, if it changed.
 
         :param category: the category something like: 'bed', see the data_path folder for categories
         :param data_path: path to the Pix3D folder
@@ -62,12 +63,8 @@ def get_files_with_category(used_category, data_path):
 
         path_to_annotation_file = os.path.join(data_path, "pix3d.json")
         if os.path.exists(path_to_annotation_file):
-            files = []
-            path_to_category_file = os.path.join(data_path, "category_{}_paths.txt".format(used_category.strip()))
-            if os.path.exists(path_to_category_file):
-                with open(path_to_category_file, "r") as f:
-                    files = f.read().split("\n")
-            else:
+            def build():
+                files = []
                 with open(path_to_annotation_file, "r") as f:
                     loaded_data = json.load(f)
                     for block in loaded_data:
@@ -76,9 +73,9 @@ def get_files_with_category(used_category, data_path):
                             if category == used_category:
                                 files.append(block["model"])
                 # remove doubles
-                files = list(set(files))
-                with open(path_to_category_file, "w") as f:
-                    f.write("\n".join(files))
+                return sorted(set(files)), [path_to_annotation_file]
+
+            files = DatasetCatalog.get(data_path, "category:" + used_category.strip(), build)
             files = [os.path.join(data_path, file) for file in files]
             return files
         else:
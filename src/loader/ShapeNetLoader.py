@@ -1,4 +1,3 @@
-import glob
 import json
 import os
 import random
@@ -9,6 +8,7 @@
 from src.loader.LoaderInterface import LoaderInterface
 from src.utility.Utility import Utility
 from src.utility.LabelIdMapping import LabelIdMapping
+from src.utility.DatasetCatalog import DatasetCatalog
 
 
 class ShapeNetLoader(LoaderInterface):
@@ -64,20 +64,24 @@ def get_files_with_synset(used_synset_id, used_source_id, path_to_taxonomy_file,
         :return: list of .obj files, which are in the synset_id folder, based on the given taxonomy
         """
         if os.path.exists(path_to_taxonomy_file):
-            files = []
-            with open(path_to_taxonomy_file, "r") as f:
-                loaded_data = json.load(f)
-                parent_synset_id = ShapeNetLoader.find_parent_synset_id(data_path, used_synset_id, loaded_data)
-                id_path = os.path.join(data_path, parent_synset_id)
-                    
-                if not used_source_id:
-                    files.extend(glob.glob(os.path.join(id_path, "*", "models", "*.obj")))
-                else:
-                    if not os.path.exists(os.path.join(id_path, used_source_id)):
-                        raise Exception("The used_source_id {} is not correct".format(used_source_id)) 
-                    
-                    # Using both the used_synset_id and used_source_id
-                    files.extend(glob.glob(os.path.join(id_path, used_source_id, "models", "*.obj")))
+            def build():
+                with open(path_to_taxonomy_file, "r") as f:
+                    loaded_data = json.load(f)
+                # The parent synset is looked up in the taxonomy and among the folders of the data_path
+                return ShapeNetLoader.find_parent_synset_id(data_path, used_synset_id, loaded_data), [path_to_taxonomy_file, data_path]
+
+            # Parsing the taxonomy file is only done again, if it or the data_path changed
+            parent_synset_id = DatasetCatalog.get(data_path, "parent_synset:" + used_synset_id, build)
+            id_path = os.path.join(data_path, parent_synset_id)
+
+            if not used_source_id:
+                files = DatasetCatalog.glob(data_path, parent_synset_id + "/*/models/*.obj")
+            else:
+                if not os.path.exists(os.path.join(id_path, used_source_id)):
+                    raise Exception("The used_source_id {} is not correct".format(used_source_id))
+
+                # Using both the used_synset_id and used_source_id
+                files = DatasetCatalog.glob(data_path, parent_synset_id + "/" + used_source_id + "/models/*.obj")
 
             # Sort files to make random choice deterministic for the case when used_source_id is not specified
             files.sort()
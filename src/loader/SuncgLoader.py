@@ -35,6 +35,12 @@ class SuncgLoader(LoaderInterface):
           - The path to the suncg root directory which should be used for loading objects, rooms, textures etc.
             Default: is extracted from the house.json path
           - string
+        * - asset_library_dir
+          - If given, each object model is stored in a .blend file named after its model id in this dir, when it is
+            used for the first time. All further houses append the model from there, instead of importing its .obj
+            file again. The library of a model is recreated, if its .obj file is newer. Rooms are always imported
+            from their .obj files, as they are only used in one house. Default: None.
+          - string
     """
 
     def __init__(self, config):
@@ -42,6 +48,10 @@ def __init__(self, config):
         self.house_path = Utility.resolve_path(self.config.get_string("path"))
         suncg_folder_path = os.path.join(os.path.dirname(self.house_path), "../..")
         self.suncg_dir = self.config.get_string("suncg_path", suncg_folder_path)
+        if self.config.has_param("asset_library_dir"):
+            self.asset_library_dir = Utility.resolve_path(self.config.get_string("asset_library_dir"))
+        else:
+            self.asset_library_dir = None
         self._collection_of_loaded_objs = {}
         # there are only two types of materials, textures and diffuse
         self._collection_of_loaded_mats = {"texture": {}, "diffuse": {}}
@@ -121,17 +131,15 @@ def run(self):
 
     def _rename_materials(self):
         """
-        Rename all materials based on their texture if they have one
+        Rename all materials of the house based on their texture if they have one
 
-        This makes the accessing later on easier
+        This makes the accessing later on easier. Only the materials which are used by the loaded objects are
+        considered, these are exactly the materials with a texture collected in _transform_and_colorize_object.
         """
 
-        for material in bpy.data.materials:
-            if material.use_nodes:
-                nodes = material.node_tree.nodes
-                textures = Utility.get_nodes_with_type(nodes, "ShaderNodeTexImage")
-                if len(textures) == 1:
-                    material.name = textures[0].image.name
+        for material in self._collection_of_loaded_mats["texture"].values():
+            textures = Utility.get_nodes_with_type(material.node_tree.nodes, "ShaderNodeTexImage")
+            material.name = textures[0].image.name
 
 
     def _load_room(self, node, metadata, material_adjustments, transform, house_id, parent, room_per_object):
@@ -200,9 +208,14 @@ def _load_object(self, node, metadata, material_adjustments, transform, parent):
         :param parent: The parent object to which the ground should be linked
         """
         if "state" not in node or node["state"] == 0:
-            self._load_obj(os.path.join(self.suncg_dir, "object", node["modelId"], node["modelId"] + ".obj"), metadata, material_adjustments, transform, parent)
+            file_name = node["modelId"]
+        else:
+            file_name = node["modelId"] + "_0"
+        if self.asset_library_dir is not None:
+            library_path = os.path.join(self.asset_library_dir, file_name + ".blend")
         else:
-            self._load_obj(os.path.join(self.suncg_dir, "object", node["modelId"], node["modelId"] + "_0.obj"), metadata, material_adjustments, transform, parent)
+            library_path = None
+        self._load_obj(os.path.join(self.suncg_dir, "object", node["modelId"], file_name + ".obj"), metadata, material_adjustments, transform, parent, library_path)
 
     def _correct_bbox_frame(self, bbox):
         """ Corrects the coordinate frame of the given bbox.
@@ -250,7 +263,7 @@ def _load_box(self, node, material_adjustments, transform, parent):
         # Set the physics property of all imported boxes
         self._set_properties(bpy.context.selected_objects)
 
-    def _load_obj(self, path, metadata, material_adjustments, transform=None, parent=None):
+    def _load_obj(self, path, metadata, material_adjustments, transform=None, parent=None, library_path=None):
         """ Load the wavefront object file from the given path and adjust according to the given arguments.
 
         :param path: The path to the .obj file.
@@ -258,12 +271,13 @@ def _load_obj(self, path, metadata, material_adjustments, transform=None, parent
         :param material_adjustments: Adjustments to the materials which were specified inside house.json.
         :param transform: The transformation that should be applied to the loaded objects.
         :param parent: The parent object to which the object should be linked
+        :param library_path: The path to the .blend file, which is used as asset library for this object file.
         """
         if not os.path.exists(path):
             print("Warning: " + path + " is missing")
         else:
             object_already_loaded = path in self._collection_of_loaded_objs
-            loaded_objects = Utility.import_objects(filepath=path, cached_objects=self._collection_of_loaded_objs)
+            loaded_objects = Utility.import_objects(filepath=path, cached_objects=self._collection_of_loaded_objs, library_path=library_path)
             if object_already_loaded:
                 print("Duplicate object: {}".format(path))
                 for object in loaded_objects:
@@ -281,7 +295,7 @@ def _load_obj(self, path, metadata, material_adjustments, transform=None, parent
                 self._transform_and_colorize_object(object, material_adjustments, transform, parent)
 
             # Set the physics property of all imported objects
-            self._set_properties(bpy.context.selected_objects)
+            self._set_properties(loaded_objects)
 
     def _transform_and_colorize_object(self, object, material_adjustments, transform=None, parent=None):
         """ Applies the given transformation to the object and refactors its materials.
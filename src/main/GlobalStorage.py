@@ -24,6 +24,11 @@ class GlobalStorage(object):
           - This key is saved by the Renderer during distance rendering and is used in the
             StereoGlobalMatchingWriter. 
           - string
+        * - renderer_object_index
+          - This key is saved by the Renderer, if the object index pass is rendered. It contains the path of the
+            rendered object index images and the session_uids of the objects per pass index and is used in the
+            SegMapRenderer. 
+          - dict
          
     Please add all new keys you create to this list.
     
@@ -129,6 +134,15 @@ def get(key):
         else:
             raise RuntimeError("The key: {} is not in the global storage!".format(key))
 
+    @staticmethod
+    def get_storage_dict():
+        """
+        Returns a copy of all values stored in the GlobalStorage, this does not contain the global config
+
+        :return: dict mapping each key to its value
+        """
+        return dict(GlobalStorage._storage_dict)
+
     @staticmethod
     def is_in_storage(key):
         """
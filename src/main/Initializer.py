@@ -11,6 +11,7 @@
 from src.utility.CameraUtility import CameraUtility
 from src.utility.Config import Config
 from src.utility.DefaultConfig import DefaultConfig
+from src.utility.Utility import Utility
 
 
 class Initializer(Module):
@@ -41,6 +42,10 @@ class Initializer(Module):
           - A dictionary of all global set attributes, which are used if a module does not provide a certain key.
             Default: {}.
           - dict
+        * - mesh_cache_dir
+          - If given, all .obj and .ply files loaded via Utility.import_objects() are cached as .blend files in this
+            dir. Later runs append the cached objects instead of parsing the files again. Default: None.
+          - string
     """
 
     def __init__(self, config):
@@ -50,6 +55,9 @@ def __init__(self, config):
         global_config = Config(self.config.get_raw_dict("global", {}))
         GlobalStorage.init_global(global_config)
 
+        if self.config.has_param("mesh_cache_dir"):
+            Utility.mesh_cache_dir = Utility.resolve_path(self.config.get_string("mesh_cache_dir"))
+
         # call the init again to make sure all values from the global config where read correctly, too
         self._default_init()
 
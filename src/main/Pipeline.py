@@ -1,15 +1,24 @@
 
+import copy
+import pickle
 import shutil
 import os
+import socket
+import sys
+import uuid
 import bpy
 
 from src.utility.ConfigParser import ConfigParser
 from src.utility.Utility import Utility, Config
+from src.utility.RendererUtility import RendererUtility
+from src.utility.BvhTreeCache import BvhTreeCache
 from src.main.GlobalStorage import GlobalStorage
+from src.writer.SceneCacheWriter import SceneCacheWriter
 
 class Pipeline:
 
-    def __init__(self, config_path, args, working_dir, temp_dir, should_perform_clean_up=True, avoid_rendering=False):
+    def __init__(self, config_path, args, working_dir, temp_dir, should_perform_clean_up=True, avoid_rendering=False,
+                 stage_output_dirs=False, batch_line_index=None, batch_worker_name=None):
         """
         Inits the pipeline, by calling the constructors of all modules mentioned in the config.
 
@@ -21,8 +30,16 @@ def __init__(self, config_path, args, working_dir, temp_dir, should_perform_clea
         :param avoid_rendering: if this is true all renderes are not executed (except the RgbRenderer, \
                                where only the rendering call to blender is avoided) with this it is possible to debug \
                                properly
+        :param stage_output_dirs: if this is true, all modules write into staging directories next to their configured \
+                                  output dirs, which are only moved to the configured output dirs after all modules \
+                                  have been run successfully. So an output dir never contains half-written outputs.
+        :param batch_line_index: the index of the processed line of the batch index file, if run in batch mode
+        :param batch_worker_name: the name of the batch worker, which runs this pipeline, if run in batch mode
         """
         Utility.working_dir = working_dir
+        Utility.batch_line_index = batch_line_index
+        Utility.batch_worker_name = batch_worker_name
+        Utility.output_dirs_staged = stage_output_dirs
 
         # Clean up example scene or scene created by last run when debugging pipeline inside blender
         if should_perform_clean_up:
@@ -31,13 +48,47 @@ def __init__(self, config_path, args, working_dir, temp_dir, should_perform_clea
         config_parser = ConfigParser(silent=True)
         config = config_parser.parse(Utility.resolve_path(config_path), args)
 
+        # The scene cache is identified by the module configs before the output dirs are redirected
+        original_module_configs = copy.deepcopy(config["modules"])
+
+        # Maps each configured output dir to the staging dir, which is used instead during the run
+        self._staged_output_dirs = {}
+        if stage_output_dirs:
+            self._redirect_output_dirs_to_staging(config["modules"])
+
         if avoid_rendering:
             GlobalStorage.add_to_config_before_init("avoid_rendering", True)
 
         Utility.temp_dir = Utility.resolve_path(temp_dir)
         os.makedirs(Utility.temp_dir, exist_ok=True)
 
+        # Frame listeners are registered by the modules of this pipeline, remove the ones of a previous pipeline
+        RendererUtility.remove_all_frame_listeners()
+        # The cached bvh trees belong to the objects of a previous pipeline
+        BvhTreeCache.clear()
+        # The mesh cache is only used, if it is configured by the Initializer of this pipeline
+        Utility.mesh_cache_dir = None
+        # The output consumers are registered by the modules of this pipeline
+        Utility.output_consumers = {}
         self.modules = Utility.initialize_modules(config["modules"])
+        self._scene_cache_index = self._init_scene_cache(original_module_configs)
+
+    def _init_scene_cache(self, module_configs):
+        """ Looks for a SceneCacheWriter and hands it the configs of all modules before it.
+
+        :param module_configs: A list of dicts, each one describing one module.
+        :return: The index of the SceneCacheWriter in the list of modules or None, if there is none.
+        """
+        module_index = 0
+        for config_index, module_config in enumerate(module_configs):
+            # If only the module name is given (short notation)
+            if isinstance(module_config, str):
+                module_config = {"module": module_config}
+            if module_config["module"] == "writer.SceneCacheWriter":
+                self.modules[module_index].set_previous_module_configs(module_configs[:config_index])
+                return module_index
+            module_index += module_config.get("amount_of_repetitions", 1)
+        return None
 
 
     def _cleanup(self):
@@ -78,9 +129,170 @@ def _remove_custom_properties(self):
         for key in bpy.context.scene.keys():
             del bpy.context.scene[key]
 
+    def _redirect_output_dirs_to_staging(self, module_configs):
+        """ Replaces all output dirs configured in the given module configs and in the global config with staging dirs.
+
+        Each staging dir is placed next to its output dir, s.t. it is on the same file system and can be renamed
+        atomically. Modules which append to existing outputs can not be staged, as they would only see the empty
+        staging dir.
+
+        Only the "output_dir" keys are staged, as all final outputs of the modules are written there. The other
+        paths written by modules, e.g. the "cache_dir" of the SceneCacheWriter or the "mesh_cache_dir", are caches,
+        which are shared by all runs and written atomically by their modules.
+
+        The name of a staging dir contains the host and pid of the process, staging dirs of terminated processes on
+        this host, which could not clean up after themselves, are removed here.
+
+        :param module_configs: A list of dicts, each one describing one module.
+        """
+        for module_config in module_configs:
+            if isinstance(module_config, dict) and "config" in module_config:
+                configs = [module_config["config"]]
+                if isinstance(module_config["config"].get("global"), dict):
+                    configs.append(module_config["config"]["global"])
+
+                for config in configs:
+                    if config.get("append_to_existing_output"):
+                        raise Exception("The module {} appends to its existing output, this can not be combined with "
+                                        "staging output dirs.".format(module_config.get("module")))
+                    if config.get("output_dir"):
+                        output_dir = os.path.normpath(Utility.resolve_path(config["output_dir"]))
+                        if output_dir not in self._staged_output_dirs:
+                            self._remove_stale_staging_dirs(output_dir)
+                            self._staged_output_dirs[output_dir] = "{}.staging_{}_{}_{}".format(output_dir, socket.gethostname(),
+                                                                                                os.getpid(), uuid.uuid4().hex)
+                        config["output_dir"] = self._staged_output_dirs[output_dir]
+
+    def _remove_stale_staging_dirs(self, output_dir):
+        """ Removes all staging dirs of the given output dir, whose process on this host is not running anymore.
+
+        :param output_dir: The configured output dir.
+        """
+        parent_dir, output_dir_name = os.path.split(output_dir)
+        if not os.path.isdir(parent_dir):
+            return
+        prefix = output_dir_name + ".staging_"
+        for file_name in os.listdir(parent_dir):
+            if file_name.startswith(prefix):
+                # The host name might contain underscores itself
+                owner = file_name[len(prefix):].rsplit("_", 2)
+                if len(owner) == 3 and owner[0] == socket.gethostname() and owner[1].isdigit() and not self._is_process_running(int(owner[1])):
+                    print("Removing the staging dir of a terminated run: " + os.path.join(parent_dir, file_name))
+                    shutil.rmtree(os.path.join(parent_dir, file_name), ignore_errors=True)
+
+    @staticmethod
+    def _is_process_running(pid):
+        """ Checks whether a process with the given pid is running on this host.
+
+        :param pid: The process id.
+        :return: True, if the process is running or if this can not be checked on this system.
+        """
+        if sys.platform == "win32":
+            # On windows os.kill() would stop the process
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # The process exists, but belongs to another user
+            return True
+        return True
+
+    def _commit_staged_output_dirs(self):
+        """ Moves the content of all staging dirs into their output dirs.
+
+        If the output dir does not exist yet, the whole staging dir is renamed in one atomic step. Otherwise, the
+        staging dir is merged into the output dir, see _merge_dir().
+        """
+        for output_dir, staging_dir in self._staged_output_dirs.items():
+            if not os.path.exists(staging_dir):
+                continue
+            if not os.path.exists(output_dir):
+                os.makedirs(os.path.dirname(output_dir), exist_ok=True)
+                os.rename(staging_dir, output_dir)
+            else:
+                self._merge_dir(staging_dir, output_dir)
+
+    def _merge_dir(self, source_dir, target_dir):
+        """ Moves all files of the source dir into the target dir and removes the source dir afterwards.
+
+        Sub dirs are merged recursively, so existing outputs in the target dir are kept. Only files with the same
+        path are replaced.
+
+        :param source_dir: The dir whose content is moved.
+        :param target_dir: The existing dir, into which the content is moved.
+        """
+        for file_name in os.listdir(source_dir):
+            source_path = os.path.join(source_dir, file_name)
+            target_path = os.path.join(target_dir, file_name)
+            if os.path.isdir(source_path) and not os.path.islink(source_path) and os.path.isdir(target_path):
+                self._merge_dir(source_path, target_path)
+            elif os.path.isdir(target_path) and not os.path.islink(target_path):
+                raise Exception("The staged file {} can not replace the dir {}".format(source_path, target_path))
+            else:
+                os.replace(source_path, target_path)
+        os.rmdir(source_dir)
+
+    def _discard_staged_output_dirs(self):
+        """ Removes all staging dirs, this is used if the pipeline failed. """
+        for staging_dir in self._staged_output_dirs.values():
+            if os.path.exists(staging_dir):
+                shutil.rmtree(staging_dir)
+
+    def _get_modules_to_run(self):
+        """ Returns the modules, which have to be run, loading the cached scene if there is one.
+
+        If the scene assembled by the modules before the SceneCacheWriter is cached, only the modules of the main
+        package are run from these, as they also configure blender itself. Afterwards the cached scene is opened and
+        all modules after the SceneCacheWriter are run as usual.
+
+        :return: A list of modules.
+        """
+        if self._scene_cache_index is None:
+            return self.modules
+        cache_path = self.modules[self._scene_cache_index].cache_path
+        if not os.path.exists(cache_path):
+            return self.modules
+
+        modules = [module for module in self.modules[:self._scene_cache_index]
+                   if module.__class__.__module__.startswith("src.main.")]
+        return modules + [_SceneCacheLoader(cache_path)] + self.modules[self._scene_cache_index + 1:]
+
     def run(self):
         """ Runs each module and measuring their execution time. """
         with Utility.BlockStopWatch("Running blender pipeline"):
-            for module in self.modules:
-                with Utility.BlockStopWatch("Running module " + module.__class__.__name__):
-                    module.run()
+            try:
+                for module in self._get_modules_to_run():
+                    with Utility.BlockStopWatch("Running module " + module.__class__.__name__):
+                        module.run()
+            except BaseException:
+                self._discard_staged_output_dirs()
+                raise
+            self._commit_staged_output_dirs()
+
+
+class _SceneCacheLoader:
+    """ Opens a scene stored by the SceneCacheWriter, it is run instead of the modules which assembled the scene. """
+
+    def __init__(self, cache_path):
+        """
+        :param cache_path: The path of the cached .blend file.
+        """
+        self.cache_path = cache_path
+
+    def run(self):
+        print("Loading cached scene: " + self.cache_path)
+        bpy.ops.wm.open_mainfile(filepath=self.cache_path, load_ui=False)
+        # The cached trees belong to the objects of the previous file
+        BvhTreeCache.clear()
+
+        # Restore the values, which the skipped modules stored in the GlobalStorage
+        storage_path = SceneCacheWriter.get_global_storage_path(self.cache_path)
+        if os.path.exists(storage_path):
+            with open(storage_path, "rb") as f:
+                global_storage = pickle.load(f)
+            for key, value in global_storage.items():
+                # Values set by the modules, which were run anyway, are kept
+                if not GlobalStorage.is_in_storage(key):
+                    GlobalStorage.set(key, value)
@@ -3,6 +3,7 @@
 
 from src.main.Module import Module
 from src.utility.BlenderUtility import check_intersection, check_bb_intersection, get_all_mesh_objects
+from src.utility.BoundingBoxGrid import BoundingBoxGrid
 
 
 class ObjectPoseSampler(Module):
@@ -71,8 +72,8 @@ def run(self):
         2. If no collisions are found keep the point.
         """
         # While we have objects remaining and have not run out of tries - sample a point
-        # List of successfully placed objects
-        placed = []
+        # Grid of successfully placed objects, which returns the objects near a new pose
+        placed = BoundingBoxGrid()
         # After this many tries we give up on current object and continue with the rest
         max_tries = self.config.get_int("max_iterations", 1000)
         objects = self.config.get_list("objects_to_sample", get_all_mesh_objects())
@@ -83,9 +84,6 @@ def run(self):
         if not objects:
             raise Exception("The list of objects can not be empty!")
 
-        # cache to fasten collision detection
-        bvh_cache = {}
-
         # for every selected object
         for obj in objects:
             if obj.type == "MESH":
@@ -98,8 +96,7 @@ def run(self):
                     # Put the top object in queue at the sampled point in space
                     position = self.config.get_vector3d("pos_sampler")
                     rotation = self.config.get_vector3d("rot_sampler")
-                    no_collision = ObjectPoseSampler.check_pose_for_object(obj, position, rotation, bvh_cache,
-                                                                           placed, [])
+                    no_collision = ObjectPoseSampler.check_pose_for_object(obj, position, rotation, placed, [])
 
                     # If no collision then keep the position
                     if no_collision:
@@ -109,7 +106,7 @@ def run(self):
                 if amount_of_tries_done == -1:
                     amount_of_tries_done = max_tries
 
-                placed.append(obj)
+                placed.add(obj)
 
                 if not no_collision:
                     print("Could not place " + obj.name + " without a collision.")
@@ -128,23 +125,21 @@ def insert_key_frames(self, obj, frame_id):
 
     @staticmethod
     def check_pose_for_object(obj: bpy.types.Object, position: mathutils.Vector, rotation: mathutils.Vector,
-                              bvh_cache: dict, objects_to_check_against: list,
+                              objects_to_check_against,
                               list_of_objects_with_no_inside_check: list):
         """
         Checks if a object placed at the given pose intersects with any object given in the list.
 
-        The bvh_cache adds all current objects to the bvh tree, which increases the speed.
-
-        If an object is already in the cache it is removed, before performing the check.
+        The bvh tree of the object is built once for the new pose and reused for all objects it is checked against,
+        the trees of these objects are cached as long as they are not moved.
 
         :param obj: Object which should be checked. Type: :class:`bpy.types.Object`
         :param position: 3D Vector of the location of the object. Type: :class:`mathutils.Vector`
         :param rotation: 3D Vector of the rotation in euler angles. If this is None, the rotation is not changed \
                          Type: :class:`mathutils.Vector`
-        :param bvh_cache: Dict of all the bvh trees, removes the `obj` from the cache before adding it again. \
-                          Type: :class:`dict`
-        :param objects_to_check_against: List of objects which the object is checked again \
-                                         Type: :class:`list`
+        :param objects_to_check_against: List of objects which the object is checked again or a BoundingBoxGrid, \
+                                         which only returns the objects near the object. \
+                                         Type: :class:`list` or :class:`src.utility.BoundingBoxGrid`
         :param list_of_objects_with_no_inside_check: List of objects on which no inside check is performed. \
                                                      This check is only done for the objects in \
                                                      `objects_to_check_against`. Type: :class:`list`
@@ -155,22 +150,17 @@ def check_pose_for_object(obj: bpy.types.Object, position: mathutils.Vector, rot
         if rotation:
             obj.rotation_euler = rotation
         bpy.context.view_layer.update()
-        # Remove bvh cache, as object has changed
-        if obj.name in bvh_cache:
-            del bvh_cache[obj.name]
-
-        no_collision = True
-        # Now check for collisions
-        for already_placed in objects_to_check_against:
-            # First check if bounding boxes collides
-            intersection = check_bb_intersection(obj, already_placed)
-            # if they do
-            if intersection:
-                skip_inside_check = already_placed in list_of_objects_with_no_inside_check
-                # then check for more refined collisions
-                intersection, bvh_cache = check_intersection(obj, already_placed, bvh_cache=bvh_cache,
-                                                             skip_inside_check=skip_inside_check)
-            if intersection:
-                no_collision = False
-                break
-        return no_collision
+
+        # First find the objects whose bounding boxes collide
+        if isinstance(objects_to_check_against, BoundingBoxGrid):
+            close_objects = objects_to_check_against.query(obj)
+        else:
+            close_objects = [already_placed for already_placed in objects_to_check_against
+                             if check_bb_intersection(obj, already_placed)]
+
+        # Now check for more refined collisions
+        for already_placed in close_objects:
+            skip_inside_check = already_placed in list_of_objects_with_no_inside_check
+            if check_intersection(obj, already_placed, skip_inside_check=skip_inside_check):
+                return False
+        return True
@@ -2,7 +2,8 @@
 import numpy as np
 
 from src.main.Module import Module
-from src.utility.BlenderUtility import check_intersection, check_bb_intersection, duplicate_objects, get_all_mesh_objects
+from src.utility.BlenderUtility import check_intersection, duplicate_objects, get_all_mesh_objects
+from src.utility.BoundingBoxGrid import BoundingBoxGrid
 
 
 class ObjectReplacer(Module):
@@ -90,13 +91,15 @@ def _two_points_distance(point1, point2):
         if scale:
             obj_to_add.scale = _bb_ratio(obj_to_remove.bound_box, obj_to_add.bound_box)
 
-        # Check for collision between the new object and other objects in the scene
-        for obj in get_all_mesh_objects(): # for each object
+        # The new object was moved, so its bounding box in the grid has to be updated
+        self._scene_objects_grid.add(obj_to_add)
+
+        # Check for collision between the new object and the objects in the scene, whose bounding boxes intersect
+        for obj in self._scene_objects_grid.query(obj_to_add):
 
             if obj != obj_to_add and obj_to_remove != obj and obj not in self._ignore_collision_with:
-                if check_bb_intersection(obj, obj_to_add):
-                    if check_intersection(obj, obj_to_add)[0]:
-                        return False
+                if check_intersection(obj, obj_to_add):
+                    return False
         return True
 
     def run(self):
@@ -114,6 +117,9 @@ def run(self):
         for obj in self._objects_to_replace_with:
             obj.hide_render = True
 
+        # Broad phase for the collision checks
+        self._scene_objects_grid = BoundingBoxGrid(get_all_mesh_objects())
+
         # amount of replacements depends on the amount of objects and the replace ratio
         amount_of_replacements = int(len(self._objects_to_be_replaced) * self._replace_ratio)
         if amount_of_replacements == 0:
@@ -141,11 +147,13 @@ def run(self):
                         duplicate_new_object[key] = value
 
                 duplicate_new_object.hider_render = False
+                self._scene_objects_grid.add(duplicate_new_object)
 
                 print('Replaced ', current_object_to_replace_with.name, ' by ', duplicate_new_object.name)
 
                 # Delete the original object and remove it from the list
                 self._objects_to_replace_with.remove(current_object_to_replace_with)
+                self._scene_objects_grid.remove(current_object_to_replace_with)
                 bpy.ops.object.select_all(action='DESELECT')
                 current_object_to_replace_with.select_set(True)
                 bpy.ops.object.delete()
@@ -1,8 +1,10 @@
 import bpy
 import mathutils
+import numpy as np
 
 from src.main.Module import Module
 from src.utility.BlenderUtility import check_intersection, check_bb_intersection, get_bounds
+from src.utility.BoundingBoxGrid import BoundingBoxGrid
 
 
 class OnSurfaceSampler(Module):
@@ -49,6 +51,18 @@ class OnSurfaceSampler(Module):
         * - up_direction
           - Normal vector of the side of surface the objects should be placed on. Default: [0., 0., 1.].
           - mathutils.Vector
+        * - packing_mode
+          - How free placements are found. "rejection": Positions are sampled with the pos_sampler until one is free.
+            "occupancy_grid": The surface and the footprints of all placed objects are rasterized into a 2D grid,
+            for each sampled rotation all free positions are found at once and one of them is chosen randomly, the
+            pos_sampler is not used. This keeps working on cluttered surfaces, where most sampled positions collide.
+            The footprints are the bounding boxes of the objects, so objects are packed less densely than possible.
+            Default: "rejection". Available: ["rejection", "occupancy_grid"].
+          - string
+        * - grid_resolution
+          - The size of one cell of the occupancy grid in meters. Only used with the "occupancy_grid" packing mode.
+            Default: 0.01.
+          - float
     """
 
     def __init__(self, config):
@@ -59,7 +73,14 @@ def __init__(self, config):
         self.min_distance = config.get_float("min_distance", 0.25)
         self.max_distance = config.get_float("max_distance", 0.6)
 
+        self.packing_mode = config.get_string("packing_mode", "rejection")
+        if self.packing_mode not in ["rejection", "occupancy_grid"]:
+            raise Exception("Unknown packing_mode: {}, available are: rejection and occupancy_grid".format(self.packing_mode))
+        self.grid_resolution = config.get_float("grid_resolution", 0.01)
+
         self.placed_objects = []
+        # Broad phase for the collision checks against the placed objects
+        self.placed_objects_grid = BoundingBoxGrid()
         self.surface = None
         self.surface_height = None
 
@@ -108,7 +129,7 @@ def collision(first_obj, second_obj):
         intersection = check_bb_intersection(first_obj, second_obj)
         if intersection:
             # check for more refined collisions
-            intersection, cache = check_intersection(first_obj, second_obj)
+            intersection = check_intersection(first_obj, second_obj)
 
         return intersection
 
@@ -118,8 +139,9 @@ def check_collision_free(self, obj):
         :param obj: Object for which the check is carried out. Type: blender object.
         :return: True if object is collision free, if not - False.
         """
-        for already_placed in self.placed_objects:
-            if self.collision(obj, already_placed):
+        for already_placed in self.placed_objects_grid.query(obj):
+            # The bounding boxes already intersect, so only the refined check is necessary
+            if check_intersection(obj, already_placed):
                 return False
 
         return True
@@ -135,6 +157,212 @@ def drop(self, obj):
 
         obj.location -= self.up_direction * (obj_height - self.surface_height)
 
+    def _place_by_rejection_sampling(self, obj, max_tries):
+        """ Samples poses for the given object until one is collision free, above the surface and well spaced.
+
+        :param obj: The object to place. Type: blender object.
+        :param max_tries: The maximum number of sampled poses.
+        :return: True, if the object was placed.
+        """
+        for i in range(max_tries):
+            position = self.config.get_vector3d("pos_sampler")
+            rotation = self.config.get_vector3d("rot_sampler")
+
+            obj.location = position
+            obj.rotation_euler = rotation
+
+            if not self.check_collision_free(obj):
+                print("Collision detected, retrying!")
+                continue
+
+            if not self.check_above_surface(obj):
+                print("Not above surface, retrying!")
+                continue
+
+            self.drop(obj)
+
+            if not self.check_above_surface(obj):
+                print("Not above surface after drop, retrying!")
+                continue
+
+            if not self.check_spacing(obj):
+                print("Bad spacing after drop, retrying!")
+                continue
+
+            if not self.check_collision_free(obj):
+                print("Collision detected after drop, retrying!")
+                continue
+
+            print("Placed object \"{}\" successfully at {} after {} iterations!".format(obj.name, obj.location, i + 1))
+            self.placed_objects.append(obj)
+            self.placed_objects_grid.add(obj)
+            return True
+        return False
+
+    def _init_occupancy_grid(self):
+        """ Rasterizes the surface into a 2D occupancy grid, in which all cells outside of the surface are occupied.
+
+        A ray is sent down onto the surface at the center of each cell.
+        """
+        # Two orthonormal axes spanning the plane of the surface
+        first_axis = self.up_direction.orthogonal().normalized()
+        self._grid_axes = np.array([first_axis, self.up_direction.cross(first_axis).normalized()])
+
+        surface_corners = np.array(get_bounds(self.surface)) @ self._grid_axes.T
+        self._grid_origin = surface_corners.min(axis=0)
+        grid_shape = np.maximum(np.ceil((surface_corners.max(axis=0) - self._grid_origin) / self.grid_resolution), 1).astype(np.int64)
+        if np.prod(grid_shape) > 10 ** 7:
+            raise Exception("The occupancy grid of the surface would have {} cells, please increase the "
+                            "grid_resolution.".format(np.prod(grid_shape)))
+
+        cells = np.indices(grid_shape).reshape(2, -1).T
+        ray_starts = self._grid_to_world(self._get_cell_centers(cells), self.surface_height + 1.0)
+        # Transform the rays into the local space of the surface
+        inv_world_matrix = np.array(self.surface.matrix_world.inverted())
+        ray_starts = ray_starts @ inv_world_matrix[:3, :3].T + inv_world_matrix[:3, 3]
+        ray_direction = self.surface.matrix_world.inverted().to_3x3() @ (-1 * self.up_direction)
+
+        self._occupancy_grid = np.ones(grid_shape, dtype=bool)
+        for cell, ray_start in zip(cells.tolist(), ray_starts.tolist()):
+            is_hit, _, _, _ = self.surface.ray_cast(ray_start, ray_direction)
+            self._occupancy_grid[cell[0], cell[1]] = not is_hit
+        self._placed_grid_positions = []
+
+    def _get_cell_centers(self, cells):
+        """ Returns the positions of the centers of the given cells in the plane of the occupancy grid.
+
+        :param cells: The cell indices with shape [N, 2].
+        :return: The 2D positions with shape [N, 2].
+        """
+        return self._grid_origin + (cells + 0.5) * self.grid_resolution
+
+    def _grid_to_world(self, positions, height):
+        """ Converts positions in the plane of the occupancy grid to world space.
+
+        :param positions: The 2D positions with shape [N, 2].
+        :param height: The height along the up direction.
+        :return: The 3D positions with shape [N, 3].
+        """
+        return positions @ self._grid_axes + height * np.array(self.up_direction)
+
+    def _get_footprint(self, obj):
+        """ Rasterizes the footprint of the bounding box of the given object around its origin.
+
+        A cell is part of the footprint, if it overlaps with the projection of the bounding box onto the surface plane.
+
+        :param obj: The object with its final rotation. Type: blender object.
+        :return: The footprint as boolean array and the offset of its first cell relative to the cell of the origin.
+        """
+        corners = (np.array(get_bounds(obj)) - np.array(obj.location)) @ self._grid_axes.T
+        offset = np.floor(corners.min(axis=0) / self.grid_resolution).astype(np.int64) - 1
+        end = np.ceil(corners.max(axis=0) / self.grid_resolution).astype(np.int64) + 1
+        cell_offsets = np.indices(end - offset + 1).reshape(2, -1).T + offset
+        cell_centers = cell_offsets * self.grid_resolution
+        # A cell overlaps the footprint, if its center is inside the footprint grown by half a cell diagonal
+        margin = self.grid_resolution * np.sqrt(0.5)
+
+        hull = self._convex_hull_2d(corners)
+        if len(hull) < 3:
+            # The footprint is degenerated to a line or point, use its axis aligned box instead
+            inside = np.all((cell_centers >= corners.min(axis=0) - margin) & (cell_centers <= corners.max(axis=0) + margin), axis=1)
+        else:
+            inside = np.ones(len(cell_centers), dtype=bool)
+            for start, end_point in zip(hull, np.roll(hull, -1, axis=0)):
+                edge = end_point - start
+                # The hull is counterclockwise, so the outward normal points to the right of each edge
+                normal = np.array([edge[1], -edge[0]]) / np.linalg.norm(edge)
+                inside &= (cell_centers - start) @ normal <= margin
+        return inside.reshape(end - offset + 1), offset
+
+    @staticmethod
+    def _convex_hull_2d(points):
+        """ Computes the convex hull of the given 2D points with the monotone chain algorithm.
+
+        :param points: The points with shape [N, 2].
+        :return: The corners of the hull in counterclockwise order with shape [M, 2].
+        """
+        points = sorted(set(map(tuple, points.tolist())))
+        if len(points) < 3:
+            return np.array(points)
+
+        def cross(o, a, b):
+            return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+        lower, upper = [], []
+        for point in points:
+            while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+                lower.pop()
+            lower.append(point)
+        for point in reversed(points):
+            while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+                upper.pop()
+            upper.append(point)
+        return np.array(lower[:-1] + upper[:-1])
+
+    def _find_free_cells(self, footprint, offset):
+        """ Finds all cells, at which the origin of an object with the given footprint can be placed.
+
+        The overlap of the footprint with the occupied cells is computed for all cells at once, as correlation via FFT.
+
+        :param footprint: The footprint as boolean array.
+        :param offset: The offset of the first footprint cell relative to the cell of the origin.
+        :return: The indices of all cells, at which the footprint does not overlap any occupied cell, with shape [N, 2].
+        """
+        # Everything outside of the grid is occupied
+        padding = int(max(np.max(np.abs(offset)), np.max(np.abs(offset + footprint.shape - 1)))) + 1
+        padded_grid = np.pad(self._occupancy_grid, padding, mode="constant", constant_values=True).astype(np.float64)
+        overlap = np.fft.irfft2(np.fft.rfft2(padded_grid) * np.conj(np.fft.rfft2(footprint.astype(np.float64), s=padded_grid.shape)),
+                                s=padded_grid.shape)
+        start = padding + offset
+        overlap = overlap[start[0]:start[0] + self._occupancy_grid.shape[0], start[1]:start[1] + self._occupancy_grid.shape[1]]
+        return np.argwhere(overlap < 0.5)
+
+    def _place_on_occupancy_grid(self, obj, max_tries):
+        """ Places the given object at a random free position of the occupancy grid.
+
+        For each sampled rotation, all positions at which the footprint of the object fits are determined at once.
+
+        :param obj: The object to place. Type: blender object.
+        :param max_tries: The maximum number of sampled rotations.
+        :return: True, if the object was placed.
+        """
+        for i in range(max_tries):
+            obj.rotation_euler = self.config.get_vector3d("rot_sampler")
+            bpy.context.view_layer.update()
+
+            footprint, offset = self._get_footprint(obj)
+            free_cells = self._find_free_cells(footprint, offset)
+            if len(free_cells) > 0 and self._placed_grid_positions:
+                # Keep the distance to the closest placed object in the configured range
+                positions = self._get_cell_centers(free_cells)
+                closest_distance = np.full(len(positions), np.inf)
+                for placed_position in self._placed_grid_positions:
+                    closest_distance = np.minimum(closest_distance, np.linalg.norm(positions - placed_position, axis=1))
+                free_cells = free_cells[(self.min_distance <= closest_distance) & (closest_distance <= self.max_distance)]
+
+            if len(free_cells) == 0:
+                print("No free position for this rotation, retrying!")
+                continue
+
+            cell = free_cells[np.random.randint(len(free_cells))]
+            position = self._get_cell_centers(cell[np.newaxis])[0]
+            obj.location = mathutils.Vector(self._grid_to_world(position[np.newaxis], self.surface_height)[0])
+            bpy.context.view_layer.update()
+            self.drop(obj)
+            bpy.context.view_layer.update()
+
+            # Mark the footprint of the object as occupied
+            cells = np.argwhere(footprint) + offset + cell
+            cells = cells[np.all((cells >= 0) & (cells < self._occupancy_grid.shape), axis=1)]
+            self._occupancy_grid[cells[:, 0], cells[:, 1]] = True
+            self._placed_grid_positions.append(position)
+
+            print("Placed object \"{}\" successfully at {} after {} iterations!".format(obj.name, obj.location, i + 1))
+            self.placed_objects.append(obj)
+            self.placed_objects_grid.add(obj)
+            return True
+        return False
+
     def run(self):
         """ Samples the selected objects poses on a selected surface. """
         max_tries = self.config.get_int("max_iterations", 100)
@@ -149,49 +377,18 @@ def run(self):
 
         surface_bounds = get_bounds(self.surface)
         self.surface_height = max([self.up_direction.dot(corner) for corner in surface_bounds])
+        if self.packing_mode == "occupancy_grid":
+            self._init_occupancy_grid()
 
         for obj in objects:
             if obj.type == "MESH":
 
                 print("Trying to put ", obj.name)
 
-                placed_successfully = False
-
-                for i in range(max_tries):
-                    position = self.config.get_vector3d("pos_sampler")
-                    rotation = self.config.get_vector3d("rot_sampler")
-
-                    obj.location = position
-                    obj.rotation_euler = rotation
-
-                    if not self.check_collision_free(obj):
-                        print("Collision detected, retrying!")
-                        continue
-
-                    if not self.check_above_surface(obj):
-                        print("Not above surface, retrying!")
-                        continue
-
-                    self.drop(obj)
-
-                    if not self.check_above_surface(obj):
-                        print("Not above surface after drop, retrying!")
-                        continue
-
-                    if not self.check_spacing(obj):
-                        print("Bad spacing after drop, retrying!")
-                        continue
-
-                    if not self.check_collision_free(obj):
-                        print("Collision detected after drop, retrying!")
-                        continue
-
-                    print("Placed object \"{}\" successfully at {} after {} iterations!".format(obj.name, obj.location,
-                                                                                                i + 1))
-                    self.placed_objects.append(obj)
-
-                    placed_successfully = True
-                    break
+                if self.packing_mode == "occupancy_grid":
+                    placed_successfully = self._place_on_occupancy_grid(obj, max_tries)
+                else:
+                    placed_successfully = self._place_by_rejection_sampling(obj, max_tries)
 
                 if not placed_successfully:
                     print("Giving up on {}, deleting...".format(obj.name))
@@ -1,9 +1,14 @@
 import bpy
 import mathutils
 import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 
 from src.main.Module import Module
-from src.utility.BlenderUtility import get_all_mesh_objects, get_bound_volume
+from src.utility.BlenderUtility import get_all_mesh_objects, get_bound_volume, get_bounds
+from src.utility.BvhTreeCache import BvhTreeCache
+from src.utility.CollisionProxyCache import CollisionProxyCache
+from src.utility.Utility import Utility
 
 
 class PhysicsPositioning(Module):
@@ -74,6 +79,27 @@ class PhysicsPositioning(Module):
         * - linear_damping
           - Amount of linear velocity that is lost over time. Default: 0.04. Range: [0, 1]
           - float
+        * - simulate_islands_separately
+          - If true, the active objects are split into islands, which can not interact with each other, and each
+            island is simulated on its own until its objects have stopped moving. So an island, which settles fast,
+            does not have to be simulated as long as the slowest island. Default: False.
+          - bool
+        * - island_margin
+          - Two active objects are in the same island, if their bounding boxes projected onto the xy-plane are
+            closer than this margin. As objects fall down, their height is not considered. Default: 0.2.
+          - float
+        * - use_collision_proxies
+          - If true, objects with the collision shape 'CONVEX_HULL' or 'MESH' are simulated with a simplified
+            copy of their final mesh: its convex hull or a decimated version. The render meshes are restored after
+            the simulation. Default: False.
+          - bool
+        * - collision_proxy_max_faces
+          - The maximum number of triangles of the decimated proxies for the collision shape 'MESH'. Default: 2000.
+          - int
+        * - collision_proxy_cache_dir
+          - The directory, in which the proxies are stored by the hash of their mesh, so they can be reused by
+            other runs. If not given, the proxies are only reused within one process. Default: None.
+          - string
     """
 
     def __init__(self, config):
@@ -92,6 +118,15 @@ def __init__(self, config):
         self.friction = self.config.get_float("friction", 0.5)
         self.angular_damping = self.config.get_float("angular_damping",0.1)
         self.linear_damping = self.config.get_float("linear_damping",0.04)
+        self.simulate_islands_separately = self.config.get_bool("simulate_islands_separately", False)
+        self.island_margin = self.config.get_float("island_margin", 0.2)
+        self.use_collision_proxies = self.config.get_bool("use_collision_proxies", False)
+        self.collision_proxy_max_faces = self.config.get_int("collision_proxy_max_faces", 2000)
+        if self.config.has_param("collision_proxy_cache_dir"):
+            self.collision_proxy_cache_dir = Utility.resolve_path(self.config.get_string("collision_proxy_cache_dir"))
+        else:
+            self.collision_proxy_cache_dir = None
+        self._render_meshes = {}
         
     def run(self):
         """ Performs physics simulation in the scene. """
@@ -114,6 +149,8 @@ def run(self):
         obj_poses_before_sim = self._get_pose()
         # perform simulation
         obj_poses_after_sim = self._do_simulation()
+        if self._render_meshes:
+            self._restore_render_meshes(obj_poses_after_sim)
         # reset origin point of all active objects to the total shift location of the 3D cursor
         for obj in get_all_mesh_objects():
             if obj.rigid_body.type == "ACTIVE":
@@ -128,6 +165,8 @@ def run(self):
                 # set 3d cursor location to the total shift of the object
                 bpy.context.scene.cursor.location = origin_shift[obj.name] + obj_poses_after_sim[obj.name]['location']
                 bpy.ops.object.origin_set(type='ORIGIN_CURSOR', center='MEDIAN')
+                # Setting the origin moves the vertices of the mesh
+                BvhTreeCache.invalidate(obj)
                 obj.select_set(False)
 
         # reset 3D cursor location
@@ -149,6 +188,7 @@ def _add_rigidbody(self):
         :return: Object locations after origin point shift. Type: dict.
         """
         locations_after_origin_shift = {}
+        proxy_meshes = {}
         for obj in get_all_mesh_objects():
             bpy.context.view_layer.objects.active = obj
             bpy.ops.rigidbody.object_add()
@@ -169,15 +209,61 @@ def _add_rigidbody(self):
             if obj.rigid_body.type == "ACTIVE":
                 bpy.ops.object.origin_set(type='ORIGIN_CENTER_OF_VOLUME', center='MEDIAN')
                 bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
+                BvhTreeCache.invalidate(obj)
                 locations_after_origin_shift.update({obj.name: obj.location.copy()})
 
             if self.mass_scaling:
                 obj.rigid_body.mass = get_bound_volume(obj) * self.mass_factor
 
+            if self.use_collision_proxies and obj.rigid_body.collision_shape in ["CONVEX_HULL", "MESH"]:
+                self._use_collision_proxy(obj, proxy_meshes)
+
             obj.select_set(False)
 
         return locations_after_origin_shift
 
+    def _use_collision_proxy(self, obj, proxy_meshes):
+        """ Replaces the mesh of the given object by its simplified collision proxy.
+
+        :param obj: The mesh object, whose rigid body is already configured.
+        :param proxy_meshes: Dict mapping proxy keys to the meshes created in this run, so equal proxies are shared.
+        """
+        proxy = CollisionProxyCache.get_proxy(obj, obj.rigid_body.collision_shape, self.collision_proxy_max_faces,
+                                              self.collision_proxy_cache_dir)
+        if proxy is None:
+            return
+        key, vertices, triangles = proxy
+        if key not in proxy_meshes:
+            mesh = bpy.data.meshes.new(obj.data.name + "_collision_proxy")
+            mesh.from_pydata(vertices.tolist(), [], triangles.tolist())
+            proxy_meshes[key] = mesh
+        self._render_meshes[obj] = obj.data
+        obj.data = proxy_meshes[key]
+        # The proxy already contains the result of all modifiers
+        obj.rigid_body.mesh_source = "BASE"
+
+    def _restore_render_meshes(self, poses):
+        """ Puts the render meshes back in place of the collision proxies.
+
+        The active objects are fixed at their simulated poses first, as changing the mesh resets the simulation.
+
+        :param poses: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
+        """
+        for obj in get_all_mesh_objects():
+            if obj.rigid_body.type == "ACTIVE":
+                obj.rigid_body.enabled = False
+                obj.location = poses[obj.name]['location']
+                obj.rotation_euler = poses[obj.name]['rotation']
+
+        proxy_meshes = set()
+        for obj, mesh in self._render_meshes.items():
+            proxy_meshes.add(obj.data)
+            obj.data = mesh
+        for proxy_mesh in proxy_meshes:
+            bpy.data.meshes.remove(proxy_mesh)
+        self._render_meshes = {}
+        bpy.context.view_layer.update()
+
     def _remove_rigidbody(self):
         """ Removes the rigidbody element from all mesh objects. """
         for obj in get_all_mesh_objects():
@@ -203,6 +289,55 @@ def _frames_to_seconds(self, frames):
     def _do_simulation(self):
         """ Perform the simulation.
 
+        If configured, the active objects are split into islands, which are simulated one after another. While one
+        island is simulated, the rigid bodies of all other islands are disabled, so they only act as static colliders.
+        Afterwards the objects of the island are fixed at their final poses.
+
+        :return: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
+        """
+        active_objects = [obj for obj in get_all_mesh_objects() if obj.rigid_body.type == "ACTIVE"]
+        islands = self._split_into_islands(active_objects) if self.simulate_islands_separately else [active_objects]
+        if len(islands) <= 1:
+            return self._simulate_until_objects_stopped()
+
+        poses = {}
+        for i, island in enumerate(islands):
+            print("Simulating island " + str(i + 1) + " of " + str(len(islands)) + " with " + str(len(island)) + " objects")
+            # Changing the enabled flag resets the simulation cache
+            for obj in active_objects:
+                obj.rigid_body.enabled = obj in island
+            island_poses = self._simulate_until_objects_stopped()
+
+            # Keep the objects of this island at their final poses, while the other islands are simulated
+            for obj in island:
+                poses[obj.name] = island_poses[obj.name]
+                obj.rigid_body.enabled = False
+                obj.location = island_poses[obj.name]['location']
+                obj.rotation_euler = island_poses[obj.name]['rotation']
+        bpy.context.view_layer.update()
+        return poses
+
+    def _split_into_islands(self, objects):
+        """ Splits the given objects into groups, which can not collide with objects of other groups.
+
+        Two objects are connected, if their bounding boxes projected onto the xy-plane are closer than the island
+        margin. Each island is a connected component of the resulting graph.
+
+        :param objects: The active objects. Type: list.
+        :return: A list of islands, each island is a list of objects.
+        """
+        if not objects:
+            return []
+        bounds = np.array([get_bounds(obj) for obj in objects])[:, :, :2]
+        bb_min = bounds.min(axis=1) - self.island_margin / 2
+        bb_max = bounds.max(axis=1) + self.island_margin / 2
+        overlapping = np.all((bb_min[:, None] <= bb_max[None, :]) & (bb_min[None, :] <= bb_max[:, None]), axis=2)
+        num_islands, labels = connected_components(csr_matrix(overlapping), directed=False)
+        return [[obj for obj, label in zip(objects, labels) if label == island] for island in range(num_islands)]
+
+    def _simulate_until_objects_stopped(self):
+        """ Simulates the current rigid body world.
+
         This method bakes the simulation for the configured number of iterations and returns all object positions at the last frame.
 
         :return: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
@@ -131,6 +131,14 @@ class RendererInterface(Module):
         * - normals_output_key
           - The key which is used for storing the normal in a merged file. Default: `"normal"`
           - string
+        * - render_object_index
+          - If true, the object index pass is also rendered into the temp dir. The SegMapRenderer can then create
+            the segmentation maps from it with `use_object_index_pass`, instead of rendering the scene again.
+            Default: False
+          - bool
+        * - object_index_output_file_prefix
+          - The file prefix that should be used when writing the object index pass. Default: `"object_index_"`
+          - string
     """
 
     def __init__(self, config):
@@ -205,14 +213,26 @@ def _render(self, default_prefix, default_key, output_key_parameter_name="output
                 self.config.get_string("normals_output_key", "normals")
             )
 
-        RendererUtility.set_output_format(file_format, enable_transparency=enable_transparency)
-        if not self._avoid_rendering:
-            RendererUtility.render(
-                self._determine_output_dir(),
-                self.config.get_string(output_file_prefix_parameter_name, default_prefix),
-                self.config.get_string(output_key_parameter_name, default_key)
+        if self.config.get_bool("render_object_index", False):
+            RendererUtility.enable_object_index_output(
+                self._temp_dir,
+                self.config.get_string("object_index_output_file_prefix", "object_index_")
             )
 
+        RendererUtility.set_output_format(file_format, enable_transparency=enable_transparency)
+        try:
+            if not self._avoid_rendering:
+                RendererUtility.render(
+                    self._determine_output_dir(),
+                    self.config.get_string(output_file_prefix_parameter_name, default_prefix),
+                    self.config.get_string(output_key_parameter_name, default_key)
+                )
+        finally:
+            if self.config.get_bool("render_object_index", False):
+                # The pass indices might be used by other modules, e.g. in materials, and later renderings must not
+                # overwrite the object index images
+                RendererUtility.disable_object_index_output()
+
     def _render_cute(self):
         """
             some additioal recipies added in cuteday's fork
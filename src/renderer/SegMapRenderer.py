@@ -101,6 +101,17 @@ class SegMapRenderer(RendererInterface):
         * - output_file_prefix
           - The file prefix that should be used when writing semantic information to a file. Default: `"segmap_"`
           - string
+        * - output_format
+          - The format in which the segmentation maps are stored. All maps are stored in the smallest integer dtype,
+            which fits all values (floats are only used, if an attribute has non integer values). "npz" stores them
+            zlib compressed, "png" as 8 or 16-bit png, which is only possible for maps with one channel. Default:
+            "npy". Available: ["npy", "npz", "png"].
+          - string
+        * - use_object_index_pass
+          - If true, the scene is not rendered again. Instead, the instance ids are taken from the object index pass,
+            which has to be rendered before by setting `render_object_index` to True in the RgbRenderer. This
+            avoids a complete second rendering. Default: False
+          - bool
 
     **Custom functions**
 
@@ -131,6 +142,23 @@ def run(self):
         if 'class' in used_default_values:
             used_default_values['cp_category_id'] = used_default_values['class']
 
+        if self.config.get_bool("use_object_index_pass", False):
+            # The instance ids were already rendered together with the rgb images, so no rendering is necessary
+            if not self._avoid_rendering:
+                SegMapRendererUtility.render(
+                    self._determine_output_dir(),
+                    self._temp_dir,
+                    used_attributes,
+                    used_default_values,
+                    self.config.get_string("output_file_prefix", "segmap_"),
+                    self.config.get_string("output_key", "segmap"),
+                    self.config.get_string("segcolormap_output_file_prefix", "class_inst_col_map"),
+                    self.config.get_string("segcolormap_output_key", "segcolormap"),
+                    use_object_index_pass=True,
+                    output_format=self.config.get_string("output_format", "npy")
+                )
+            return
+
         with Utility.UndoAfterExecution():
             self._configure_renderer(default_samples=1)
 
@@ -144,5 +172,6 @@ def run(self):
                     self.config.get_string("output_key", "segmap"),
                     self.config.get_string("segcolormap_output_file_prefix", "class_inst_col_map"),
                     self.config.get_string("segcolormap_output_key", "segcolormap"),
-                    use_alpha_channel=self._use_alpha_channel
+                    use_alpha_channel=self._use_alpha_channel,
+                    output_format=self.config.get_string("output_format", "npy")
                 )
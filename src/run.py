@@ -1,6 +1,8 @@
 # blender --background --python run.py  -- <config> [<args>]
 import sys
 import os
+import time
+import traceback
 from sys import platform
 
 
@@ -23,26 +25,78 @@
 # Read args
 argv = sys.argv
 batch_index_file = None
+batch_queue_address = None
+batch_worker_name = "0"
+batch_journal_path = None
+batch_use_staging = "--batch-staging" in argv
 
 if "--batch-process" in argv:
     batch_index_file = argv[argv.index("--batch-process") + 1]
+if "--batch-queue" in argv:
+    batch_queue_address = argv[argv.index("--batch-queue") + 1]
+if "--batch-worker" in argv:
+    batch_worker_name = argv[argv.index("--batch-worker") + 1]
+if "--batch-journal" in argv:
+    batch_journal_path = argv[argv.index("--batch-journal") + 1]
 
 argv = argv[argv.index("--") + 1:]
 working_dir = os.path.dirname(os.path.abspath(__file__))
 
 from src.main.Pipeline import Pipeline
 from src.utility.Utility import Utility
+from src.utility.BatchWorkQueue import BatchWorkQueueClient
+from src.utility.BatchJournal import BatchJournal
 
 config_path = argv[0]
 temp_dir = argv[1]
+
+
+def run_batch_line(line_index, line, journal):
+    """ Runs the pipeline for one line of the batch index file and marks it as completed in the journal.
+
+    :param line_index: The index of the line in the index file.
+    :param line: The line of the index file, containing the placeholder arguments.
+    :param journal: The BatchJournal, in which the line is marked as completed after the outputs were committed.
+    """
+    pipeline = Pipeline(config_path, line.strip().split(" "), working_dir, temp_dir, stage_output_dirs=batch_use_staging,
+                        batch_line_index=line_index, batch_worker_name=batch_worker_name)
+    pipeline.run()
+    journal.mark_completed(line)
+
+
 if batch_index_file == None:
     pipeline = Pipeline(config_path, argv[2:], working_dir, temp_dir)
     pipeline.run()
+elif batch_queue_address is not None:
+    # Worker of a batch pool: pull lines from the work queue of the run.py until there are none left
+    # (the run.py already skipped all lines, which are marked as completed in the journal)
+    journal = BatchJournal(batch_journal_path if batch_journal_path is not None else BatchJournal.default_path(Utility.resolve_path(batch_index_file)))
+    client = BatchWorkQueueClient(batch_queue_address, bytes.fromhex(os.environ["BLENDER_PROC_BATCH_AUTHKEY"]), batch_worker_name)
+    while True:
+        next_line = client.next_line()
+        if next_line is None:
+            break
+        line_index, line = next_line
+        start = time.time()
+        try:
+            run_batch_line(line_index, line, journal)
+        except Exception as e:
+            # A failing line should not stop the remaining lines of this worker
+            traceback.print_exc()
+            client.report(line_index, False, time.time() - start, repr(e))
+        else:
+            client.report(line_index, True, time.time() - start)
+    client.close()
 else:
+    journal = BatchJournal(batch_journal_path if batch_journal_path is not None else BatchJournal.default_path(Utility.resolve_path(batch_index_file)))
     with open(Utility.resolve_path(batch_index_file), "r") as f:
         lines = f.readlines()
 
-        for line in lines:
-            args = line.split(" ")
-            pipeline = Pipeline(config_path, args, working_dir, temp_dir)
-            pipeline.run()
+        for line_index, line in enumerate(lines):
+            if not line.strip():
+                continue
+            # Skip all lines which were completed by a previous run
+            if journal.is_completed(line):
+                print("Skipping already completed line: " + line.strip())
+                continue
+            run_batch_line(line_index, line, journal)
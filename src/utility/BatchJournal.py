@@ -0,0 +1,61 @@
+import os
+
+
+class BatchJournal(object):
+    """ An append-only journal of all lines of a batch index file, which have been completed successfully.
+
+    Each completed line is appended as a single line to the journal file. When a batch run is restarted, the journal
+    is read once and all lines contained in it are skipped, each check is a lookup in a set.
+
+    Lines are identified by their content (without surrounding whitespace), so reordering or extending the index file
+    between two runs is possible.
+
+    This module does not depend on bpy, as it is used from the run.py and from inside of blender.
+    """
+
+    def __init__(self, journal_path):
+        """
+        :param journal_path: The path to the journal file, it is created if it does not exist yet.
+        """
+        self._journal_path = journal_path
+        self._completed_lines = set()
+        if os.path.exists(journal_path):
+            with open(journal_path, "r") as f:
+                for line in f:
+                    # A line without newline was not written completely, so ignore it
+                    if line.endswith("\n"):
+                        self._completed_lines.add(line.strip())
+
+    @staticmethod
+    def default_path(batch_index_file):
+        """ Returns the default journal path for the given index file.
+
+        :param batch_index_file: The path to the batch index file.
+        :return: The path of the journal, which is placed next to the index file.
+        """
+        return batch_index_file + ".journal"
+
+    def is_completed(self, line):
+        """ Checks if the given line was already completed in a previous run.
+
+        :param line: The line of the index file.
+        :return: True, if the line is contained in the journal.
+        """
+        return line.strip() in self._completed_lines
+
+    def mark_completed(self, line):
+        """ Appends the given line to the journal.
+
+        The line is written with one write call in append mode and synced to disk, such that a crash can not leave
+        other entries of the journal in a broken state.
+
+        :param line: The line of the index file.
+        """
+        line = line.strip()
+        fd = os.open(self._journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (line + "\n").encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._completed_lines.add(line)
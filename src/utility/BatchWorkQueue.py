@@ -0,0 +1,159 @@
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+
+class BatchWorkQueue(object):
+    """ A local work queue which hands out the lines of a batch index file to a pool of blender workers.
+
+    The queue is served over a local socket by the run.py, which is started outside of blender. Each blender worker
+    connects via the BatchWorkQueueClient, requests the next line, runs the pipeline for it and reports back whether
+    it succeeded and how long it took. If a worker dies while processing a line, this line is marked as failed, the
+    remaining lines are then processed by the other workers.
+
+    This module does not depend on bpy, as it is used from the run.py and from inside of blender.
+    """
+
+    def __init__(self, lines, authkey):
+        """
+        :param lines: A list of tuples (line_index, line), which should be processed.
+        :param authkey: The key, which the workers have to use to connect to this queue.
+        """
+        self._pending = list(reversed(lines))
+        self._results = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._listener = Listener(("localhost", 0), authkey=authkey)
+        self._accept_thread = threading.Thread(target=self._accept_connections)
+        self._accept_thread.daemon = True
+
+    @property
+    def address(self):
+        """ The address of the queue in the form "host:port". """
+        return "{}:{}".format(*self._listener.address)
+
+    def start(self):
+        """ Starts accepting connections from workers in a background thread. """
+        self._accept_thread.start()
+
+    def _accept_connections(self):
+        """ Accepts new worker connections and serves each of them in its own thread. """
+        while True:
+            try:
+                connection = self._listener.accept()
+            except AuthenticationError:
+                # A connection with a wrong key is dropped, the queue keeps serving the workers
+                print("Warning: Rejected a connection to the batch work queue with a wrong authkey")
+                continue
+            except (OSError, IOError, EOFError):
+                if self._closed:
+                    break
+                # The connection was lost during the handshake
+                continue
+            worker_thread = threading.Thread(target=self._serve_worker, args=(connection,))
+            worker_thread.daemon = True
+            worker_thread.start()
+
+    def _serve_worker(self, connection):
+        """ Answers the requests of one worker until it disconnects.
+
+        :param connection: The connection to the worker.
+        """
+        current_line = None
+        worker_name = "unknown"
+        try:
+            while True:
+                message = connection.recv()
+                if message[0] == "next":
+                    worker_name = message[1]
+                    with self._lock:
+                        current_line = self._pending.pop() if self._pending else None
+                    connection.send(current_line)
+                elif message[0] == "done":
+                    _, line_index, success, duration, error = message
+                    self._add_result(line_index, worker_name, success, duration, error)
+                    current_line = None
+                else:
+                    raise Exception("Unknown message of batch worker: {}".format(message))
+        except (EOFError, OSError, IOError):
+            # The worker disconnected, if it was processing a line, it crashed during that line
+            if current_line is not None:
+                self._add_result(current_line[0], worker_name, False, None, "Worker terminated unexpectedly")
+        finally:
+            connection.close()
+
+    def _add_result(self, line_index, worker_name, success, duration, error):
+        """ Stores and prints the result of one processed line. """
+        with self._lock:
+            self._results.append((line_index, worker_name, success, duration, error))
+        status = "succeeded" if success else "failed ({})".format(error)
+        duration_str = "%.3f seconds" % duration if duration is not None else "unknown time"
+        print("Batch line {} {} on worker {} after {}".format(line_index, status, worker_name, duration_str))
+
+    def close(self):
+        """ Stops accepting new workers. """
+        self._closed = True
+        self._listener.close()
+
+    def failed_lines(self):
+        """ Returns the indices of all lines, which failed or were never processed.
+
+        :return: A sorted list of line indices.
+        """
+        with self._lock:
+            succeeded = set(result[0] for result in self._results if result[2])
+            unprocessed = [line[0] for line in self._pending]
+            failed = [result[0] for result in self._results if not result[2]]
+        return sorted(set(failed + unprocessed) - succeeded)
+
+    def print_summary(self):
+        """ Prints the timing of all processed lines and lists all failed lines. """
+        with self._lock:
+            results = sorted(self._results)
+        durations = [result[3] for result in results if result[2]]
+        print("#### Batch processing summary ####")
+        for line_index, worker_name, success, duration, error in results:
+            print("Line {}: {} on worker {}{}".format(line_index, "succeeded" if success else "failed",
+                                                      worker_name, " (took %.3f seconds)" % duration if duration is not None else ""))
+        if durations:
+            print("Processed {} lines successfully, mean time per line: {:.3f} seconds".format(
+                len(durations), sum(durations) / len(durations)))
+        failed_lines = self.failed_lines()
+        if failed_lines:
+            print("Failed lines: {}".format(", ".join(str(line_index) for line_index in failed_lines)))
+
+
+class BatchWorkQueueClient(object):
+    """ The worker side of the BatchWorkQueue, which is used inside of blender by the src/run.py. """
+
+    def __init__(self, address, authkey, worker_name):
+        """
+        :param address: The address of the queue in the form "host:port".
+        :param authkey: The key, which is needed to connect to the queue.
+        :param worker_name: A name for this worker, which is used when reporting results.
+        """
+        host, port = address.rsplit(":", 1)
+        self._connection = Client((host, int(port)), authkey=authkey)
+        self._worker_name = worker_name
+
+    def next_line(self):
+        """ Requests the next line from the queue.
+
+        :return: A tuple (line_index, line) or None if there are no more lines.
+        """
+        self._connection.send(("next", self._worker_name))
+        return self._connection.recv()
+
+    def report(self, line_index, success, duration, error=None):
+        """ Reports the result of the processing of the given line back to the queue.
+
+        :param line_index: The index of the processed line.
+        :param success: True, if the pipeline for this line ran through.
+        :param duration: The time in seconds it took to process this line.
+        :param error: A description of the error, if the line failed.
+        """
+        self._connection.send(("done", line_index, success, duration, error))
+
+    def close(self):
+        """ Closes the connection to the queue. """
+        self._connection.close()
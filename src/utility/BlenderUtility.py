@@ -7,6 +7,8 @@
 import numpy as np
 import imageio
 
+from src.utility.BvhTreeCache import BvhTreeCache
+
 
 def local_to_world(cords, world):
     """
@@ -81,11 +83,13 @@ def is_overlapping_1D(x_min_1, x_max_1, x_min_2, x_max_2):
     return collide
 
 
-def check_intersection(obj1, obj2, skip_inside_check=False, bvh_cache=None):
+def check_intersection(obj1, obj2, skip_inside_check=False):
     """
     Checks if the two objects are intersecting.
 
-    This will use BVH trees to check whether the objects are overlapping.
+    This will use BVH trees to check whether the objects are overlapping. The world space trees are taken from the
+    BvhTreeCache, so the tree of an object is only rebuilt if it was moved. When checking a new pose of an object
+    against many other objects, its tree is therefore only built once.
 
     It is further also checked if one object is completely inside the other.
     This check requires that both objects are watertight, have correct normals and are coherent.
@@ -96,57 +100,44 @@ def check_intersection(obj1, obj2, skip_inside_check=False, bvh_cache=None):
     :param skip_inside_check: Disables checking whether one object is completely inside the other.
     :return: True, if they are intersecting
     """
-
-    if bvh_cache is None:
-        bvh_cache = {}
-
-    # create bvhtree for obj1
-    if obj1.name not in bvh_cache:
-        obj1_BVHtree = create_bvh_tree_for_object(obj1)
-        bvh_cache[obj1.name] = obj1_BVHtree
-    else:
-        obj1_BVHtree = bvh_cache[obj1.name]
-
-    # create bvhtree for obj2
-    if obj2.name not in bvh_cache:
-        obj2_BVHtree = create_bvh_tree_for_object(obj2)
-        bvh_cache[obj2.name] = obj2_BVHtree
-    else:
-        obj2_BVHtree = bvh_cache[obj2.name]
-
     # Check whether both meshes intersect
-    inter = len(obj1_BVHtree.overlap(obj2_BVHtree)) > 0
+    inter = len(BvhTreeCache.get_world_tree(obj1).overlap(BvhTreeCache.get_world_tree(obj2))) > 0
 
     # Optionally check whether obj2 is contained in obj1
     if not inter and not skip_inside_check:
-        inter = is_point_inside_object(obj1, obj1_BVHtree, obj2.matrix_world @ obj2.data.vertices[0].co)
-        print("Warning: Detected that " + obj2.name + " is completely inside " + obj1.name +
-              ". This might be wrong, if " + obj1.name +
-              " is not water tight or has incorrect normals. If that is the case, consider setting "
-              "skip_inside_check to True.")
+        inter = _is_point_inside_object_in_local_space(obj1, obj2.matrix_world @ obj2.data.vertices[0].co)
+        if inter:
+            print("Warning: Detected that " + obj2.name + " is completely inside " + obj1.name +
+                  ". This might be wrong, if " + obj1.name +
+                  " is not water tight or has incorrect normals. If that is the case, consider setting "
+                  "skip_inside_check to True.")
 
     # Optionally check whether obj1 is contained in obj2
     if not inter and not skip_inside_check:
-        inter = is_point_inside_object(obj2, obj2_BVHtree, obj1.matrix_world @ obj1.data.vertices[0].co)
-        print("Warning: Detected that " + obj1.name + " is completely inside " + obj2.name +
-              ". This might be wrong, if " + obj2.name + " is not water tight or has incorrect "
-                                                         "normals. If that is the case, consider "
-                                                         "setting skip_inside_check to True.")
+        inter = _is_point_inside_object_in_local_space(obj2, obj1.matrix_world @ obj1.data.vertices[0].co)
+        if inter:
+            print("Warning: Detected that " + obj1.name + " is completely inside " + obj2.name +
+                  ". This might be wrong, if " + obj2.name + " is not water tight or has incorrect "
+                                                             "normals. If that is the case, consider "
+                                                             "setting skip_inside_check to True.")
+
+    return inter
 
-    return inter, bvh_cache
 
+def _is_point_inside_object_in_local_space(obj, point):
+    """ Checks whether the given point is inside the given object, by using the local space bvh tree of the object.
 
-def create_bvh_tree_for_object(obj):
-    """ Creates a fresh BVH tree for the given object
+    This only works if the given object is watertight and has correct normals
 
     :param obj: The object
-    :return: The BVH tree
+    :param point: The point to check in world space
+    :return: True, if the point is inside the object
     """
-    bm = bmesh.new()
-    bm.from_mesh(obj.data)
-    bm.transform(obj.matrix_world)
-    obj_BVHtree = mathutils.bvhtree.BVHTree.FromBMesh(bm)
-    return obj_BVHtree
+    point = obj.matrix_world.inverted() @ point
+    # Look for closest point on object
+    nearest, normal, _, _ = BvhTreeCache.get_local_tree(obj).find_nearest(point)
+    # Compute dot product between direction and normal vector
+    return (nearest - point).normalized().dot(normal.normalized()) >= 0.0
 
 
 def is_point_inside_object(obj, obj_BVHtree, point):
@@ -317,14 +308,14 @@ def get_all_textures():
 def load_image(file_path, num_channels=3):
     """ Load the image at the given path returns its pixels as a numpy array.
 
-    The alpha channel is neglected.
+    The alpha channel is neglected. Images with only one channel are returned with the shape [H, W].
 
     :param file_path: The path to the image.
     :param num_channels: Number of channels to return.
     :return: The numpy array
     """
     try:
-        return imageio.imread(file_path)[:, :, :num_channels]
+        return _select_channels(imageio.imread(file_path), num_channels)
     except ValueError as e:
         print("It seems the freeimage library which is necessary to read .exr files cannot be found on your computer.")
         print("Gonna try to download it automatically.")
@@ -346,7 +337,7 @@ def load_image(file_path, num_channels=3):
 
         try:
             # Try again
-            return imageio.imread(file_path)[:, :, :num_channels]
+            return _select_channels(imageio.imread(file_path), num_channels)
         except ValueError as e:
             error = "The automatic installation of the freeimage library failed, so you need to install the imageio .exr extension manually. This is quite simple: \n"
             error += "Use a different python environment (not blenders internal environment), `pip install imageio`.\n"
@@ -358,6 +349,33 @@ def load_image(file_path, num_channels=3):
 
 
 
+def _select_channels(image, num_channels):
+    """ Returns the first num_channels channels of the given image, images without channel dimension are kept as is.
+
+    :param image: The image as numpy array.
+    :param num_channels: Number of channels to return.
+    :return: The numpy array
+    """
+    if image.ndim == 2:
+        return image
+    return image[:, :, :num_channels]
+
+
+def load_segmap(file_path):
+    """ Loads a segmentation map written by the SegMapRenderer.
+
+    :param file_path: The path to the .npy, .npz or .png file.
+    :return: The segmentation map as numpy array.
+    """
+    if file_path.endswith(".png"):
+        return imageio.imread(file_path)
+    data = np.load(file_path)
+    if isinstance(data, np.lib.npyio.NpzFile):
+        # the compressed container only holds the segmentation map
+        data = data[data.files[0]]
+    return data
+
+
 def get_bound_volume(obj):
     """ Gets the volume of a possible orientated bounding box.
     :param obj: Mesh object.
@@ -379,11 +397,12 @@ def get_bound_volume(obj):
     return abs(diag[0]) * abs(diag[1]) * abs(diag[2])
 
 
-def duplicate_objects(objects):
+def duplicate_objects(objects, linked=False):
     """
     Creates duplicates of objects, first duplicates are given name <orignial_object_name>.001
     
     :param objects: an object or a list of objects to be duplicated
+    :param linked: if true, the duplicates share the mesh and materials with their originals instead of copying them
     :return: a list of objects
     """
     if not isinstance(objects, list):
@@ -392,7 +411,7 @@ def duplicate_objects(objects):
     bpy.ops.object.select_all(action='DESELECT')
     for obj in objects:
         obj.select_set(True)
-    bpy.ops.object.duplicate()
+    bpy.ops.object.duplicate(linked=linked)
     duplicates = bpy.context.selected_objects
     bpy.ops.object.select_all(action='DESELECT')
     return duplicates
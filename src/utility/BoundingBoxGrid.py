@@ -0,0 +1,126 @@
+import itertools
+from collections import defaultdict
+
+import numpy as np
+
+
+class BoundingBoxGrid:
+    """ A uniform grid over the axis aligned bounding boxes of objects, which is used as broad phase for collision checks.
+
+    Each object is registered in all grid cells its bounding box overlaps. A query then only looks at the objects in
+    the cells overlapped by the query box, instead of at all objects. Objects which would cover too many cells, like
+    walls or floors, are kept in a separate list, which is checked in every query.
+
+    The cell size is the median size of the registered objects. The grid is rebuilt with a new cell size every time
+    the number of objects has doubled, so adding n objects takes O(n log n) in total.
+    """
+
+    def __init__(self, objects=None, max_cells_per_object=64):
+        """
+        :param objects: The objects, which should be added to the grid.
+        :param max_cells_per_object: Objects which overlap more cells are not stored in the grid, but in a list.
+        """
+        self._max_cells_per_object = max_cells_per_object
+        self._cell_size = None
+        self._bounds = {}
+        self._cells = defaultdict(set)
+        self._large_objects = set()
+        # Before the first rebuild all objects are in the list of large objects
+        self._next_rebuild = 8
+        for obj in objects if objects is not None else []:
+            self.add(obj)
+
+    @staticmethod
+    def get_aabb(obj):
+        """ Returns the axis aligned bounding box of the given object in world space.
+
+        :param obj: A mesh object.
+        :return: The minimum and maximum corner as numpy arrays.
+        """
+        # Imported here, as the BlenderUtility needs blender, while the grid itself can be used without
+        from src.utility.BlenderUtility import get_bounds
+
+        corners = np.array(get_bounds(obj))
+        return np.min(corners, axis=0), np.max(corners, axis=0)
+
+    def add(self, obj):
+        """ Adds the given object with its current bounding box to the grid.
+
+        :param obj: A mesh object.
+        """
+        if obj in self._bounds:
+            self.remove(obj)
+        self._bounds[obj] = self.get_aabb(obj)
+        if len(self._bounds) >= self._next_rebuild:
+            self._next_rebuild *= 2
+            self._rebuild()
+        else:
+            self._insert(obj)
+
+    def remove(self, obj):
+        """ Removes the given object from the grid, this has to be done before an object is deleted.
+
+        :param obj: A mesh object, which was added before.
+        """
+        if obj not in self._bounds:
+            return
+        cells = self._get_cells(*self._bounds.pop(obj))
+        if cells is None:
+            self._large_objects.discard(obj)
+        else:
+            for cell in cells:
+                self._cells[cell].discard(obj)
+
+    def query(self, obj):
+        """ Returns all objects in the grid, whose bounding box intersects the current bounding box of the given object.
+
+        :param obj: A mesh object, it is never contained in the result.
+        :return: A list of objects.
+        """
+        bb_min, bb_max = self.get_aabb(obj)
+        cells = self._get_cells(bb_min, bb_max)
+        if cells is None:
+            candidates = self._bounds.keys()
+        else:
+            candidates = set(self._large_objects)
+            for cell in cells:
+                candidates.update(self._cells.get(cell, ()))
+
+        return [candidate for candidate in candidates if candidate != obj and
+                np.all(self._bounds[candidate][1] >= bb_min) and np.all(bb_max >= self._bounds[candidate][0])]
+
+    def _get_cells(self, bb_min, bb_max):
+        """ Returns the grid cells overlapped by the given bounding box.
+
+        :param bb_min: The minimum corner of the bounding box.
+        :param bb_max: The maximum corner of the bounding box.
+        :return: A list of cell indices or None, if the box overlaps too many cells or the grid has no cell size yet.
+        """
+        if self._cell_size is None:
+            return None
+        min_cell = np.floor(bb_min / self._cell_size).astype(np.int64)
+        max_cell = np.floor(bb_max / self._cell_size).astype(np.int64)
+        if np.prod(max_cell - min_cell + 1) > self._max_cells_per_object:
+            return None
+        return list(itertools.product(*[range(start, end + 1) for start, end in zip(min_cell, max_cell)]))
+
+    def _insert(self, obj):
+        """ Registers the given object in all cells overlapped by its bounding box.
+
+        :param obj: A mesh object, whose bounding box is already stored.
+        """
+        cells = self._get_cells(*self._bounds[obj])
+        if cells is None:
+            self._large_objects.add(obj)
+        else:
+            for cell in cells:
+                self._cells[cell].add(obj)
+
+    def _rebuild(self):
+        """ Chooses the median object size as cell size and inserts all objects again. """
+        sizes = [np.max(bb_max - bb_min) for bb_min, bb_max in self._bounds.values()]
+        self._cell_size = max(float(np.median(sizes)), 1e-3)
+        self._cells = defaultdict(set)
+        self._large_objects = set()
+        for obj in self._bounds:
+            self._insert(obj)
@@ -0,0 +1,138 @@
+import mathutils
+import numpy as np
+
+
+class BvhTreeCache:
+    """ Caches the bvh trees of mesh objects for all modules of one pipeline run.
+
+    The vertices and polygons of each mesh are read once and kept in local space, together with a bvh tree in local
+    space, which does not depend on the pose of an object at all. Additionally each object has a bvh tree in world
+    space, which is only rebuilt from the cached vertices if the object was moved. So during a pose sampling, the tree
+    of the sampled object is built once per pose and reused for all objects it is checked against, while the trees of
+    objects which are not moved, like walls or static furniture, are only built once per scene.
+
+    A mesh is identified by its data block and its number of vertices, loops and polygons, so looking up a cached tree
+    does not read the mesh. Modules which move the vertices of a mesh without changing these numbers, e.g. by
+    applying a transformation or setting the origin, have to call invalidate() for the changed objects.
+    """
+
+    # Maps each mesh pointer to a tuple (mesh key, (vertices in local space, polygons, bounds))
+    _local_geometries = {}
+    # Maps each mesh pointer to a tuple (mesh key, bvh tree in local space)
+    _trees = {}
+    # Maps each object pointer to a tuple (mesh pointer, mesh key, matrix key, bvh tree in world space)
+    _world_trees = {}
+
+    @staticmethod
+    def _get_mesh_key(mesh):
+        """ Returns the key which identifies the current geometry of the given mesh.
+
+        :param mesh: The mesh data block.
+        :return: A tuple identifying the mesh.
+        """
+        return mesh.name_full, len(mesh.vertices), len(mesh.loops), len(mesh.polygons)
+
+    @staticmethod
+    def get_local_geometry(obj):
+        """ Returns the vertices and polygons of the mesh of the given object in local space.
+
+        :param obj: The mesh object.
+        :return: The vertices as numpy array with shape [N, 3] and the polygons as list of vertex index lists.
+        """
+        return BvhTreeCache._get_cached_local_geometry(obj)[1][:2]
+
+    @staticmethod
+    def get_local_bounds(obj):
+        """ Returns the axis aligned bounding box of the mesh of the given object in local space.
+
+        :param obj: The mesh object.
+        :return: The minimum and maximum corner as numpy arrays.
+        """
+        return BvhTreeCache._get_cached_local_geometry(obj)[1][2]
+
+    @staticmethod
+    def _get_cached_local_geometry(obj):
+        """ Reads the geometry of the mesh of the given object, if it is not cached yet or its key has changed.
+
+        :param obj: The mesh object.
+        :return: A tuple (mesh key, (vertices, polygons, bounds)).
+        """
+        mesh = obj.data
+        mesh_key = BvhTreeCache._get_mesh_key(mesh)
+
+        cached = BvhTreeCache._local_geometries.get(mesh.as_pointer())
+        if cached is None or cached[0] != mesh_key:
+            vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", vertices)
+            loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+            mesh.loops.foreach_get("vertex_index", loop_vertices)
+            loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+            mesh.polygons.foreach_get("loop_start", loop_starts)
+            loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+            mesh.polygons.foreach_get("loop_total", loop_totals)
+            polygons = [loop_vertices[start:start + total].tolist() for start, total in zip(loop_starts, loop_totals)]
+
+            vertices = vertices.reshape(-1, 3).astype(np.float64)
+            if len(vertices) > 0:
+                bounds = (vertices.min(axis=0), vertices.max(axis=0))
+            else:
+                bounds = (np.zeros(3), np.zeros(3))
+            cached = (mesh_key, (vertices, polygons, bounds))
+            BvhTreeCache._local_geometries[mesh.as_pointer()] = cached
+        return cached
+
+    @staticmethod
+    def get_local_tree(obj):
+        """ Returns a bvh tree of the given object in its local space, which is rebuilt if the mesh changed.
+
+        :param obj: The mesh object.
+        :return: The bvh tree.
+        """
+        mesh_key, (vertices, polygons, _) = BvhTreeCache._get_cached_local_geometry(obj)
+        cached = BvhTreeCache._trees.get(obj.data.as_pointer())
+        if cached is not None and cached[0] == mesh_key:
+            return cached[1]
+
+        bvh_tree = mathutils.bvhtree.BVHTree.FromPolygons(vertices.tolist(), polygons)
+        BvhTreeCache._trees[obj.data.as_pointer()] = (mesh_key, bvh_tree)
+        return bvh_tree
+
+    @staticmethod
+    def get_world_tree(obj):
+        """ Returns a bvh tree of the given object in world space, which is rebuilt if the object moved or its mesh changed.
+
+        :param obj: The mesh object.
+        :return: The bvh tree.
+        """
+        mesh_key, (vertices, polygons, _) = BvhTreeCache._get_cached_local_geometry(obj)
+        matrix_key = tuple(value for row in obj.matrix_world for value in row)
+        cached = BvhTreeCache._world_trees.get(obj.as_pointer())
+        if cached is not None and cached[:3] == (obj.data.as_pointer(), mesh_key, matrix_key):
+            return cached[3]
+
+        matrix = np.array(obj.matrix_world)
+        world_vertices = vertices @ matrix[:3, :3].T + matrix[:3, 3]
+        bvh_tree = mathutils.bvhtree.BVHTree.FromPolygons(world_vertices.tolist(), polygons)
+        BvhTreeCache._world_trees[obj.as_pointer()] = (obj.data.as_pointer(), mesh_key, matrix_key, bvh_tree)
+        return bvh_tree
+
+    @staticmethod
+    def invalidate(obj):
+        """ Removes all cached data of the mesh of the given object, this is necessary if its vertices were moved.
+
+        :param obj: The mesh object.
+        """
+        if obj.type == "MESH":
+            BvhTreeCache._local_geometries.pop(obj.data.as_pointer(), None)
+            BvhTreeCache._trees.pop(obj.data.as_pointer(), None)
+            # Remove the world space trees of all objects using this mesh
+            for obj_pointer in [obj_pointer for obj_pointer, cached in BvhTreeCache._world_trees.items()
+                                if cached[0] == obj.data.as_pointer()]:
+                del BvhTreeCache._world_trees[obj_pointer]
+
+    @staticmethod
+    def clear():
+        """ Removes all cached data, this is done at the start of each pipeline. """
+        BvhTreeCache._local_geometries = {}
+        BvhTreeCache._trees = {}
+        BvhTreeCache._world_trees = {}
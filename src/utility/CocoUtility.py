@@ -1,5 +1,4 @@
 import datetime
-from itertools import groupby
 
 import numpy as np
 from skimage import measure
@@ -56,6 +55,9 @@ def generate_coco_annotations(segmentation_map_paths, image_paths, inst_attribut
             "date_created": datetime.datetime.utcnow().isoformat(' ')
         }
 
+        # Imported here, as the BlenderUtility needs blender, while all other functions of this class can be used without
+        from src.utility.BlenderUtility import load_segmap
+
         images = []
         annotations = []
 
@@ -63,27 +65,28 @@ def generate_coco_annotations(segmentation_map_paths, image_paths, inst_attribut
             
             # Load instance map
             inst_channel = int(inst_attribute_maps[0]['channel_instance'])
-            segmentation_map = np.load(segmentation_map_path)[:,:,inst_channel]
+            segmentation_map = load_segmap(segmentation_map_path)
+            if segmentation_map.ndim == 3:
+                segmentation_map = segmentation_map[:, :, inst_channel]
 
             # Add coco info for image
             image_id = len(images)
             images.append(CocoUtility.create_image_info(image_id, image_path, segmentation_map.shape))
 
-            # Go through all objects visible in this image
-            instances = np.unique(segmentation_map)
-            
-            # Remove background
-            instances = np.delete(instances, np.where(instances == 0))
-            for inst in instances:
-                if inst in instance_2_category_map:
-                    # Calc object mask
-                    binary_inst_mask = np.where(segmentation_map == inst, 1, 0)
+            # Go through all objects visible in this image, their bboxes and areas are computed in one pass
+            instances, bboxes, areas = CocoUtility.calc_bboxes_and_areas(segmentation_map)
+            for inst, bbox, area in zip(instances, bboxes, areas):
+                # Skip background
+                if inst != 0 and inst in instance_2_category_map:
                     # Add coco info for object in this image
-                    annotation = CocoUtility.create_annotation_info(len(annotations),
-                                                                    image_id,
-                                                                    instance_2_category_map[inst],
-                                                                    binary_inst_mask,
-                                                                    mask_encoding_format)
+                    annotation = CocoUtility.create_instance_annotation_info(len(annotations),
+                                                                             image_id,
+                                                                             instance_2_category_map[inst],
+                                                                             segmentation_map,
+                                                                             inst,
+                                                                             bbox,
+                                                                             area,
+                                                                             mask_encoding_format)
                     if annotation is not None:
                         annotations.append(annotation)
 
@@ -193,6 +196,79 @@ def create_annotation_info(annotation_id, image_id, category_id, binary_mask, ma
         }
         return annotation_info
 
+    @staticmethod
+    def create_instance_annotation_info(annotation_id, image_id, category_id, segmentation_map, instance, bbox, area,
+                                        mask_encoding_format, tolerance=2):
+        """Creates info section of coco annotation for one instance of the given segmentation map
+
+        In contrast to create_annotation_info(), only the region of the segmentation map inside the bbox of the
+        instance is processed.
+
+        :param annotation_id: integer to uniquly identify the annotation
+        :param image_id: integer to uniquly identify image
+        :param category_id: Id of the category
+        :param segmentation_map: The instance segmentation map with the shape [H, W].
+        :param instance: The instance id in the segmentation map.
+        :param bbox: The bounding box of the instance represented as [x, y, width, height], see calc_bboxes_and_areas().
+        :param area: The number of pixels of the instance.
+        :param mask_encoding_format: Encoding format of the mask. Type: string.
+        :param tolerance: The tolerance for fitting polygons to the objects mask.
+        """
+        if area < 1:
+            return None
+
+        x, y, w, h = bbox
+        cropped_binary_mask = segmentation_map[y:y + h, x:x + w] == instance
+
+        if mask_encoding_format == 'rle':
+            segmentation = CocoUtility.binary_mask_to_rle(cropped_binary_mask, segmentation_map.shape, (y, x))
+        elif mask_encoding_format == 'polygon':
+            segmentation = CocoUtility.binary_mask_to_polygon(cropped_binary_mask.astype(np.uint8), tolerance, (y, x))
+            if not segmentation:
+                return None
+        else:
+            raise RuntimeError("Unknown encoding format: {}".format(mask_encoding_format))
+
+        annotation_info = {
+            "id": annotation_id,
+            "image_id": image_id,
+            "category_id": category_id,
+            "iscrowd": 0,
+            "area": int(area),
+            "bbox": [int(value) for value in bbox],
+            "segmentation": segmentation,
+            "width": segmentation_map.shape[1],
+            "height": segmentation_map.shape[0],
+        }
+        return annotation_info
+
+    @staticmethod
+    def calc_bboxes_and_areas(segmentation_map):
+        """ Computes the bounding boxes and areas of all instances in the given segmentation map in one pass.
+
+        The pixels are sorted by their instance id, s.t. the pixels of each instance form one contiguous group.
+
+        :param segmentation_map: An instance segmentation map with the shape [H, W].
+        :return: The instance ids, their bounding boxes represented as [x, y, width, height] with shape [N, 4] and
+                 their areas.
+        """
+        labels = segmentation_map.ravel()
+        if labels.size == 0:
+            return labels[:0], np.zeros((0, 4), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pixel_indices = np.argsort(labels, kind="stable")
+        sorted_labels = labels[pixel_indices]
+        group_starts = np.flatnonzero(np.concatenate(([True], sorted_labels[1:] != sorted_labels[:-1])))
+        instances = sorted_labels[group_starts]
+        areas = np.diff(np.append(group_starts, labels.size))
+
+        rows, cols = np.divmod(pixel_indices, segmentation_map.shape[1])
+        rmin = np.minimum.reduceat(rows, group_starts)
+        rmax = np.maximum.reduceat(rows, group_starts)
+        cmin = np.minimum.reduceat(cols, group_starts)
+        cmax = np.maximum.reduceat(cols, group_starts)
+        bboxes = np.stack([cmin, rmin, cmax - cmin + 1, rmax - rmin + 1], axis=1)
+        return instances, bboxes, areas
+
     @staticmethod
     def bbox_from_binary_mask(binary_mask):
         """ Returns the smallest bounding box containing all pixels marked "1" in the given image mask.
@@ -233,12 +309,13 @@ def close_contour(contour):
         return contour
 
     @staticmethod
-    def binary_mask_to_polygon(binary_mask, tolerance=0):
+    def binary_mask_to_polygon(binary_mask, tolerance=0, offset=(0, 0)):
         """Converts a binary mask to COCO polygon representation
 
          :param binary_mask: a 2D binary numpy array where '1's represent the object
          :param tolerance: Maximum distance from original points of polygon to approximated polygonal chain. If
                            tolerance is 0, the original coordinate array is returned.
+         :param offset: The position [row, col] of the mask inside the image, if the mask is cropped.
         """
         polygons = []
         # pad mask to close contours of shapes which start and end at an edge
@@ -247,6 +324,8 @@ def binary_mask_to_polygon(binary_mask, tolerance=0):
         # Reverse padding
         contours = contours - 1
         for contour in contours:
+            # Reverse cropping
+            contour = contour + np.array(offset)
             # Make sure contour is closed
             contour = CocoUtility.close_contour(contour)
             # Approximate contour by polygon
@@ -265,12 +344,43 @@ def binary_mask_to_polygon(binary_mask, tolerance=0):
         return polygons
 
     @staticmethod
-    def binary_mask_to_rle(binary_mask):
-        rle = {'counts': [], 'size': list(binary_mask.shape)}
-        counts = rle.get('counts')
-        for i, (value, elements) in enumerate(groupby(binary_mask.ravel(order='F'))):
-            if i == 0 and value == 1:
-                counts.append(0)
-            counts.append(len(list(elements)))
-
-        return rle
+    def binary_mask_to_rle(binary_mask, image_size=None, offset=(0, 0)):
+        """Converts a binary mask to uncompressed COCO RLE
+
+        The runs are counted in column major order, starting with the number of zeros.
+
+        :param binary_mask: a 2D binary numpy array where '1's represent the object
+        :param image_size: The size [H, W] of the image, if the mask is cropped. Default: The size of the mask.
+        :param offset: The position [row, col] of the mask inside the image, if the mask is cropped.
+        :return: The RLE as dict with the keys "counts" and "size".
+        """
+        if image_size is None:
+            image_size = binary_mask.shape
+        height, width = image_size
+
+        # Pad each column with zeros, s.t. each run of ones has a start and an end inside its column
+        columns = np.zeros((binary_mask.shape[1], binary_mask.shape[0] + 2), dtype=np.int8)
+        columns[:, 1:-1] = binary_mask.T != 0
+        changes = np.diff(columns, axis=1)
+        start_cols, start_rows = np.nonzero(changes == 1)
+        end_cols, end_rows = np.nonzero(changes == -1)
+        if len(start_cols) == 0:
+            # An empty mask consists of only one run of zeros
+            return {'counts': [int(height * width)], 'size': [int(height), int(width)]}
+        # Convert to indices in the column major flattened image
+        starts = (start_cols + offset[1]) * height + start_rows + offset[0]
+        ends = (end_cols + offset[1]) * height + end_rows + offset[0]
+        # Runs which touch the bottom and top of neighboring columns are one run in the flattened image
+        separated = starts[1:] != ends[:-1]
+        starts = starts[np.concatenate(([True], separated))]
+        ends = ends[np.concatenate((separated, [True]))]
+
+        run_borders = np.empty(2 * len(starts), dtype=np.int64)
+        run_borders[0::2] = starts
+        run_borders[1::2] = ends
+        counts = np.diff(np.concatenate(([0], run_borders, [height * width])))
+        # There is no trailing run of zeros, if the last pixel is part of the mask
+        if len(counts) > 1 and counts[-1] == 0:
+            counts = counts[:-1]
+
+        return {'counts': counts.tolist(), 'size': [int(height), int(width)]}
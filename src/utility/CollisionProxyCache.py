@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+import bpy
+import numpy as np
+from scipy.spatial import ConvexHull
+
+
+class CollisionProxyCache:
+    """ Creates simplified collision meshes for the physics simulation and caches them by the content of the mesh.
+
+    For the collision shape CONVEX_HULL the proxy only consists of the convex hull of the mesh, for the collision shape
+    MESH the mesh is decimated to a maximum number of faces. The proxies are identified by a hash over the vertices and
+    faces of the evaluated mesh and the proxy settings. They are kept in memory for all pipeline runs of a process and,
+    if a cache directory is given, also on disk, so objects which are used in many scenes only need to be simplified
+    once.
+    """
+
+    # Maps each proxy key to a tuple (vertices, triangles)
+    _proxies = {}
+
+    @staticmethod
+    def _read_evaluated_mesh(obj):
+        """ Returns the vertices and triangles of the given object with all its modifiers applied.
+
+        :param obj: The mesh object.
+        :return: The vertices as numpy array with shape [N, 3] and the triangles as numpy array with shape [M, 3].
+        """
+        obj_eval = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+        mesh = obj_eval.to_mesh()
+        mesh.calc_loop_triangles()
+        vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", vertices)
+        triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", triangles)
+        obj_eval.to_mesh_clear()
+        return vertices.reshape(-1, 3), triangles.reshape(-1, 3)
+
+    @staticmethod
+    def get_proxy(obj, collision_shape, max_faces, cache_dir=None):
+        """ Returns the simplified collision mesh of the given object.
+
+        :param obj: The mesh object.
+        :param collision_shape: The collision shape, the proxy is used for. Available: 'CONVEX_HULL', 'MESH'.
+        :param max_faces: The maximum number of triangles of the proxy for the collision shape MESH.
+        :param cache_dir: The directory, in which the proxies are stored on disk. If None, they are only kept in memory.
+        :return: A tuple (key, vertices, triangles) or None, if no proxy can be created for this mesh.
+        """
+        vertices, triangles = CollisionProxyCache._read_evaluated_mesh(obj)
+        if len(triangles) == 0:
+            return None
+
+        hash_obj = hashlib.sha1()
+        hash_obj.update("{}_{}".format(collision_shape, max_faces if collision_shape == "MESH" else 0).encode())
+        hash_obj.update(vertices.tobytes())
+        hash_obj.update(triangles.tobytes())
+        key = hash_obj.hexdigest()
+
+        if key not in CollisionProxyCache._proxies:
+            cache_path = os.path.join(cache_dir, key + ".npz") if cache_dir is not None else None
+            if cache_path is not None and os.path.exists(cache_path):
+                data = np.load(cache_path)
+                proxy = (data["vertices"], data["triangles"])
+            else:
+                if collision_shape == "CONVEX_HULL":
+                    proxy = CollisionProxyCache._create_convex_hull(vertices)
+                elif collision_shape == "MESH":
+                    proxy = CollisionProxyCache._create_decimated_mesh(obj, vertices, triangles, max_faces)
+                else:
+                    raise Exception("There are no collision proxies for the collision shape: {}".format(collision_shape))
+                if proxy is None:
+                    return None
+
+                if cache_path is not None:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    # Write to a temporary file first, so other processes never read a partially written proxy
+                    temp_path = "{}.{}.tmp.npz".format(cache_path[:-len(".npz")], os.getpid())
+                    np.savez(temp_path, vertices=proxy[0], triangles=proxy[1])
+                    os.replace(temp_path, cache_path)
+            CollisionProxyCache._proxies[key] = proxy
+
+        return (key,) + CollisionProxyCache._proxies[key]
+
+    @staticmethod
+    def _create_convex_hull(vertices):
+        """ Computes the convex hull of the given vertices.
+
+        :param vertices: The vertices as numpy array with shape [N, 3].
+        :return: A tuple (vertices, triangles) or None, if the vertices do not span a volume.
+        """
+        try:
+            hull = ConvexHull(vertices)
+        except Exception:
+            return None
+        # Only keep the vertices on the hull
+        vertex_map = np.full(len(vertices), -1, dtype=np.int32)
+        vertex_map[hull.vertices] = np.arange(len(hull.vertices))
+        return vertices[hull.vertices], vertex_map[hull.simplices]
+
+    @staticmethod
+    def _create_decimated_mesh(obj, vertices, triangles, max_faces):
+        """ Decimates the mesh of the given object via a temporary decimate modifier.
+
+        :param obj: The mesh object.
+        :param vertices: The vertices of the evaluated mesh.
+        :param triangles: The triangles of the evaluated mesh.
+        :param max_faces: The maximum number of triangles of the result.
+        :return: A tuple (vertices, triangles).
+        """
+        if len(triangles) <= max_faces:
+            return vertices, triangles
+        modifier = obj.modifiers.new("collision_proxy", "DECIMATE")
+        modifier.ratio = max_faces / len(triangles)
+        try:
+            return CollisionProxyCache._read_evaluated_mesh(obj)
+        finally:
+            obj.modifiers.remove(modifier)
+
+    @staticmethod
+    def clear():
+        """ Removes all proxies kept in memory. """
+        CollisionProxyCache._proxies = {}
@@ -0,0 +1,151 @@
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+
+
+class DatasetCatalog:
+    """ A persistent index over the files of datasets, which avoids scanning the dataset folders in every run.
+
+    There is one catalog per dataset root, which is stored as .json file in the catalog dir. Each entry of a catalog
+    stores a value, like the result of a glob, together with the modification times of all files and directories
+    this value was computed from. An entry is only computed again, if one of these modification times changed. As
+    adding or removing a file changes the modification time of its directory, a glob is up to date, as long as the
+    modification times of all directories it listed are unchanged. Checking these only needs one stat per directory,
+    which is much faster than listing all of them, especially on network file systems.
+
+    The catalogs are stored in the dir given by the environment variable "BLENDER_PROC_CATALOG_DIR", by default in
+    "~/.cache/blenderproc/dataset_catalogs". They are not stored in the dataset root, as this would change its
+    modification time and the root might be read-only.
+    """
+
+    # Maps each dataset root to its loaded catalog: a dict mapping each key to a dict with "value" and "mtimes"
+    _catalogs = {}
+
+    @staticmethod
+    def _get_catalog_path(root):
+        """ Returns the path of the .json file, in which the catalog of the given root is stored.
+
+        :param root: The absolute path of the dataset root.
+        :return: The path of the catalog file.
+        """
+        catalog_dir = os.getenv("BLENDER_PROC_CATALOG_DIR",
+                                os.path.join(os.path.expanduser("~"), ".cache", "blenderproc", "dataset_catalogs"))
+        return os.path.join(catalog_dir, hashlib.sha1(root.encode()).hexdigest() + ".json")
+
+    @staticmethod
+    def _load_catalog(root):
+        """ Returns the catalog of the given root, it is read from disk on the first access.
+
+        :param root: The absolute path of the dataset root.
+        :return: The catalog dict.
+        """
+        if root not in DatasetCatalog._catalogs:
+            catalog = {}
+            catalog_path = DatasetCatalog._get_catalog_path(root)
+            if os.path.exists(catalog_path):
+                try:
+                    with open(catalog_path, "r") as f:
+                        data = json.load(f)
+                    if data.get("root") == root:
+                        catalog = data["entries"]
+                except (ValueError, KeyError):
+                    print("Warning: The dataset catalog {} is corrupted, it is created again".format(catalog_path))
+            DatasetCatalog._catalogs[root] = catalog
+        return DatasetCatalog._catalogs[root]
+
+    @staticmethod
+    def _save_catalog(root):
+        """ Writes the catalog of the given root to disk, if this fails the catalog is only kept in memory.
+
+        :param root: The absolute path of the dataset root.
+        """
+        catalog_path = DatasetCatalog._get_catalog_path(root)
+        # Write to a temporary file first, so other processes never read a partially written catalog
+        temp_path = "{}.{}.tmp".format(catalog_path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(catalog_path), exist_ok=True)
+            with open(temp_path, "w") as f:
+                json.dump({"root": root, "entries": DatasetCatalog._catalogs[root]}, f)
+            os.replace(temp_path, catalog_path)
+        except OSError as e:
+            print("Warning: The dataset catalog could not be written to {}: {}".format(catalog_path, e))
+
+    @staticmethod
+    def _get_mtime(path):
+        """ Returns the modification time of the given path.
+
+        :param path: A file or directory path.
+        :return: The modification time in ns or None, if the path does not exist.
+        """
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def get(root, key, build):
+        """ Returns the value stored for the given key in the catalog of the given root.
+
+        :param root: The path of the dataset root.
+        :param key: The key of the entry, it has to be unique for the root.
+        :param build: A function without params, which computes the value if it is not in the catalog or outdated. \
+                      It has to return a tuple of the json serializable value and the list of all files and \
+                      directories the value depends on.
+        :return: The value.
+        """
+        root = os.path.abspath(root)
+        catalog = DatasetCatalog._load_catalog(root)
+        entry = catalog.get(key)
+        if entry is not None and all(DatasetCatalog._get_mtime(path) == mtime for path, mtime in entry["mtimes"].items()):
+            return entry["value"]
+
+        value, dependencies = build()
+        catalog[key] = {"value": value, "mtimes": {path: DatasetCatalog._get_mtime(path) for path in dependencies}}
+        DatasetCatalog._save_catalog(root)
+        return value
+
+    @staticmethod
+    def glob(root, pattern):
+        """ Returns all paths inside of the given root matching the given pattern, like glob.glob() does.
+
+        :param root: The path of the dataset root.
+        :param pattern: A glob pattern relative to the root, the path components have to be separated by "/".
+        :return: A sorted list of the matching paths.
+        """
+        def build():
+            matches = []
+            directories = []
+            DatasetCatalog._scan(root, pattern.split("/"), "", matches, directories)
+            return matches, directories
+
+        return [os.path.join(root, path) for path in DatasetCatalog.get(root, "glob:" + pattern, build)]
+
+    @staticmethod
+    def _scan(directory, components, relative_path, matches, directories):
+        """ Collects all paths inside of the given directory matching the given pattern components.
+
+        :param directory: The directory to search in.
+        :param components: The remaining components of the pattern.
+        :param relative_path: The path of the directory relative to the root.
+        :param matches: The list, to which all matching paths relative to the root are added.
+        :param directories: The list, to which all visited directories are added.
+        """
+        directories.append(directory)
+        component = components[0]
+        if glob.has_magic(component):
+            names = fnmatch.filter(os.listdir(directory), component)
+            # Hidden files are only matched explicitly, like in glob.glob()
+            if not component.startswith("."):
+                names = [name for name in names if not name.startswith(".")]
+        else:
+            names = [component] if os.path.exists(os.path.join(directory, component)) else []
+
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            relative_name = relative_path + "/" + name if relative_path else name
+            if len(components) == 1:
+                matches.append(relative_name)
+            elif os.path.isdir(path):
+                DatasetCatalog._scan(path, components[1:], relative_name, matches, directories)
@@ -10,6 +10,30 @@
 
 class RendererUtility:
 
+    # Functions which are called with the frame number, after a frame has been rendered and written to file
+    frame_listeners = []
+    # The objects and their pass indices before enable_object_index_output() assigned new ones
+    _original_pass_indices = []
+    # The file output node of the object index pass added by enable_object_index_output() and if the pass was
+    # enabled before
+    _object_index_output_node = None
+    _object_index_pass_was_enabled = False
+
+    @staticmethod
+    def add_frame_listener(listener):
+        """ Registers a function, which is called after each frame rendered by render(), as soon as its files are written.
+
+        This allows processing the outputs of a frame while the next frames are still rendered.
+
+        :param listener: A function, which gets the number of the rendered frame.
+        """
+        RendererUtility.frame_listeners.append(listener)
+
+    @staticmethod
+    def remove_all_frame_listeners():
+        """ Removes all functions registered via add_frame_listener(). """
+        RendererUtility.frame_listeners = []
+
     @staticmethod
     def init():
         """ Initializes the renderer.
@@ -263,6 +287,70 @@ def enable_distance_output(output_dir, file_prefix="distance_", output_key="dist
             "version": "2.0.0"
         })
 
+    @staticmethod
+    def enable_object_index_output(output_dir, file_prefix="object_index_"):
+        """ Enables writing the object index pass.
+
+        Each mesh object gets a unique pass index, starting at one, zero is used for the background. The images are
+        written as 32-bit .exr files during the next rendering, so all indices are stored exactly.
+
+        The mapping between the pass indices and the objects is stored in the GlobalStorage under the key
+        "renderer_object_index", s.t. the SegMapRenderer can create the segmentation maps without a second rendering.
+        The objects are identified by their session_uid, which is kept if an object is renamed or the rendering is
+        undone. After rendering, disable_object_index_output() has to be called, which restores the previous pass
+        indices and removes the output again. Otherwise later renderings would overwrite the object index images.
+
+        :param output_dir: The directory to write files to.
+        :param file_prefix: The prefix to use for writing the files.
+        """
+        bpy.context.scene.render.use_compositing = True
+        bpy.context.scene.use_nodes = True
+        tree = bpy.context.scene.node_tree
+        links = tree.links
+
+        # Assign a unique pass index to each mesh object, zero is reserved for the background
+        objects = get_all_mesh_objects()
+        if len(objects) > 32767:
+            raise Exception("The object index pass supports at most 32767 objects, there are: {}".format(len(objects)))
+        RendererUtility._original_pass_indices = [(obj, obj.pass_index) for obj in objects]
+        for index, obj in enumerate(objects):
+            obj.pass_index = index + 1
+
+        RendererUtility._object_index_pass_was_enabled = bpy.context.view_layer.use_pass_object_index
+        bpy.context.view_layer.use_pass_object_index = True
+        # Use existing render layer
+        render_layer_node = Utility.get_the_one_node_with_type(tree.nodes, 'CompositorNodeRLayers')
+
+        output_file = tree.nodes.new("CompositorNodeOutputFile")
+        output_file.base_path = output_dir
+        output_file.format.file_format = "OPEN_EXR"
+        output_file.format.color_depth = "32"
+        output_file.format.color_mode = "RGB"
+        output_file.file_slots.values()[0].path = file_prefix
+        links.new(render_layer_node.outputs["IndexOB"], output_file.inputs['Image'])
+        RendererUtility._object_index_output_node = output_file
+
+        GlobalStorage.set("renderer_object_index", {
+            "path": os.path.join(output_dir, file_prefix) + "%04d" + ".exr",
+            "object_uids": [obj.session_uid for obj in objects]
+        })
+
+    @staticmethod
+    def disable_object_index_output():
+        """ Reverts the last call of enable_object_index_output(), the already written images are kept.
+
+        The pass indices of the objects are restored and the output node is removed together with its link, s.t. later
+        renderings do not overwrite the object index images, which are used by the SegMapRenderer.
+        """
+        for obj, pass_index in RendererUtility._original_pass_indices:
+            obj.pass_index = pass_index
+        RendererUtility._original_pass_indices = []
+
+        if RendererUtility._object_index_output_node is not None:
+            bpy.context.scene.node_tree.nodes.remove(RendererUtility._object_index_output_node)
+            RendererUtility._object_index_output_node = None
+            bpy.context.view_layer.use_pass_object_index = RendererUtility._object_index_pass_was_enabled
+
     @staticmethod
     def enable_normals_output(output_dir, file_prefix="normals_", output_key="normals"):
         """ Enables writing normal images.
@@ -415,7 +503,17 @@ def render(output_dir, file_prefix="rgb_", output_key="colors"):
             # As frame_end is pointing to the next free frame, decrease it by one, as
             # blender will render all frames in [frame_start, frame_ned]
             bpy.context.scene.frame_end -= 1
-            bpy.ops.render.render(animation=True, write_still=True)
+
+            def call_frame_listeners(scene, *args):
+                for listener in RendererUtility.frame_listeners:
+                    listener(scene.frame_current)
+
+            # render_write is called after all files of a frame have been written, including the compositor outputs
+            bpy.app.handlers.render_write.append(call_frame_listeners)
+            try:
+                bpy.ops.render.render(animation=True, write_still=True)
+            finally:
+                bpy.app.handlers.render_write.remove(call_frame_listeners)
             # Revert changes
             bpy.context.scene.frame_end += 1
 
@@ -2,8 +2,10 @@
 import os
 
 import bpy
+import imageio
 import numpy as np
 
+from src.main.GlobalStorage import GlobalStorage
 from src.renderer.RendererInterface import RendererInterface
 from src.utility.BlenderUtility import load_image, get_all_mesh_objects
 from src.utility.MaterialLoaderUtility import MaterialLoaderUtility
@@ -78,7 +80,146 @@ def _colorize_objects_for_instance_segmentation(objects, use_alpha_channel, rend
         return colors, num_splits_per_dimension, color_map
 
     @staticmethod
-    def render(output_dir, temp_dir, used_attributes, used_default_values={}, file_prefix="segmap_", output_key="segmap", segcolormap_output_file_prefix="class_inst_col_map", segcolormap_output_key="segcolormap", use_alpha_channel=False, render_colorspace_size_per_dimension=2048):
+    def _build_attribute_lookup_table(used_objects, attribute, used_default_values):
+        """ Resolves the value of the given attribute for all objects.
+
+        The numeric values are stored in an array, where the position corresponds to the object id, s.t. a whole
+        segmentation map can be mapped to the attribute values via `values[segmap]`. Values, which can not be stored
+        in an image, like strings, are only kept in `raw_values` and are later saved in the .csv file.
+
+        :param used_objects: The list of objects, where the position corresponds to the object id.
+        :param attribute: The attribute as given in map_by.
+        :param used_default_values: The default values used for the keys used in map_by.
+        :return: A dict containing the resolved attribute name and the lookup arrays.
+        """
+        org_attribute = attribute
+        # if the class is used the category_id attribute is evaluated
+        if attribute == "class":
+            attribute = "cp_category_id"
+        lookup_table = {"org_attribute": org_attribute, "attribute": attribute}
+        # in the instance case the resulting ids are directly used
+        if attribute == "instance":
+            return lookup_table
+
+        # for the current attribute remove cp_, if present
+        used_attribute = attribute
+        if used_attribute.startswith("cp_"):
+            used_attribute = used_attribute[len("cp_"):]
+        # check if a default value was specified
+        default_value_set = False
+        if attribute in used_default_values:
+            default_value_set = True
+            default_value = used_default_values[attribute]
+        elif used_attribute in used_default_values:
+            default_value_set = True
+            default_value = used_default_values[used_attribute]
+
+        values = np.zeros(len(used_objects))
+        is_numeric = np.zeros(len(used_objects), dtype=bool)
+        is_default = np.zeros(len(used_objects), dtype=bool)
+        raw_values = [None] * len(used_objects)
+        errors = [None] * len(used_objects)
+        for object_id, current_obj in enumerate(used_objects):
+            # if the current obj has a attribute with that name -> get it
+            if hasattr(current_obj, used_attribute):
+                used_value = getattr(current_obj, used_attribute)
+            # if the current object has a custom property with that name -> get it
+            elif attribute.startswith("cp_") and used_attribute in current_obj:
+                used_value = current_obj[used_attribute]
+            elif attribute == "cf_basename":
+                used_value = current_obj.name
+                if "." in used_value:
+                    used_value = used_value[:used_value.rfind(".")]
+            elif default_value_set:
+                # if none of the above applies use the default value
+                used_value = default_value
+                is_default[object_id] = True
+            else:
+                # if the requested attribute is not a custom property or a attribute or there is a default value
+                # stored, it throws an exception as soon as this object is visible
+                errors[object_id] = "The obj: {} does not have the attribute: {}, striped: {}. Maybe try a default " \
+                                    "value.".format(current_obj.name, attribute, used_attribute)
+                continue
+
+            raw_values[object_id] = used_value
+            # check if the value can be saved in an image, else it is only saved in the csv file
+            try:
+                numeric_value = np.asarray(used_value, dtype=np.float64)
+            except (ValueError, TypeError):
+                continue
+            if numeric_value.size == 1:
+                values[object_id] = numeric_value.reshape(-1)[0]
+                is_numeric[object_id] = True
+
+        # store the values in the smallest dtype, which can represent all of them
+        values = values.astype(SegMapRendererUtility._determine_optimal_dtype(values[is_numeric]))
+
+        lookup_table.update({"used_attribute": used_attribute, "values": values, "is_numeric": is_numeric,
+                             "is_default": is_default, "raw_values": raw_values, "errors": errors})
+        return lookup_table
+
+    @staticmethod
+    def _determine_optimal_dtype(values):
+        """ Returns the smallest dtype, which can store all of the given values without loss.
+
+        :param values: A numpy array of values.
+        :return: The smallest integer dtype if all values are integers, else np.float64.
+        """
+        if len(values) == 0:
+            return np.uint8
+        if not np.all(np.mod(values, 1) == 0):
+            return np.float64
+        min_value, max_value = np.min(values), np.max(values)
+        dtypes = [np.uint8, np.uint16, np.uint32] if min_value >= 0 else [np.int8, np.int16, np.int32]
+        for dtype in dtypes:
+            if np.iinfo(dtype).min <= min_value and max_value <= np.iinfo(dtype).max:
+                return dtype
+        return np.int64
+
+    @staticmethod
+    def _save_segmap(file_path, segmap, output_format):
+        """ Saves the given segmentation map in the given format.
+
+        :param file_path: The path without file ending.
+        :param segmap: The segmentation map with shape [H, W] or [H, W, C].
+        :param output_format: Either "npy", "npz" (zlib compressed) or "png" (8 or 16-bit, only one channel).
+        """
+        if output_format == "npy":
+            np.save(file_path + ".npy", segmap)
+        elif output_format == "npz":
+            np.savez_compressed(file_path + ".npz", segmap=segmap)
+        elif output_format == "png":
+            if segmap.ndim != 2:
+                raise Exception("Only segmentation maps with one channel can be stored as png, use \"npz\" for "
+                                "segmentation maps with {} channels.".format(segmap.shape[2]))
+            if segmap.dtype not in [np.uint8, np.uint16]:
+                raise Exception("The values of this segmentation map do not fit into a 16-bit png, its dtype is: "
+                                "{}".format(segmap.dtype))
+            imageio.imwrite(file_path + ".png", segmap)
+        else:
+            raise Exception("Unknown segmentation map output format: {}".format(output_format))
+
+    @staticmethod
+    def _get_objects_of_object_index_pass():
+        """ Returns the objects per pass index of the last object index pass rendering.
+
+        :return: The list of objects, where the position corresponds to the pass index (zero is the world background), the format string of the paths of the rendered object index images.
+        """
+        if not GlobalStorage.is_in_storage("renderer_object_index"):
+            raise Exception("There was no object index pass rendered before, set render_object_index to True in the "
+                            "RgbRenderer, to use the object index pass for the segmentation.")
+        object_index = GlobalStorage.get("renderer_object_index")
+        objects_by_uid = {obj.session_uid: obj for obj in bpy.data.objects}
+        used_objects = [bpy.context.scene.world]
+        for uid in object_index["object_uids"]:
+            if uid not in objects_by_uid:
+                raise Exception("An object of the object index pass was removed after rendering, render the "
+                                "segmentation map without use_object_index_pass instead.")
+            used_objects.append(objects_by_uid[uid])
+        return used_objects, object_index["path"]
+
+    @staticmethod
+    def render(output_dir, temp_dir, used_attributes, used_default_values={}, file_prefix="segmap_", output_key="segmap", segcolormap_output_file_prefix="class_inst_col_map", segcolormap_output_key="segcolormap", use_alpha_channel=False, render_colorspace_size_per_dimension=2048, use_object_index_pass=False, output_format="npy"):
         """ Renders segmentation maps for all frames.
 
         :param output_dir: The directory to write images to.
@@ -91,49 +232,55 @@ def render(output_dir, temp_dir, used_attributes, used_default_values={}, file_p
         :param segcolormap_output_key: The key to use for registering the segmation-color map output.
         :param use_alpha_channel: If true, the alpha channel stored in .png textures is used.
         :param render_colorspace_size_per_dimension: As we use float16 for storing the rendering, the interval of integers which can be precisely stored is [-2048, 2048]. As blender does not allow negative values for colors, we use [0, 2048] ** 3 as our color space which allows ~8 billion different colors/objects. This should be enough.
+        :param use_object_index_pass: If true, no rendering is done. Instead the object index pass, which was rendered together with the rgb images (see RendererUtility.enable_object_index_output()), is used.
+        :param output_format: The format of the segmentation maps: "npy", "npz" (zlib compressed) or "png" (8 or 16-bit, only for one channel). The maps are always stored in the smallest dtype, which fits all values.
         """
-        with Utility.UndoAfterExecution():
-            RendererUtility.init()
-            RendererUtility.set_samples(1)
-            RendererUtility.set_adaptive_sampling(0)
-            RendererUtility.set_denoiser(None)
-            RendererUtility.set_light_bounces(1, 0, 0, 1, 0, 8, 0)
+        with Utility.UndoAfterExecution(perform_undo_op=not use_object_index_pass):
+            if use_object_index_pass:
+                used_objects, object_index_file_path = SegMapRendererUtility._get_objects_of_object_index_pass()
+            else:
+                RendererUtility.init()
+                RendererUtility.set_samples(1)
+                RendererUtility.set_adaptive_sampling(0)
+                RendererUtility.set_denoiser(None)
+                RendererUtility.set_light_bounces(1, 0, 0, 1, 0, 8, 0)
 
-            # Get objects with meshes (i.e. not lights or cameras)
-            objs_with_mats = get_all_mesh_objects()
+                # Get objects with meshes (i.e. not lights or cameras)
+                objs_with_mats = get_all_mesh_objects()
 
-            colors, num_splits_per_dimension, used_objects = SegMapRendererUtility._colorize_objects_for_instance_segmentation(objs_with_mats, use_alpha_channel, render_colorspace_size_per_dimension)
+                colors, num_splits_per_dimension, used_objects = SegMapRendererUtility._colorize_objects_for_instance_segmentation(objs_with_mats, use_alpha_channel, render_colorspace_size_per_dimension)
 
-            bpy.context.scene.cycles.filter_width = 0.0
+                bpy.context.scene.cycles.filter_width = 0.0
 
-            if use_alpha_channel:
-                MaterialLoaderUtility.add_alpha_channel_to_textures(blurry_edges=False)
+                if use_alpha_channel:
+                    MaterialLoaderUtility.add_alpha_channel_to_textures(blurry_edges=False)
 
-            # Determine path for temporary and for final output
-            temporary_segmentation_file_path = os.path.join(temp_dir, "seg_")
-            final_segmentation_file_path = os.path.join(output_dir, file_prefix)
+                # Determine path for temporary output
+                temporary_segmentation_file_path = os.path.join(temp_dir, "seg_")
 
-            RendererUtility.set_output_format("OPEN_EXR", 16)
-            RendererUtility.render(temp_dir, "seg_", None)
+                RendererUtility.set_output_format("OPEN_EXR", 16)
+                RendererUtility.render(temp_dir, "seg_", None)
+
+            # Determine path for final output
+            final_segmentation_file_path = os.path.join(output_dir, file_prefix)
 
             # Find optimal dtype of output based on max index
-            for dtype in [np.uint8, np.uint16, np.uint32]:
-                optimal_dtype = dtype
-                if np.iinfo(optimal_dtype).max >= len(colors) - 1:
-                    break
+            optimal_dtype = SegMapRendererUtility._determine_optimal_dtype(np.array([0, len(used_objects) - 1]))
 
             if 'class' in used_default_values:
                 used_default_values['cp_category_id'] = used_default_values['class']
 
             if isinstance(used_attributes, str):
                 # only one result is requested
-                result_channels = 1
                 used_attributes = [used_attributes]
-            elif isinstance(used_attributes, list):
-                result_channels = len(used_attributes)
-            else:
+            elif not isinstance(used_attributes, list):
                 raise Exception("The type of this is not supported here: {}".format(used_attributes))
 
+            # Resolve the attribute values of all objects once, s.t. each channel of each frame can afterwards be
+            # created with one lookup per pixel
+            lookup_tables = [SegMapRendererUtility._build_attribute_lookup_table(used_objects, attribute, used_default_values)
+                             for attribute in used_attributes]
+
             save_in_csv_attributes = {}
             # define them for the avoid rendering case
             there_was_an_instance_rendering = False
@@ -148,32 +295,31 @@ def render(output_dir, temp_dir, used_attributes, used_default_values={}, file_p
             # After rendering
             for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):  # for each rendered frame
                 for suffix in suffixes:
-                    file_path = temporary_segmentation_file_path + ("%04d" % frame) + suffix + ".exr"
-                    segmentation = load_image(file_path)
-                    print(file_path, segmentation.shape)
-
-                    segmap = Utility.map_back_from_equally_spaced_equidistant_values(segmentation,
-                                                                                     num_splits_per_dimension,
-                                                                                     render_colorspace_size_per_dimension)
+                    if use_object_index_pass:
+                        file_path = (object_index_file_path % frame)[:-len(".exr")] + suffix + ".exr"
+                        # All channels contain the same pass index, which is stored exactly in float32
+                        segmap = np.round(load_image(file_path)[:, :, 0])
+                    else:
+                        file_path = temporary_segmentation_file_path + ("%04d" % frame) + suffix + ".exr"
+                        segmentation = load_image(file_path)
+                        print(file_path, segmentation.shape)
+
+                        segmap = Utility.map_back_from_equally_spaced_equidistant_values(segmentation,
+                                                                                         num_splits_per_dimension,
+                                                                                         render_colorspace_size_per_dimension)
                     segmap = segmap.astype(optimal_dtype)
 
-                    used_object_ids = np.unique(segmap)
-                    max_id = np.max(used_object_ids)
-                    if max_id >= len(used_objects):
+                    # Count the pixels per object id, every id which has at least one pixel is used in this frame
+                    pixels_per_object_id = np.bincount(segmap.ravel())
+                    if len(pixels_per_object_id) > len(used_objects):
                         raise Exception("There are more object colors than there are objects")
+                    used_object_ids = np.flatnonzero(pixels_per_object_id)
                     combined_result_map = []
                     there_was_an_instance_rendering = False
                     list_of_used_attributes = []
                     used_channels = []
-                    for channel_id in range(result_channels):
-                        resulting_map = np.empty((segmap.shape[0], segmap.shape[1]))
-                        was_used = False
-                        current_attribute = used_attributes[channel_id]
-                        org_attribute = current_attribute
-
-                        # if the class is used the category_id attribute is evaluated
-                        if current_attribute == "class":
-                            current_attribute = "cp_category_id"
+                    for lookup_table in lookup_tables:
+                        current_attribute = lookup_table["attribute"]
                         # in the instance case the resulting ids are directly used
                         if current_attribute == "instance":
                             there_was_an_instance_rendering = True
@@ -184,75 +330,33 @@ def render(output_dir, temp_dir, used_attributes, used_default_values={}, file_p
                         else:
                             if current_attribute != "cp_category_id":
                                 list_of_used_attributes.append(current_attribute)
-                            # for the current attribute remove cp_ and _csv, if present
-                            used_attribute = current_attribute
-                            if used_attribute.startswith("cp_"):
-                                used_attribute = used_attribute[len("cp_"):]
-                            # check if a default value was specified
-                            default_value_set = False
-                            if current_attribute in used_default_values or used_attribute in used_default_values:
-                                default_value_set = True
-                                if current_attribute in used_default_values:
-                                    default_value = used_default_values[current_attribute]
-                                elif used_attribute in used_default_values:
-                                    default_value = used_default_values[used_attribute]
-                            last_state_save_in_csv = None
+                            # only objects which are visible in this frame need the requested attribute
+                            for object_id in used_object_ids:
+                                if lookup_table["errors"][object_id] is not None:
+                                    raise Exception(lookup_table["errors"][object_id])
+
+                            is_numeric = lookup_table["is_numeric"][used_object_ids]
+                            if np.any(is_numeric) and not np.all(is_numeric):
+                                raise Exception("During creating the mapping, the saving to an image or a csv file "
+                                                "switched, this might indicated that the used default value, does "
+                                                "not have the same type as the returned value, "
+                                                "for: {}".format(current_attribute))
+                            was_used = np.any(is_numeric)
                             # this avoids that for certain attributes only the default value is written
-                            non_default_value_was_used = False
-                            # iterate over all object ids
+                            non_default_value_was_used = np.any(is_numeric & ~lookup_table["is_default"][used_object_ids])
+                            # map all pixels to their attribute value with one lookup
+                            resulting_map = lookup_table["values"][segmap]
+
+                            # save everything which is not instance also in the .csv
+                            used_attribute = lookup_table["used_attribute"]
                             for object_id in used_object_ids:
-                                is_default_value = False
-                                # get the corresponding object via the id
-                                current_obj = used_objects[object_id]
-                                # if the current obj has a attribute with that name -> get it
-                                if hasattr(current_obj, used_attribute):
-                                    used_value = getattr(current_obj, used_attribute)
-                                # if the current object has a custom property with that name -> get it
-                                elif current_attribute.startswith("cp_") and used_attribute in current_obj:
-                                    used_value = current_obj[used_attribute]
-                                elif current_attribute.startswith("cf_"):
-                                    if current_attribute == "cf_basename":
-                                        used_value = current_obj.name
-                                        if "." in used_value:
-                                            used_value = used_value[:used_value.rfind(".")]
-                                elif default_value_set:
-                                    # if none of the above applies use the default value
-                                    used_value = default_value
-                                    is_default_value = True
+                                object_id = int(object_id)
+                                if object_id in save_in_csv_attributes:
+                                    save_in_csv_attributes[object_id][used_attribute] = lookup_table["raw_values"][object_id]
                                 else:
-                                    # if the requested current_attribute is not a custom property or a attribute
-                                    # or there is a default value stored
-                                    # it throws an exception
-                                    raise Exception("The obj: {} does not have the "
-                                                    "attribute: {}, striped: {}. Maybe try a default "
-                                                    "value.".format(current_obj.name, current_attribute, used_attribute))
-
-                                # check if the value should be saved as an image or in the csv file
-                                save_in_csv = False
-                                try:
-                                    resulting_map[segmap == object_id] = used_value
-                                    was_used = True
-                                    if not is_default_value:
-                                        non_default_value_was_used = True
-                                    # save everything which is not instance also in the .csv
-                                    if current_attribute != "instance":
-                                        save_in_csv = True
-                                except ValueError:
-                                    save_in_csv = True
-
-                                if last_state_save_in_csv is not None and last_state_save_in_csv != save_in_csv:
-                                    raise Exception("During creating the mapping, the saving to an image or a csv file "
-                                                    "switched, this might indicated that the used default value, does "
-                                                    "not have the same type as the returned value, "
-                                                    "for: {}".format(current_attribute))
-                                last_state_save_in_csv = save_in_csv
-                                if save_in_csv:
-                                    if object_id in save_in_csv_attributes:
-                                        save_in_csv_attributes[object_id][used_attribute] = used_value
-                                    else:
-                                        save_in_csv_attributes[object_id] = {used_attribute: used_value}
+                                    save_in_csv_attributes[object_id] = {used_attribute: lookup_table["raw_values"][object_id]}
                         if was_used and non_default_value_was_used:
-                            used_channels.append(org_attribute)
+                            used_channels.append(lookup_table["org_attribute"])
                             combined_result_map.append(resulting_map)
 
                     fname = final_segmentation_file_path + ("%04d" % frame) + suffix
@@ -261,7 +365,7 @@ def render(output_dir, temp_dir, used_attributes, used_default_values={}, file_p
                     # remove the unneeded third dimension
                     if resulting_map.shape[2] == 1:
                         resulting_map = resulting_map[:, :, 0]
-                    np.save(fname, resulting_map)
+                    SegMapRendererUtility._save_segmap(fname, resulting_map, output_format)
 
             if not there_was_an_instance_rendering:
                 if len(list_of_used_attributes) > 0:
@@ -293,7 +397,7 @@ def render(output_dir, temp_dir, used_attributes, used_default_values={}, file_p
                             object_element["channel_{}".format(channel_name)] = i
                         writer.writerow(object_element)
 
-        Utility.register_output(output_dir, file_prefix, output_key, ".npy", "2.0.0")
+        Utility.register_output(output_dir, file_prefix, output_key, "." + output_format, "2.0.0")
         if save_in_csv_attributes:
             Utility.register_output(output_dir,
                                     segcolormap_output_file_prefix,
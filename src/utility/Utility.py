@@ -1,6 +1,7 @@
 import os
 import math
 import uuid
+import hashlib
 import bpy
 import time
 import inspect
@@ -16,6 +17,17 @@ class Utility:
     working_dir = ""
     temp_dir = ""
     used_temp_id = None
+    # If set, all imported files are cached as .blend files in this dir, see Utility.import_objects()
+    mesh_cache_dir = None
+    # Maps each output key to the number of modules, which read the files of this output when they are run, the key
+    # None stands for modules reading all outputs, see Utility.register_output_consumer()
+    output_consumers = {}
+    # The index of the line of the batch index file, which is processed by the current pipeline, None outside of batches
+    batch_line_index = None
+    # The name of the batch worker, which runs the current pipeline, None outside of batches
+    batch_worker_name = None
+    # True, if the output dirs of the current pipeline are redirected to staging dirs, see Pipeline
+    output_dirs_staged = False
 
     @staticmethod
     def initialize_modules(module_configs):
@@ -409,7 +421,7 @@ def map_back_from_equally_spaced_equidistant_values(values, num_splits_per_dimen
         return np.round(values)
 
     @staticmethod
-    def import_objects(filepath, cached_objects=None, **kwargs):
+    def import_objects(filepath, cached_objects=None, library_path=None, **kwargs):
         """ Import all objects for the given file and returns the loaded objects
 
         In .obj files a list of objects can be saved in.
@@ -417,6 +429,7 @@ def import_objects(filepath, cached_objects=None, **kwargs):
 
         :param filepath: the filepath to the location where the data is stored
         :param cached_objects: a dict of filepath to objects, which have been loaded before, to avoid reloading (the dict is updated in this function)
+        :param library_path: path to a .blend file, which is used as asset library for this file, see Utility._import_objects_via_library()
         :param kwargs: all other params are handed directly to the bpy loading fct. check the corresponding documentation
         :return: a list of all newly loaded objects, in the failure case an empty list is returned
         """
@@ -435,30 +448,92 @@ def import_objects(filepath, cached_objects=None, **kwargs):
                         created_obj.append(bpy.context.selected_objects[0])
                     return created_obj
                 else:
-                    loaded_objects = Utility.import_objects(filepath, cached_objects=None, **kwargs)
+                    loaded_objects = Utility.import_objects(filepath, cached_objects=None, library_path=library_path, **kwargs)
                     cached_objects[filepath] = loaded_objects
                     return loaded_objects
+            elif library_path is not None:
+                return Utility._import_objects_via_library(filepath, library_path, **kwargs)
+            elif Utility.mesh_cache_dir is not None:
+                return Utility._import_objects_via_mesh_cache(filepath, **kwargs)
             else:
-                # save all selected objects
-                previously_selected_objects = set(bpy.context.selected_objects)
-                if filepath.endswith('.obj'):
-                    # load an .obj file:
-                    bpy.ops.import_scene.obj(filepath=filepath, **kwargs)
-                elif filepath.endswith('.ply'):
-                    # load a .ply mesh
-                    bpy.ops.import_mesh.ply(filepath=filepath, **kwargs)
-                    # add a default material to ply file
-                    mat = bpy.data.materials.new(name="ply_material")
-                    mat.use_nodes = True
-                    loaded_objects = list(set(bpy.context.selected_objects) - previously_selected_objects)
-                    for obj in loaded_objects:
-                        obj.data.materials.append(mat)
-
-                # return all currently selected objects
-                return list(set(bpy.context.selected_objects) - previously_selected_objects)
+                return Utility._import_objects_from_file(filepath, **kwargs)
         else:
             raise Exception("The given filepath does not exist: {}".format(filepath))
 
+    @staticmethod
+    def _import_objects_from_file(filepath, **kwargs):
+        """ Imports all objects of the given .obj or .ply file with the blender importers.
+
+        :param filepath: the filepath to the location where the data is stored
+        :param kwargs: all other params are handed directly to the bpy loading fct.
+        :return: a list of all newly loaded objects
+        """
+        # save all selected objects
+        previously_selected_objects = set(bpy.context.selected_objects)
+        if filepath.endswith('.obj'):
+            # load an .obj file:
+            bpy.ops.import_scene.obj(filepath=filepath, **kwargs)
+        elif filepath.endswith('.ply'):
+            # load a .ply mesh
+            bpy.ops.import_mesh.ply(filepath=filepath, **kwargs)
+            # add a default material to ply file
+            mat = bpy.data.materials.new(name="ply_material")
+            mat.use_nodes = True
+            loaded_objects = list(set(bpy.context.selected_objects) - previously_selected_objects)
+            for obj in loaded_objects:
+                obj.data.materials.append(mat)
+
+        # return all currently selected objects
+        return list(set(bpy.context.selected_objects) - previously_selected_objects)
+
+    @staticmethod
+    def _import_objects_via_mesh_cache(filepath, **kwargs):
+        """ Imports all objects of the given file from the mesh cache and adds them to the cache, if they are not in it.
+
+        The cached file is identified by the path, size and modification time of the source file, the import
+        parameters and the blender version.
+
+        :param filepath: the filepath to the location where the data is stored
+        :param kwargs: all other params are handed directly to the bpy loading fct.
+        :return: a list of all newly loaded objects
+        """
+        file_stat = os.stat(filepath)
+        cache_key = "{}_{}_{}_{}_{}".format(os.path.abspath(filepath), file_stat.st_size, file_stat.st_mtime_ns,
+                                            sorted(kwargs.items()), bpy.app.version_string)
+        cache_path = os.path.join(Utility.mesh_cache_dir, hashlib.sha1(cache_key.encode()).hexdigest() + ".blend")
+        return Utility._import_objects_via_library(filepath, cache_path, **kwargs)
+
+    @staticmethod
+    def _import_objects_via_library(filepath, library_path, **kwargs):
+        """ Imports all objects of the given file from the given .blend file, which is created if necessary.
+
+        If the .blend file does not exist or is older than the source file, the objects created by the importer are
+        written together with their meshes and materials into the .blend file. Otherwise the objects are appended from
+        the .blend file, which skips parsing the .obj or .ply file completely.
+
+        :param filepath: the filepath to the location where the data is stored
+        :param library_path: the path of the .blend file
+        :param kwargs: all other params are handed directly to the bpy loading fct.
+        :return: a list of all newly loaded objects
+        """
+        if not os.path.exists(library_path) or os.path.getmtime(library_path) < os.path.getmtime(filepath):
+            loaded_objects = Utility._import_objects_from_file(filepath, **kwargs)
+            os.makedirs(os.path.dirname(library_path), exist_ok=True)
+            # Write to a temporary file first, so other processes never read a partially written library
+            temp_path = "{}.{}.tmp".format(library_path, os.getpid())
+            bpy.data.libraries.write(temp_path, set(loaded_objects), path_remap="ABSOLUTE")
+            os.replace(temp_path, library_path)
+            return loaded_objects
+
+        with bpy.data.libraries.load(library_path, link=False) as (data_from, data_to):
+            data_to.objects = data_from.objects
+        # Link and select the objects like the importers do, which deselect all previously selected objects
+        bpy.ops.object.select_all(action='DESELECT')
+        for obj in data_to.objects:
+            bpy.context.collection.objects.link(obj)
+            obj.select_set(True)
+        return list(data_to.objects)
+
     @staticmethod
     def add_output_entry(output):
         """ Registers the given output in the scene's custom properties
@@ -489,6 +564,27 @@ def register_output(output_dir, prefix, key, suffix, version, unique_for_campose
             "version": version
         })
 
+    @staticmethod
+    def register_output_consumer(key):
+        """ Declares that a module reads the files of the output with the given key, when it is run.
+
+        Modules call this in their constructor, so all consumers are known before the first module is run. Modules
+        which delete temporary output files early, e.g. the Hdf5Writer with stream_frames, keep the files of all
+        consumed outputs.
+
+        :param key: The key of the output or None, if the module reads all registered outputs.
+        """
+        Utility.output_consumers[key] = Utility.output_consumers.get(key, 0) + 1
+
+    @staticmethod
+    def is_output_consumed(key):
+        """ Checks if a module has declared that it reads the files of the output with the given key.
+
+        :param key: The key of the output.
+        :return: True, if the files of this output are still read by a module.
+        """
+        return key in Utility.output_consumers or None in Utility.output_consumers
+
     @staticmethod
     def find_registered_output_by_key(key):
         """ Returns the output which was registered with the given key.
@@ -11,5 +11,13 @@ def __init__(self, config):
 
     def run(self):
         blend_path = os.path.join(self._determine_output_dir(False), "scene.blend")
-        bpy.ops.wm.save_as_mainfile(filepath=blend_path)
-        
\ No newline at end of file
+        BlenderWriter.save_scene(blend_path)
+
+    @staticmethod
+    def save_scene(blend_path, copy=False):
+        """ Saves the current blender file to the given path.
+
+        :param blend_path: The path of the .blend file.
+        :param copy: If true, the current file is not switched to the saved one.
+        """
+        bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=copy)
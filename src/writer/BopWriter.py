@@ -135,6 +135,10 @@ def __init__(self, config):
         self.dataset = self.config.get_string("dataset", "")
 
         self.append_to_existing_output = self.config.get_bool("append_to_existing_output", False)
+
+        # The rgb and distance images are read in run()
+        Utility.register_output_consumer("colors")
+        Utility.register_output_consumer("distance")
         
         # Save world to camera transformation
         self._save_world2cam = self.config.get_bool("save_world2cam", True)
@@ -58,6 +58,8 @@ def __init__(self, config):
         self._supercategory = self.config.get_string("supercategory", "coco_annotations")
         self.segmap_output_key = self.config.get_string("segmap_output_key", "segmap")
         self.segcolormap_output_key = self.config.get_string("segcolormap_output_key", "segcolormap")
+        for output_key in [self.rgb_output_key, self.segmap_output_key, self.segcolormap_output_key]:
+            Utility.register_output_consumer(output_key)
         self._coco_data_dir = os.path.join(self._determine_output_dir(False), 'coco_data')
         self.mask_encoding_format = self.config.get_string("mask_encoding_format", "rle")
         if not os.path.exists(self._coco_data_dir):
@@ -1,4 +1,8 @@
+import itertools
 import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import bpy
 import h5py
@@ -6,7 +10,8 @@
 
 from src.main.GlobalStorage import GlobalStorage
 from src.writer.WriterInterface import WriterInterface
-from src.utility.Utility import Utility
+from src.utility.RendererUtility import RendererUtility
+from src.utility.Utility import Utility, KeyFrame
 
 
 class Hdf5Writer(WriterInterface):
@@ -26,10 +31,62 @@ class Hdf5Writer(WriterInterface):
             with already existing hdf5 files in the output directory. Default: False
           - bool
         * - compression
-          - The compression technique that should be used when storing data in a hdf5 file.
+          - The compression technique that should be used when storing data in a hdf5 file. "lzf" is much faster
+            than "gzip", but compresses less and can only be read with h5py. Default: "gzip". Available: ["gzip",
+            "lzf", "none"].
           - string
+        * - compression_level
+          - The gzip compression level, lower levels are faster. Default: 4. Available: [0, 9].
+          - int
+        * - chunks
+          - The chunk shape of the hdf5 datasets, e.g. [256, 256]. Dimensions which are not specified are not split.
+            If not set, the chunk shape is chosen by h5py, or in the parallel mode each dataset is one chunk.
+          - list
+        * - num_workers
+          - The number of threads, which compress the chunks of the hdf5 datasets with zlib. Only this chunk
+            compression is parallelized: loading and postprocessing the outputs and writing the hdf5 files stays in
+            the main thread, so a larger value only helps if the gzip compression is the bottleneck. The compression
+            is then done outside of h5py, which is only possible for gzip, so a value larger than one requires the
+            compression "gzip". With stream_frames, the outputs written during rendering are compressed by the one
+            writer thread instead. Default: 1.
+          - int
+        * - write_to_shard
+          - If true, all frames are appended to resizable, chunked datasets in one hdf5 file per shard
+            (`<shard_name>_0000.hdf5`, ...), instead of writing one hdf5 file per frame. The first axis of each
+            dataset is the frame axis. The group "index" maps each row to its source: "index/frame" (frame number),
+            "index/scene" (the scene_id) and "index/cam2world_matrix". With append_to_existing_output the frames
+            are appended to the newest shard. The attribute "committed_frames" of a shard is the number of frames
+            written by runs, which finished. Frames after it belong to an interrupted run and are removed, before
+            the next run appends to the shard. The data of each key needs to have the same shape in all frames of a
+            shard. Default: False
+          - bool
+        * - shard_name
+          - The file name prefix of the shards. Different processes need to use different shard names, as one hdf5
+            file can not be written by several processes at once. Default: "shard", in batch mode
+            "shard_worker_<name>" with the name of the batch worker. All lines processed by one worker then append
+            to the same shards, as a worker processes its lines one after another, while parallel workers never write
+            into the same shard. The frames of one line are always written into one shard, so in this case a shard is
+            only full, after the line which exceeds shard_max_frames. With --batch-staging each line has its own
+            staging dir, there the default is "shard_line_<index>" with the index of the processed batch line.
+          - string
+        * - shard_max_frames
+          - The maximum number of frames per shard, afterwards the next shard is started. 0 means unlimited.
+            Default: 10000
+          - int
+        * - scene_id
+          - The id of the source scene, which is stored in the frame index of the shard, e.g. the path of the
+            loaded house. Default: ""
+          - string
+        * - stream_frames
+          - If true, the outputs of each frame are written into its hdf5 file as soon as the frame is rendered, while
+            the next frames are rendered. Outputs which are created later on, e.g. by the SegMapRenderer, are added to
+            the hdf5 files when this module is run. Can not be combined with write_to_shard. Default: False
+          - bool
         * - delete_temporary_files_afterwards
-          - True, if all temporary files should be deleted after merging. Default value: True.
+          - True, if all temporary files should be deleted after merging. This is only done with stream_frames for
+            the outputs streamed during rendering, which bounds the space used by the temporary files. Files of
+            outputs, which are read by other modules later on, e.g. the rgb images by the CocoAnnotationsWriter, are
+            kept. Default value: True.
           - bool
         * - stereo_separate_keys
           - If true, stereo images are saved as two separate images \*_0 and \*_1. Default: False
@@ -43,91 +100,458 @@ class Hdf5Writer(WriterInterface):
     def __init__(self, config):
         WriterInterface.__init__(self, config)
         self._avoid_rendering = config.get_bool("avoid_rendering", False)
+        self._compression = self.config.get_string("compression", "gzip").lower()
+        if self._compression not in ["gzip", "lzf", "none"]:
+            raise Exception("Unknown compression: {}, available are: gzip, lzf and none".format(self._compression))
+        self._compression_level = self.config.get_int("compression_level", 4)
+        self._chunks = self.config.get_list("chunks", []) if self.config.has_param("chunks") else None
+        self._num_workers = self.config.get_int("num_workers", 1)
+        if self._num_workers > 1 and self._compression != "gzip":
+            raise Exception("num_workers > 1 only parallelizes the gzip compression, it can not be used with the "
+                            "compression: {}".format(self._compression))
+        self._write_to_shard = self.config.get_bool("write_to_shard", False)
+        # All batch lines of one worker append to the same shards, except if each line writes into its own staging dir
+        self._shares_shard = Utility.batch_line_index is not None and not Utility.output_dirs_staged \
+                             and not self.config.has_param("shard_name")
+        if self._shares_shard:
+            default_shard_name = "shard_worker_{}".format(Utility.batch_worker_name)
+        elif Utility.batch_line_index is not None:
+            default_shard_name = "shard_line_{:06d}".format(Utility.batch_line_index)
+        else:
+            default_shard_name = "shard"
+        self._shard_name = self.config.get_string("shard_name", default_shard_name)
+        self._shard_max_frames = self.config.get_int("shard_max_frames", 10000)
+        self._scene_id = self.config.get_string("scene_id", "")
+        self._shard_file = None
+        self._shard_index = 0
+        self._stream_frames = self.config.get_bool("stream_frames", False)
+        self._delete_temporary_files = self.config.get_bool("delete_temporary_files_afterwards", True)
+        self._frame_offset = None
+        self._created_files = set()
+        # Maps each frame to the keys of the outputs, which have already been written while rendering
+        self._streamed_keys = {}
+        if self._stream_frames:
+            if self._write_to_shard:
+                raise Exception("stream_frames can not be combined with write_to_shard")
+            self._stream_executor = ThreadPoolExecutor(max_workers=1)
+            self._pending_writes = deque()
+            self._stream_error = None
+            RendererUtility.add_frame_listener(self._stream_frame)
+        else:
+            # All registered outputs are read in run()
+            Utility.register_output_consumer(None)
 
     def run(self):
         if self._avoid_rendering:
             print("Avoid rendering is on, no output produced!")
             return
 
-        if self.config.get_bool("append_to_existing_output", False):
-            frame_offset = 0
-            # Look for hdf5 file with highest index
-            for path in os.listdir(self._determine_output_dir(False)):
-                if path.endswith(".hdf5"):
-                    index = path[:-len(".hdf5")]
-                    if index.isdigit():
-                        frame_offset = max(frame_offset, int(index) + 1)
+        if self._stream_frames:
+            self._finish_streaming()
+
+        if not GlobalStorage.is_in_storage("output"):
+            print("No output was designed in prior models!")
+            return
+
+        frames = range(bpy.context.scene.frame_start, bpy.context.scene.frame_end)
+        if self._write_to_shard:
+            # Collect the camera poses before any worker starts, as this changes the current frame
+            cam2world_matrices = {}
+            for frame in frames:
+                with KeyFrame(frame):
+                    cam2world_matrices[frame] = np.array(bpy.context.scene.camera.matrix_world)
+
+            self._open_shard(self.config.get_bool("append_to_existing_output", self._shares_shard))
+            try:
+                self._write_frames(frames, lambda frame, datasets: self._append_frame_to_shard(frame, cam2world_matrices[frame], datasets))
+                # The frames of this run are only kept by later runs, after all of them have been written
+                self._shard_file.attrs["committed_frames"] = self._get_shard_size(self._shard_file)
+            finally:
+                self._shard_file.close()
+        else:
+            self._write_frames(frames, self._write_frame)
+
+    def _get_frame_offset(self):
+        """ Returns the offset, which is added to the frame number to get the name of the hdf5 file of a frame.
+
+        The offset is only determined once, s.t. the files written by this module itself are not taken into account.
+
+        :return: The frame offset.
+        """
+        if self._frame_offset is None:
+            self._frame_offset = 0
+            if self.config.get_bool("append_to_existing_output", False):
+                # Look for hdf5 file with highest index
+                for path in os.listdir(self._determine_output_dir(False)):
+                    if path.endswith(".hdf5"):
+                        index = path[:-len(".hdf5")]
+                        if index.isdigit():
+                            self._frame_offset = max(self._frame_offset, int(index) + 1)
+        return self._frame_offset
+
+    def _stream_frame(self, frame):
+        """ Hands all outputs of the given frame, which exist by now, to the writer thread.
+
+        This is called by the RendererUtility after each rendered frame. The outputs are loaded and postprocessed
+        here, as the postprocessing might access blender, the compression and writing is done by the writer thread.
+
+        :param frame: The number of the rendered frame.
+        """
+        if self._stream_error is not None or not GlobalStorage.is_in_storage("output"):
+            return
+        try:
+            streamed_keys = self._streamed_keys.setdefault(frame, set())
+            output_types = []
+            deletable_paths = []
+            for output_type in GlobalStorage.get("output"):
+                if output_type["key"] not in streamed_keys:
+                    paths = self._get_output_paths(output_type, frame)
+                    if paths is not None:
+                        output_types.append(output_type)
+                        # Files which are read by other modules later on have to be kept
+                        if not Utility.is_output_consumed(output_type["key"]):
+                            deletable_paths.extend(paths)
+            if not output_types:
+                return
+            streamed_keys.update(output_type["key"] for output_type in output_types)
+            datasets = self._prepare_frame(frame, output_types)
+
+            # Only keep a few frames in memory, if writing is slower than rendering, the rendering has to wait
+            while len(self._pending_writes) >= 2:
+                self._pending_writes.popleft().result()
+            self._pending_writes.append(self._stream_executor.submit(self._write_streamed_frame, frame, datasets, deletable_paths))
+        except Exception as e:
+            # Blender ignores exceptions in render handlers, so the error is raised when this module is run
+            self._stream_error = e
+
+    def _write_streamed_frame(self, frame, datasets, deletable_paths):
+        """ Compresses and writes the given outputs of one frame and removes their temporary input files.
+
+        :param frame: The frame number.
+        :param datasets: The list of tuples (key, data, compressed_chunks) returned by _prepare_frame().
+        :param deletable_paths: The paths of the files, the outputs were loaded from and which are not used anymore.
+        """
+        self._write_frame(frame, self._compress_frame(datasets))
+
+        if self._delete_temporary_files:
+            temp_dir = os.path.join(os.path.abspath(Utility.temp_dir), "")
+            for path in deletable_paths:
+                if os.path.abspath(path).startswith(temp_dir):
+                    os.remove(path)
+
+    def _finish_streaming(self):
+        """ Waits until all frames, which were streamed during rendering, are written. """
+        while self._pending_writes:
+            self._pending_writes.popleft().result()
+        self._stream_executor.shutdown()
+        if self._stream_error is not None:
+            raise self._stream_error
+
+    def _write_frames(self, frames, write_frame):
+        """ Prepares all given frames and hands them in order to the given write function.
+
+        :param frames: The frame numbers.
+        :param write_frame: A function, which gets the frame number and the prepared datasets of this frame.
+        """
+        if self._num_workers > 1:
+            # Compress the frames in a pool of worker threads, while the main thread loads the next frames and writes
+            # the finished frames in order. Loading stays in the main thread, as the postprocessing might access blender
+            with ThreadPoolExecutor(max_workers=self._num_workers) as executor:
+                pending_frames = deque()
+                for frame in frames:
+                    pending_frames.append((frame, executor.submit(self._compress_frame, self._prepare_frame(frame))))
+                    # Limit the number of frames in flight, s.t. not all frames are kept in memory at once
+                    if len(pending_frames) >= 2 * self._num_workers:
+                        finished_frame, future = pending_frames.popleft()
+                        write_frame(finished_frame, future.result())
+                while pending_frames:
+                    finished_frame, future = pending_frames.popleft()
+                    write_frame(finished_frame, future.result())
+        else:
+            for frame in frames:
+                write_frame(frame, self._prepare_frame(frame))
+
+    def _get_output_paths(self, output_type, frame):
+        """ Returns the paths of the files of the given output in the given frame.
+
+        :param output_type: The output entry, as registered in the GlobalStorage.
+        :param frame: The frame number.
+        :return: A list with the file path or with the left and right file path in the stereo case, None if the files do not exist.
+        """
+        # Build path (path attribute is format string)
+        file_path = output_type["path"]
+        if '%' in file_path:
+            file_path = file_path % frame
+
+        # Check if file exists
+        if os.path.exists(file_path):
+            return [file_path]
+        # If not try stereo suffixes
+        path_l, path_r = self._get_stereo_path_pair(file_path)
+        if os.path.exists(path_l) and os.path.exists(path_r):
+            return [path_l, path_r]
+        return None
+
+    def _prepare_frame(self, frame, output_types=None):
+        """ Loads and postprocesses the registered outputs of the given frame.
+
+        :param frame: The frame number.
+        :param output_types: The outputs to load. If None, all registered outputs, which were not written while rendering.
+        :return: A list of tuples (key, data, compressed_chunks), compressed_chunks is None as nothing is compressed yet.
+        """
+        print("Loading data of frame " + str(frame))
+        if output_types is None:
+            streamed_keys = self._streamed_keys.get(frame, set())
+            output_types = [output_type for output_type in GlobalStorage.get("output") if output_type["key"] not in streamed_keys]
+        datasets = []
+        # Go through all the output types
+        for output_type in output_types:
+            paths = self._get_output_paths(output_type, frame)
+            if paths is None:
+                raise Exception("File not found for frame {}: {}".format(frame, output_type["path"]))
+
+            if len(paths) == 2:
+                path_l, path_r = paths
+
+                img_l, new_key, new_version = self._load_and_postprocess(path_l, output_type["key"],
+                                                                           output_type["version"])
+                img_r, new_key, new_version = self._load_and_postprocess(path_r, output_type["key"],
+                                                                           output_type["version"])
+
+                if self.config.get_bool("stereo_separate_keys", False):
+                    datasets.append((new_key + "_0", img_l))
+                    datasets.append((new_key + "_1", img_r))
+                else:
+                    datasets.append((new_key, np.array([img_l, img_r])))
+
+            else:
+                data, new_key, new_version = self._load_and_postprocess(paths[0], output_type["key"],
+                                                                        output_type["version"])
+                datasets.append((new_key, data))
+
+            datasets.append((new_key + "_version", np.string_([new_version])))
+
+        return [(key, data, None) for key, data in datasets]
+
+    def _compress_frame(self, datasets):
+        """ Compresses the prepared data of one frame, this does not access blender and can run in a worker thread.
+
+        :param datasets: The list of tuples (key, data, compressed_chunks) returned by _prepare_frame().
+        :return: The list of tuples (key, data, compressed_chunks) with the compressed chunks of each data.
+        """
+        return [(key, data, self._compress_chunks(data)) for key, data, _ in datasets]
+
+    def _write_frame(self, frame, datasets):
+        """ Writes the prepared data of one frame into its hdf5 file.
+
+        The file is created on the first write of this module, further writes add their data to it.
+
+        :param frame: The frame number.
+        :param datasets: The list of tuples (key, data, compressed_chunks) returned by _prepare_frame().
+        """
+        if not datasets:
+            return
+        hdf5_path = os.path.join(self._determine_output_dir(False), str(frame + self._get_frame_offset()) + ".hdf5")
+        print("Merging data for frame " + str(frame) + " into " + hdf5_path)
+        is_new_file = hdf5_path not in self._created_files
+        with h5py.File(hdf5_path, "w" if is_new_file else "a") as f:
+            for key, data, compressed_chunks in datasets:
+                self._write_to_hdf_file(f, key, data, compressed_chunks)
+
+            blender_proc_version = Utility.get_current_version()
+            if blender_proc_version and is_new_file:
+                self._write_to_hdf_file(f, "blender_proc_version", np.string_(blender_proc_version))
+        self._created_files.add(hdf5_path)
+
+    def _get_shard_path(self, shard_index):
+        """ Returns the path of the shard file with the given index.
+
+        :param shard_index: The index of the shard.
+        :return: The path to the shard file.
+        """
+        return os.path.join(self._determine_output_dir(False), "{}_{:04d}.hdf5".format(self._shard_name, shard_index))
+
+    def _open_shard(self, append):
+        """ Opens the shard, into which the next frames should be written.
+
+        :param append: If true, the frames are appended to the newest existing shard, else the first shard is overwritten.
+        """
+        self._shard_index = 0
+        if append:
+            # Find the newest shard, without listing the whole output directory
+            while os.path.exists(self._get_shard_path(self._shard_index + 1)):
+                self._shard_index += 1
+            self._shard_file = h5py.File(self._get_shard_path(self._shard_index), "a")
+            self._discard_uncommitted_frames(self._shard_file)
+            # A shared shard is not split while a run writes into it, so it can only be full at the start of a run
+            if self._shares_shard and 0 < self._shard_max_frames <= self._get_shard_size(self._shard_file):
+                self._start_next_shard()
         else:
-            frame_offset = 0
-
-        # Go through all frames
-        for frame in range(bpy.context.scene.frame_start, bpy.context.scene.frame_end):
-
-            # Create output hdf5 file
-            hdf5_path = os.path.join(self._determine_output_dir(False), str(frame + frame_offset) + ".hdf5")
-            with h5py.File(hdf5_path, "w") as f:
-
-                if not GlobalStorage.is_in_storage("output"):
-                    print("No output was designed in prior models!")
-                    return
-                # Go through all the output types
-                print("Merging data for frame " + str(frame) + " into " + hdf5_path)
-
-                for output_type in GlobalStorage.get("output"):
-                    # Build path (path attribute is format string)
-                    file_path = output_type["path"]
-                    if '%' in file_path:
-                        file_path = file_path % frame
-
-                    # Check if file exists
-                    if not os.path.exists(file_path):
-                        # If not try stereo suffixes
-                        path_l, path_r = self._get_stereo_path_pair(file_path)
-                        if not os.path.exists(path_l) or not os.path.exists(path_r):
-                            raise Exception("File not found: " + file_path)
-                        else:
-                            use_stereo = True
-                    else:
-                        use_stereo = False
-
-                    if use_stereo:
-                        path_l, path_r = self._get_stereo_path_pair(file_path)
-
-                        img_l, new_key, new_version = self._load_and_postprocess(path_l, output_type["key"],
-                                                                                   output_type["version"])
-                        img_r, new_key, new_version = self._load_and_postprocess(path_r, output_type["key"],
-                                                                                   output_type["version"])
-
-                        if self.config.get_bool("stereo_separate_keys", False):
-                            self._write_to_hdf_file(f, new_key + "_0", img_l)
-                            self._write_to_hdf_file(f, new_key + "_1", img_r)
-                        else:
-                            data = np.array([img_l, img_r])
-                            self._write_to_hdf_file(f, new_key, data)
-
-                    else:
-                        data, new_key, new_version = self._load_and_postprocess(file_path, output_type["key"],
-                                                                                output_type["version"])
-
-                        self._write_to_hdf_file(f, new_key, data)
-
-                    self._write_to_hdf_file(f, new_key + "_version", np.string_([new_version]))
-
-                blender_proc_version = Utility.get_current_version()
-                if blender_proc_version:
-                    self._write_to_hdf_file(f, "blender_proc_version", np.string_(blender_proc_version))
-
-    def _write_to_hdf_file(self, file, key, data):
+            self._shard_file = h5py.File(self._get_shard_path(self._shard_index), "w")
+            self._shard_file.attrs["committed_frames"] = 0
+
+    def _start_next_shard(self):
+        """ Closes the current shard and creates the next one. """
+        self._shard_file.close()
+        self._shard_index += 1
+        self._shard_file = h5py.File(self._get_shard_path(self._shard_index), "w")
+        self._shard_file.attrs["committed_frames"] = 0
+
+    @staticmethod
+    def _discard_uncommitted_frames(shard_file):
+        """ Removes all frames of the given shard, which were written by a run that did not finish.
+
+        If the run of a batch line is interrupted, the line is run again later on, so its frames would be duplicated.
+
+        :param shard_file: The hdf5 file handle of the shard.
+        """
+        if "committed_frames" not in shard_file.attrs:
+            return
+        committed_frames = int(shard_file.attrs["committed_frames"])
+        datasets = []
+        shard_file.visititems(lambda name, item: datasets.append(item) if isinstance(item, h5py.Dataset) else None)
+        for dataset in datasets:
+            if dataset.shape[0] > committed_frames:
+                dataset.resize(committed_frames, axis=0)
+
+    @staticmethod
+    def _get_shard_size(shard_file):
+        """ Returns the number of frames which are completely written into the given shard.
+
+        The frame index is written as last dataset of each frame, so its length is the number of complete frames.
+
+        :param shard_file: The hdf5 file handle of the shard.
+        :return: The number of frames.
+        """
+        return len(shard_file["index/frame"]) if "index/frame" in shard_file else 0
+
+    def _append_frame_to_shard(self, frame, cam2world_matrix, datasets):
+        """ Appends the prepared data of one frame to the datasets of the current shard.
+
+        If the current shard is full, the next shard is started, except if the shard is shared by the batch lines of
+        one worker, see _open_shard().
+
+        :param frame: The frame number.
+        :param cam2world_matrix: The camera pose of this frame.
+        :param datasets: The list of tuples (key, data, compressed_chunks) returned by _prepare_frame().
+        """
+        if not self._shares_shard and 0 < self._shard_max_frames <= self._get_shard_size(self._shard_file):
+            # All frames of the full shard have been written by this run
+            self._shard_file.attrs["committed_frames"] = self._get_shard_size(self._shard_file)
+            self._start_next_shard()
+
+        row = self._get_shard_size(self._shard_file)
+        print("Appending data for frame " + str(frame) + " to " + self._shard_file.filename + " at index " + str(row))
+        for key, data, compressed_chunks in datasets:
+            self._append_to_hdf_dataset(self._shard_file, key, row, data, compressed_chunks)
+
+        blender_proc_version = Utility.get_current_version()
+        if blender_proc_version:
+            self._shard_file.attrs["blender_proc_version"] = np.string_(blender_proc_version)
+
+        # The index is written last, s.t. a frame only counts as written, if all its data is there
+        self._append_to_hdf_dataset(self._shard_file, "index/scene", row, np.string_(self._scene_id))
+        self._append_to_hdf_dataset(self._shard_file, "index/cam2world_matrix", row, cam2world_matrix)
+        self._append_to_hdf_dataset(self._shard_file, "index/frame", row, np.array(frame, dtype=np.int64))
+        self._shard_file.flush()
+
+    def _append_to_hdf_dataset(self, file, key, row, data, compressed_chunks=None):
+        """ Writes the given data at the given row of the resizable dataset with the given key.
+
+        The dataset is created on first use, its first axis is the frame axis and each frame is one chunk along it.
+
+        :param file: The hdf5 file handle.
+        :param key: The key of the dataset. Type: string.
+        :param row: The index along the frame axis.
+        :param data: The data of one frame.
+        :param compressed_chunks: The already gzip compressed chunks of the data, see _compress_chunks().
+        """
+        is_string = data.dtype.char == 'S'
+        if key not in file:
+            if is_string:
+                # Strings can differ in length between frames
+                file.create_dataset(key, shape=(0,) + data.shape, maxshape=(None,) + data.shape,
+                                    dtype=h5py.special_dtype(vlen=bytes), chunks=(1,) + data.shape if data.ndim else (1,))
+            else:
+                compression_args = {}
+                if self._compression != "none":
+                    compression_args["compression"] = self._compression
+                    if self._compression == "gzip":
+                        compression_args["compression_opts"] = self._compression_level
+                file.create_dataset(key, shape=(0,) + data.shape, maxshape=(None,) + data.shape, dtype=data.dtype,
+                                    chunks=(1,) + self._get_chunk_shape(data.shape), **compression_args)
+        dataset = file[key]
+        if dataset.shape[1:] != data.shape:
+            raise Exception("The shape {} of {} differs from the shape {} of the previous frames in this shard, use a "
+                            "separate shard for this data.".format(data.shape, key, dataset.shape[1:]))
+
+        if dataset.shape[0] <= row:
+            dataset.resize(row + 1, axis=0)
+        if compressed_chunks is not None:
+            for offset, compressed_chunk in compressed_chunks:
+                dataset.id.write_direct_chunk((row,) + tuple(offset), compressed_chunk)
+        elif is_string:
+            dataset[row] = data.astype(object)
+        else:
+            dataset[row] = data
+
+    def _get_chunk_shape(self, shape):
+        """ Returns the chunk shape for a dataset with the given shape.
+
+        :param shape: The shape of the dataset.
+        :return: The configured chunk shape clipped to the dataset shape, or the whole dataset as one chunk if no chunks are configured.
+        """
+        if not self._chunks:
+            return tuple(shape)
+        # Missing dimensions are not split
+        chunks = list(self._chunks[:len(shape)]) + list(shape[len(self._chunks):])
+        return tuple(max(1, min(int(chunk), size)) for chunk, size in zip(chunks, shape))
+
+    def _compress_chunks(self, data):
+        """ Splits the given data into chunks and compresses each of them with gzip.
+
+        The compressed chunks can be directly written into a hdf5 dataset with the gzip filter. This is only possible
+        for gzip, as it is the only hdf5 compression, which is available in plain python (zlib).
+
+        :param data: The data to compress.
+        :return: A list of tuples (chunk_offset, compressed_bytes) or None if the data can not be precompressed.
+        """
+        if self._compression != "gzip" or data.dtype.char == 'S' or data.ndim == 0 or data.size == 0:
+            return None
+        data = np.ascontiguousarray(data)
+        chunk_shape = self._get_chunk_shape(data.shape)
+        compressed_chunks = []
+        for offset in itertools.product(*[range(0, size, chunk) for size, chunk in zip(data.shape, chunk_shape)]):
+            block = data[tuple(slice(start, start + chunk) for start, chunk in zip(offset, chunk_shape))]
+            # hdf5 always stores complete chunks, so chunks at the border are padded
+            if block.shape != chunk_shape:
+                padded_block = np.zeros(chunk_shape, dtype=data.dtype)
+                padded_block[tuple(slice(0, size) for size in block.shape)] = block
+                block = padded_block
+            compressed_chunks.append((offset, zlib.compress(np.ascontiguousarray(block).tobytes(), self._compression_level)))
+        return compressed_chunks
+
+    def _write_to_hdf_file(self, file, key, data, compressed_chunks=None):
         """ Adds the given data as a new entry to the given hdf5 file.
 
         :param file: The hdf5 file handle.
         :param key: The key at which the data should be stored in the hdf5 file. Type: string.
         :param data: The data to store.
+        :param compressed_chunks: The already gzip compressed chunks of the data, see _compress_chunks().
         """
         if data.dtype.char == 'S':
             file.create_dataset(key, data=data, dtype=data.dtype)
+        elif compressed_chunks is not None:
+            dataset = file.create_dataset(key, shape=data.shape, dtype=data.dtype, chunks=self._get_chunk_shape(data.shape),
+                                          compression="gzip", compression_opts=self._compression_level)
+            for offset, compressed_chunk in compressed_chunks:
+                dataset.id.write_direct_chunk(offset, compressed_chunk)
+        elif self._compression == "none" or data.ndim == 0:
+            file.create_dataset(key, data=data)
         else:
-            file.create_dataset(key, data=data, compression=self.config.get_string("compression", 'gzip'))
+            file.create_dataset(key, data=data, compression=self._compression,
+                                compression_opts=self._compression_level if self._compression == "gzip" else None,
+                                chunks=self._get_chunk_shape(data.shape) if self._chunks else True)
 
     def _get_stereo_path_pair(self, file_path):
         """
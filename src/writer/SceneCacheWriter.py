@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import pickle
+
+import bpy
+
+from src.main.GlobalStorage import GlobalStorage
+from src.utility.Utility import Utility
+from src.writer.BlenderWriter import BlenderWriter
+
+
+class SceneCacheWriter(BlenderWriter):
+    """ Stores the scene assembled by all previous modules in a cache, so the next run with the same config can skip them.
+
+    The scene is identified by a hash over the configs of all previous modules, the modification times of all input
+    files and directories mentioned in these configs and the blender version. If the cache already contains a scene
+    with this hash, the pipeline opens the cached .blend file instead of running the previous modules. Only the
+    modules of the main package, like the Initializer, are run anyway, as they also configure blender itself.
+
+    Paths given for outputs, temporary files and caches (e.g. "output_dir" or "mesh_cache_dir") are not taken into
+    account, as they change in every run. Directories only contribute their own modification time, which changes if
+    files are added to or removed from them, but not if a file inside of them is changed in place.
+
+    This module should be placed after the loaders, material and object manipulators, but before the camera and light
+    samplers and renderers, so these can still change between runs. Random values sampled by the previous modules are
+    also cached, so the cached scene is always the same. The values the previous modules stored in the GlobalStorage
+    are cached next to the scene and restored on load. If they can not be pickled, the scene is not cached.
+
+    **Configuration**:
+
+    .. list-table::
+        :widths: 25 100 10
+        :header-rows: 1
+
+        * - Parameter
+          - Description
+          - Type
+        * - cache_dir
+          - The directory, in which the cached scenes are stored.
+          - string
+    """
+
+    def __init__(self, config):
+        BlenderWriter.__init__(self, config)
+        self.cache_dir = Utility.resolve_path(self.config.get_string("cache_dir"))
+        self.cache_path = None
+
+    def set_previous_module_configs(self, module_configs):
+        """ Computes the path of the cached scene for the given configs of the previous modules.
+
+        :param module_configs: The configs of all modules before this one, like they are given in the config file.
+        :return: The path of the cached .blend file.
+        """
+        scene_hash = hashlib.sha1()
+        scene_hash.update(json.dumps(module_configs, sort_keys=True, default=str).encode())
+        scene_hash.update(json.dumps(SceneCacheWriter._get_input_file_mtimes(module_configs), sort_keys=True).encode())
+        scene_hash.update(bpy.app.version_string.encode())
+        self.cache_path = os.path.join(self.cache_dir, scene_hash.hexdigest() + ".blend")
+        return self.cache_path
+
+    @staticmethod
+    def get_global_storage_path(cache_path):
+        """ Returns the path of the file, in which the GlobalStorage of the cached scene is stored.
+
+        :param cache_path: The path of the cached .blend file.
+        :return: The path of the pickled GlobalStorage values.
+        """
+        return cache_path[:-len(".blend")] + ".global_storage.pickle"
+
+    @staticmethod
+    def _is_output_key(key):
+        """ Checks if the config value with the given key is a path, which is written by the pipeline.
+
+        :param key: The key of the config value.
+        :return: True, if the value is an output, temporary or cache path.
+        """
+        return key is not None and (key.endswith("output_dir") or key.endswith("cache_dir") or key in
+                                    ["temp_dir", "asset_library_dir", "preprocessed_models_dir"])
+
+    @staticmethod
+    def _get_input_file_mtimes(value, key=None):
+        """ Collects the modification times of all existing input files and directories mentioned in the given config value.
+
+        :param value: A config value, dicts and lists are searched recursively.
+        :param key: The key of the config value, output paths are skipped, see _is_output_key().
+        :return: A dict mapping each mentioned path to its modification time.
+        """
+        mtimes = {}
+        if SceneCacheWriter._is_output_key(key):
+            return mtimes
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                mtimes.update(SceneCacheWriter._get_input_file_mtimes(sub_value, sub_key))
+        elif isinstance(value, list):
+            for sub_value in value:
+                mtimes.update(SceneCacheWriter._get_input_file_mtimes(sub_value, key))
+        elif isinstance(value, str) and value.strip():
+            path = Utility.resolve_path(value)
+            if os.path.exists(path):
+                mtimes[path] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def run(self):
+        if self.cache_path is None:
+            raise Exception("The SceneCacheWriter can only be used inside of a pipeline.")
+        try:
+            global_storage = pickle.dumps(GlobalStorage.get_storage_dict())
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            print("Warning: The scene is not cached, as the values stored in the GlobalStorage can not be "
+                  "pickled: {}".format(e))
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Save to temporary files first, so other processes never open a partially written scene. The GlobalStorage
+        # is stored first, as the scene is only loaded if the .blend file exists
+        storage_path = SceneCacheWriter.get_global_storage_path(self.cache_path)
+        temp_storage_path = "{}.{}.tmp".format(storage_path, os.getpid())
+        with open(temp_storage_path, "wb") as f:
+            f.write(global_storage)
+        os.replace(temp_storage_path, storage_path)
+
+        temp_path = "{}.{}.tmp.blend".format(self.cache_path[:-len(".blend")], os.getpid())
+        BlenderWriter.save_scene(temp_path, copy=True)
+        os.replace(temp_path, self.cache_path)
+        print("Stored scene in cache: " + self.cache_path)
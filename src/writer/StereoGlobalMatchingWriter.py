@@ -67,6 +67,7 @@ def __init__(self, config):
         self.rgb_output_key = self.config.get_string("rgb_output_key", "colors")
         if self.rgb_output_key is None:
             raise Exception("RGB output is not registered, please register the RGB renderer before this module.")
+        Utility.register_output_consumer(self.rgb_output_key)
 
         self.output_dir = self._determine_output_dir()
         if not os.path.exists(self.output_dir):
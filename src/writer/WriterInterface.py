@@ -177,7 +177,11 @@ def _load_npy(self, file_path):
         :param file_path: The path. Type: string.
         :return: The content of the file
         """
-        return np.load(file_path)
+        data = np.load(file_path)
+        if isinstance(data, np.lib.npyio.NpzFile):
+            # .npz containers written by BlenderProc only hold one array
+            data = data[data.files[0]]
+        return data
 
     def _load_csv(self, file_path):
         """ Load the csv file at the given path.
@@ -0,0 +1,41 @@
+""" Checks that the BatchJournal skips the lines completed by a previous run. """
+import os
+import tempfile
+import unittest
+
+from src.utility.BatchJournal import BatchJournal
+
+
+class TestBatchJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.journal_path = BatchJournal.default_path(os.path.join(self.temp_dir.name, "index.txt"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_replay(self):
+        journal = BatchJournal(self.journal_path)
+        self.assertFalse(journal.is_completed("house_0 out_0\n"))
+        journal.mark_completed("house_0 out_0\n")
+        journal.mark_completed("house_1 out_1")
+        self.assertTrue(journal.is_completed("house_0 out_0"))
+
+        # A restarted batch reads the completed lines from the journal file
+        replayed_journal = BatchJournal(self.journal_path)
+        self.assertTrue(replayed_journal.is_completed("house_0 out_0"))
+        self.assertTrue(replayed_journal.is_completed("  house_1 out_1\n"))
+        self.assertFalse(replayed_journal.is_completed("house_2 out_2"))
+
+    def test_skip_partially_written_line(self):
+        with open(self.journal_path, "w") as f:
+            # The last line was interrupted while it was written
+            f.write("house_0 out_0\nhouse_1 ou")
+        journal = BatchJournal(self.journal_path)
+        self.assertTrue(journal.is_completed("house_0 out_0"))
+        self.assertFalse(journal.is_completed("house_1 ou"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+""" Checks that the BatchWorkQueue hands out each line once and only accepts workers with the right authkey. """
+import os
+import time
+import unittest
+from multiprocessing import AuthenticationError
+
+from src.utility.BatchWorkQueue import BatchWorkQueue, BatchWorkQueueClient
+
+
+class TestBatchWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.authkey = os.urandom(16)
+        self.queue = BatchWorkQueue([(0, "line_0\n"), (2, "line_2\n")], self.authkey)
+        self.queue.start()
+
+    def tearDown(self):
+        self.queue.close()
+
+    def wait_for_results(self, amount):
+        """ Waits until the queue has stored the given amount of results, as these are added by its threads.
+
+        :param amount: The number of expected results.
+        """
+        for _ in range(100):
+            with self.queue._lock:
+                if len(self.queue._results) >= amount:
+                    return
+            time.sleep(0.01)
+        self.fail("The queue did not receive {} results".format(amount))
+
+    def test_hand_off(self):
+        first_worker = BatchWorkQueueClient(self.queue.address, self.authkey, "first")
+        second_worker = BatchWorkQueueClient(self.queue.address, self.authkey, "second")
+
+        # The lines are handed out in order, each one only once
+        self.assertEqual(first_worker.next_line(), (0, "line_0\n"))
+        self.assertEqual(second_worker.next_line(), (2, "line_2\n"))
+        self.assertIsNone(first_worker.next_line())
+
+        first_worker.report(0, True, 1.0)
+        second_worker.report(2, False, 2.0, "error")
+        first_worker.close()
+        second_worker.close()
+        self.wait_for_results(2)
+        self.assertEqual(self.queue.failed_lines(), [2])
+
+    def test_worker_terminated_during_line(self):
+        worker = BatchWorkQueueClient(self.queue.address, self.authkey, "worker")
+        self.assertEqual(worker.next_line(), (0, "line_0\n"))
+        # Disconnecting without a report counts as crash, the line which was never handed out is also failed
+        worker.close()
+        self.wait_for_results(1)
+        self.assertEqual(self.queue.failed_lines(), [0, 2])
+
+    def test_reject_wrong_authkey(self):
+        with self.assertRaises(AuthenticationError):
+            BatchWorkQueueClient(self.queue.address, os.urandom(16), "intruder")
+
+        # The queue still serves workers with the right key
+        worker = BatchWorkQueueClient(self.queue.address, self.authkey, "worker")
+        self.assertEqual(worker.next_line(), (0, "line_0\n"))
+        worker.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
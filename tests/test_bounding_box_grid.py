@@ -0,0 +1,73 @@
+""" Checks that the BoundingBoxGrid finds the same objects as a brute force check, also across its rebuilds. """
+import unittest
+
+import numpy as np
+
+from src.utility.BoundingBoxGrid import BoundingBoxGrid
+
+
+class Box(object):
+    """ An object with a fixed axis aligned bounding box, which can be placed in the grid without blender. """
+
+    def __init__(self, name, bb_min, bb_max):
+        self.name = name
+        self.bb_min = np.array(bb_min, dtype=np.float64)
+        self.bb_max = np.array(bb_max, dtype=np.float64)
+
+
+class BoxGrid(BoundingBoxGrid):
+    """ A grid over boxes instead of blender objects. """
+
+    @staticmethod
+    def get_aabb(obj):
+        return obj.bb_min, obj.bb_max
+
+
+def overlapping_boxes(boxes, query):
+    """ Returns the names of all given boxes, which overlap the query box, by checking each of them. """
+    return sorted(box.name for box in boxes if box is not query and np.all(box.bb_max >= query.bb_min) and
+                  np.all(query.bb_max >= box.bb_min))
+
+
+class TestBoundingBoxGrid(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.boxes = []
+        for i in range(40):
+            bb_min = random_state.uniform(-5, 5, size=3)
+            self.boxes.append(Box("box_{}".format(i), bb_min, bb_min + random_state.uniform(0.1, 1.5, size=3)))
+        # A large object like a floor, which is not stored in the cells
+        self.boxes.append(Box("floor", [-10, -10, -1], [10, 10, 0]))
+
+    def assert_queries_match(self, grid, boxes):
+        for query in self.boxes:
+            self.assertEqual(sorted(box.name for box in grid.query(query)), overlapping_boxes(boxes, query))
+
+    def test_insert_and_query_across_rebuilds(self):
+        grid = BoxGrid()
+        for i, box in enumerate(self.boxes):
+            grid.add(box)
+            # The grid is rebuilt after 8, 16 and 32 boxes
+            self.assert_queries_match(grid, self.boxes[:i + 1])
+
+    def test_remove(self):
+        grid = BoxGrid(self.boxes[:10])
+        for box in self.boxes[:5]:
+            grid.remove(box)
+        # Adding more boxes rebuilds the grid, the removed boxes must not come back
+        for box in self.boxes[10:]:
+            grid.add(box)
+        self.assert_queries_match(grid, self.boxes[5:])
+
+    def test_move(self):
+        grid = BoxGrid(self.boxes)
+        moved_box = self.boxes[0]
+        # Adding an object again updates its bounding box
+        moved_box.bb_min, moved_box.bb_max = moved_box.bb_min + 3, moved_box.bb_max + 3
+        grid.add(moved_box)
+        self.assert_queries_match(grid, self.boxes)
+
+
+if __name__ == "__main__":
+    unittest.main()
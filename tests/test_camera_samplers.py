@@ -0,0 +1,78 @@
+""" Checks the camera samplers, which test if a camera position is above a floor object.
+
+These tests need blender, run them from the repository root via:
+
+    blender --background --python-expr "import sys, unittest; sys.path.append('.'); unittest.main(module=None, argv=['', 'discover', '-s', 'tests'])"
+"""
+import tempfile
+import unittest
+
+try:
+    import bpy
+    from mathutils import Vector
+except ImportError:
+    bpy = None
+
+
+def create_plane(name, z, size=1.0):
+    """ Creates a horizontal square mesh object.
+
+    :param name: The name of the new object.
+    :param z: The height of the plane.
+    :param size: Half of the side length of the plane.
+    :return: The new object.
+    """
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata([(-size, -size, z), (size, -size, z), (size, size, z), (-size, size, z)], [], [(0, 1, 2, 3)])
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+
+@unittest.skipIf(bpy is None, "blender is not available")
+class TestCameraSamplersAboveFloor(unittest.TestCase):
+
+    def setUp(self):
+        from src.utility.Config import Config
+
+        for obj in list(bpy.data.objects):
+            bpy.data.objects.remove(obj)
+        self.floor = create_plane("Floor", 0)
+        self.floor["is_3D_future"] = True
+        self.chair = create_plane("Chair", 0.5, size=0.2)
+        self.chair["is_3D_future"] = True
+        self.output_dir = tempfile.mkdtemp()
+        self.config = Config({"output_dir": self.output_dir, "cam_poses": []})
+
+    def _check_sampler(self, sampler_class):
+        sampler = sampler_class(self.config)
+        # No checks are configured, so the scene bvh tree has not been built before
+        self.assertTrue(sampler._position_is_above_object(Vector([0.5, 0.5, 1]), self.floor))
+        self.assertFalse(sampler._position_is_above_object(Vector([0, 0, 1]), self.floor))
+        self.assertFalse(sampler._position_is_above_object(Vector([2, 2, 1]), self.floor))
+
+    def test_camera_sampler(self):
+        from src.camera.CameraSampler import CameraSampler
+        self._check_sampler(CameraSampler)
+
+    def test_front_3d_camera_sampler(self):
+        from src.camera.Front3DCameraSampler import Front3DCameraSampler
+        self._check_sampler(Front3DCameraSampler)
+
+        # run() counts the objects above each floor, before any camera pose is sampled
+        sampler = Front3DCameraSampler(self.config)
+        sampler.run()
+        # The only floor has less objects above it than required by default
+        self.assertEqual(sampler.used_floors, [])
+
+    def test_suncg_camera_sampler(self):
+        from src.camera.SuncgCameraSampler import SuncgCameraSampler
+        self._check_sampler(SuncgCameraSampler)
+
+    def test_replica_camera_sampler(self):
+        from src.camera.ReplicaCameraSampler import ReplicaCameraSampler
+        self._check_sampler(ReplicaCameraSampler)
+
+
+if __name__ == "__main__":
+    unittest.main()
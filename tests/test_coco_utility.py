@@ -0,0 +1,77 @@
+""" Compares the vectorized mask encodings of the CocoUtility with the previous implementations. """
+import unittest
+from itertools import groupby
+
+import numpy as np
+
+try:
+    from src.utility.CocoUtility import CocoUtility
+except ImportError:
+    CocoUtility = None
+
+
+def binary_mask_to_rle_reference(binary_mask):
+    """ The previous implementation of CocoUtility.binary_mask_to_rle(). """
+    rle = {'counts': [], 'size': list(binary_mask.shape)}
+    counts = rle.get('counts')
+    for i, (value, elements) in enumerate(groupby(binary_mask.ravel(order='F'))):
+        if i == 0 and value == 1:
+            counts.append(0)
+        counts.append(len(list(elements)))
+    return rle
+
+
+def bbox_from_binary_mask_reference(binary_mask):
+    """ The previous bounding box computation, which was done for each instance mask on its own. """
+    rows = np.any(binary_mask, axis=1)
+    cols = np.any(binary_mask, axis=0)
+    rmin, rmax = np.where(rows)[0][[0, -1]]
+    cmin, cmax = np.where(cols)[0][[0, -1]]
+    return [int(cmin), int(rmin), int(cmax - cmin + 1), int(rmax - rmin + 1)]
+
+
+@unittest.skipIf(CocoUtility is None, "the requirements of the CocoUtility are not installed")
+class TestCocoUtility(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.masks = [
+            np.zeros((4, 5), dtype=np.uint8),
+            np.ones((4, 5), dtype=np.uint8),
+            # Runs crossing the border between two columns
+            np.array([[0, 1, 0], [0, 0, 1], [1, 0, 1]], dtype=np.uint8),
+            np.array([[1, 0], [1, 1]], dtype=np.uint8),
+        ]
+        self.masks += [(random_state.rand(13, 17) > threshold).astype(np.uint8) for threshold in [0.1, 0.5, 0.9]]
+
+    def test_rle(self):
+        for mask in self.masks:
+            self.assertEqual(CocoUtility.binary_mask_to_rle(mask), binary_mask_to_rle_reference(mask))
+
+    def test_cropped_rle(self):
+        image = np.zeros((10, 12), dtype=np.uint8)
+        image[2:6, 3:8] = self.masks[4][:4, :5]
+        rle = CocoUtility.binary_mask_to_rle(image[2:6, 3:8], image_size=image.shape, offset=(2, 3))
+        self.assertEqual(rle, binary_mask_to_rle_reference(image))
+
+    def test_bboxes_and_areas(self):
+        segmentation_map = np.random.RandomState(1).randint(0, 5, size=(11, 9))
+        # One instance only covering a single pixel and one covering a whole column
+        segmentation_map[3, 4] = 7
+        segmentation_map[:, 8] = 9
+        instances, bboxes, areas = CocoUtility.calc_bboxes_and_areas(segmentation_map)
+        self.assertEqual(instances.tolist(), np.unique(segmentation_map).tolist())
+        for instance, bbox, area in zip(instances, bboxes, areas):
+            mask = segmentation_map == instance
+            self.assertEqual(bbox.tolist(), bbox_from_binary_mask_reference(mask))
+            self.assertEqual(area, mask.sum())
+
+    def test_full_mask_bbox(self):
+        instances, bboxes, areas = CocoUtility.calc_bboxes_and_areas(np.ones((4, 5), dtype=np.uint8))
+        self.assertEqual(instances.tolist(), [1])
+        self.assertEqual(bboxes.tolist(), [[0, 0, 5, 4]])
+        self.assertEqual(areas.tolist(), [20])
+
+
+if __name__ == "__main__":
+    unittest.main()
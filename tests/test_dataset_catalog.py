@@ -0,0 +1,69 @@
+""" Checks that the DatasetCatalog reuses its entries until a file or directory they depend on changes. """
+import os
+import tempfile
+import unittest
+
+from src.utility.DatasetCatalog import DatasetCatalog
+
+
+class TestDatasetCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.temp_dir.name, "dataset")
+        self.previous_catalog_dir = os.environ.get("BLENDER_PROC_CATALOG_DIR")
+        os.environ["BLENDER_PROC_CATALOG_DIR"] = os.path.join(self.temp_dir.name, "catalogs")
+        DatasetCatalog._catalogs = {}
+        for synset in ["02691156", "03001627"]:
+            for model in ["model_0", "model_1"]:
+                os.makedirs(os.path.join(self.root, synset, model, "models"))
+                open(os.path.join(self.root, synset, model, "models", "model_normalized.obj"), "w").close()
+
+    def tearDown(self):
+        DatasetCatalog._catalogs = {}
+        if self.previous_catalog_dir is None:
+            del os.environ["BLENDER_PROC_CATALOG_DIR"]
+        else:
+            os.environ["BLENDER_PROC_CATALOG_DIR"] = self.previous_catalog_dir
+        self.temp_dir.cleanup()
+
+    def set_mtime(self, path, mtime_ns):
+        """ Sets the modification time explicitly, as two changes within a short time might get the same mtime. """
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_glob(self):
+        expected = [os.path.join(self.root, "02691156", model, "models", "model_normalized.obj") for model in ["model_0", "model_1"]]
+        self.assertEqual(DatasetCatalog.glob(self.root, "02691156/*/models/*.obj"), expected)
+
+        # A new model is only found, after the mtime of the listed directory changed
+        os.makedirs(os.path.join(self.root, "02691156", "model_2", "models"))
+        open(os.path.join(self.root, "02691156", "model_2", "models", "model_normalized.obj"), "w").close()
+        synset_dir = os.path.join(self.root, "02691156")
+        self.set_mtime(synset_dir, os.stat(synset_dir).st_mtime_ns + 10 ** 9)
+        expected.append(os.path.join(self.root, "02691156", "model_2", "models", "model_normalized.obj"))
+        self.assertEqual(DatasetCatalog.glob(self.root, "02691156/*/models/*.obj"), expected)
+
+    def test_invalidate_on_mtime_change(self):
+        builds = []
+
+        def build():
+            builds.append(len(builds))
+            return sorted(os.listdir(self.root)), [self.root]
+
+        self.assertEqual(DatasetCatalog.get(self.root, "synsets", build), ["02691156", "03001627"])
+        self.assertEqual(DatasetCatalog.get(self.root, "synsets", build), ["02691156", "03001627"])
+        self.assertEqual(len(builds), 1)
+
+        # The entry is also reused by a new process, which loads the catalog from disk
+        DatasetCatalog._catalogs = {}
+        self.assertEqual(DatasetCatalog.get(self.root, "synsets", build), ["02691156", "03001627"])
+        self.assertEqual(len(builds), 1)
+
+        os.makedirs(os.path.join(self.root, "04379243"))
+        self.set_mtime(self.root, os.stat(self.root).st_mtime_ns + 10 ** 9)
+        self.assertEqual(DatasetCatalog.get(self.root, "synsets", build), ["02691156", "03001627", "04379243"])
+        self.assertEqual(len(builds), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+""" Checks that the object index pass is reverted after rendering, s.t. later renderings do not overwrite it.
+
+These tests need blender, run them from the repository root via:
+
+    blender --background --python-expr "import sys, unittest; sys.path.append('.'); unittest.main(module=None, argv=['', 'discover', '-s', 'tests'])"
+"""
+import tempfile
+import unittest
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+def create_triangle(name):
+    """ Creates a mesh object consisting of one triangle.
+
+    :param name: The name of the new object.
+    :return: The new object.
+    """
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata([(0, 0, 0), (1, 0, 0), (0, 1, 0)], [], [(0, 1, 2)])
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+
+@unittest.skipIf(bpy is None, "blender is not available")
+class TestObjectIndexOutput(unittest.TestCase):
+
+    def setUp(self):
+        for obj in list(bpy.data.objects):
+            bpy.data.objects.remove(obj)
+        self.objects = [create_triangle("Chair"), create_triangle("Table")]
+        self.objects[0].pass_index = 5
+        self.objects[1].pass_index = 7
+        self.output_dir = tempfile.mkdtemp()
+
+    @staticmethod
+    def _get_index_output_links():
+        return [link for link in bpy.context.scene.node_tree.links if link.from_socket.name == "IndexOB"]
+
+    def test_output_is_removed_after_rendering(self):
+        from src.utility.RendererUtility import RendererUtility
+
+        RendererUtility.enable_object_index_output(self.output_dir)
+        self.assertEqual(len(self._get_index_output_links()), 1)
+        self.assertEqual(sorted(obj.pass_index for obj in self.objects), [1, 2])
+
+        RendererUtility.disable_object_index_output()
+        # A second rendering neither writes the object index images again nor sees the changed pass indices
+        self.assertEqual(self._get_index_output_links(), [])
+        self.assertEqual([obj.pass_index for obj in self.objects], [5, 7])
+
+    def test_objects_are_found_after_renaming(self):
+        from src.utility.RendererUtility import RendererUtility
+        from src.utility.SegMapRendererUtility import SegMapRendererUtility
+
+        RendererUtility.enable_object_index_output(self.output_dir)
+        pass_indices = [obj.pass_index for obj in self.objects]
+        RendererUtility.disable_object_index_output()
+        self.objects[0].name = "Renamed"
+
+        used_objects, path = SegMapRendererUtility._get_objects_of_object_index_pass()
+        self.assertTrue(path.startswith(self.output_dir))
+        for obj, pass_index in zip(self.objects, pass_indices):
+            self.assertEqual(used_objects[pass_index], obj)
+
+
+if __name__ == "__main__":
+    unittest.main()